@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import text
-from src.database import SessionLocal
+from src.database import SessionLocal, esquema_faltante
 from src.styles import apply_styles
 
 st.set_page_config(page_title="Legisladores · Lobby", layout="wide")
 apply_styles()
+faltantes = esquema_faltante()
+if faltantes:
+    st.warning(f"Faltan migraciones en la base ({', '.join(faltantes)}). Correr `python migrar.py`.")
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("""
@@ -49,7 +52,7 @@ def cargar_votos_legislador(legislador_id):
         SELECT v.voto_individual, v.acta_id, v.acta_detalle_id,
                a.fecha, a.titulo as titulo_acta, a.resultado as resultado_general
         FROM votos v
-        LEFT JOIN actas_cabecera a ON a.acta_id = v.acta_id
+        LEFT JOIN actas_cabecera a ON a.acta_id = v.acta_id AND a.camara = v.camara
         WHERE v.legislador_id = :id
         ORDER BY a.fecha DESC NULLS LAST
     """), {"id": legislador_id})
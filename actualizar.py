@@ -3,7 +3,6 @@ actualizar.py — Orquestador de ingesta incremental
 Corre semanalmente via GitHub Actions o manualmente con: python actualizar.py
 
 Scripts que requieren ejecución manual (no automatizables):
-  - ingestar_temario.py     (requiere CSV generado manualmente)
   - scrapear_reuniones.py   (requiere Selenium)
   - scrapear_sesiones.py    (requiere Selenium)
 """
@@ -27,15 +26,36 @@ if __name__ == "__main__":
     logger.info("=== ACTUALIZACION SEMANAL LOBBY ===")
     inicio = time.time()
 
+    import migrar
+    paso("Esquema de la base", migrar.main)
+
     import ingesta_senado
     paso("Votaciones Senado", ingesta_senado.main)
 
     import ingestar_sesiones
     paso("Sesiones HCDN", ingestar_sesiones.main)
 
+    import ingestar_temario
+    paso("Temario de sesiones", ingestar_temario.main)
+
+    import ingestar_cabecera
+    paso("Cabecera de votaciones HCDN", ingestar_cabecera.main)
+
+    import inferir_fechas_actas
+    paso("Fechas inferidas de actas", inferir_fechas_actas.main)
+
+    import actualizar_mandato_diputados
+    paso("Mandatos Diputados", actualizar_mandato_diputados.main)
+
+    import actualizar_mandato_senado
+    paso("Mandatos Senado", actualizar_mandato_senado.main)
+
     import scrapear_comisiones
     paso("Comisiones", scrapear_comisiones.main)
 
+    import ingestar_ddjj_historico
+    paso("DDJJ histórico", ingestar_ddjj_historico.main)
+
     if not EN_ACTIONS:
         import scrapear_reuniones
         paso("Reuniones de comisiones", scrapear_reuniones.main)
@@ -1,79 +1,129 @@
+"""
+Mandatos, bloque y distrito de diputados desde la nómina oficial.
+
+Toda la nómina se cruza en una pasada con el resolver compartido (alias →
+fuzzy ≥82 → alta en bloque con INSERT ... RETURNING de los diputados nuevos)
+y se aplica con un único UPDATE ... FROM (VALUES ...). Si dos filas distintas
+de la nómina resuelven al mismo legislador, ese legislador no se actualiza y
+se reporta (uno de los dos matches está mal).
+"""
 import requests
 from bs4 import BeautifulSoup
 import pandas as pd
-from sqlalchemy import text
-from src.database import SessionLocal
-from rapidfuzz import process, fuzz
+from collections import defaultdict
+from sqlalchemy import Date, Integer, String, column, update, values
+from src.database import SessionLocal, Base, engine
+from src.models import Legislador
+from src.utils import IdentityResolver, logger
+import src.models  # noqa: F401 — registra los modelos para create_all
 import warnings
 warnings.filterwarnings('ignore')
 
-url = "https://www.diputados.gov.ar/diputados/"
-r = requests.get(url, timeout=30, verify=False)
-soup = BeautifulSoup(r.text, 'html.parser')
-tabla = soup.find('table')
-filas = tabla.find_all('tr')[1:]
-
-diputados = []
-for fila in filas:
-    celdas = fila.find_all('td')
-    if len(celdas) >= 7:
-        nombre_raw = celdas[1].get_text(strip=True)
-        partes = nombre_raw.split(',', 1)
-        nombre_invertido = f"{partes[1].strip()} {partes[0].strip()}" if len(partes) == 2 else nombre_raw
-        diputados.append({
-            'nombre_completo': nombre_invertido.strip(),
-            'distrito': celdas[2].get_text(strip=True).title(),
-            'bloque': celdas[3].get_text(strip=True),
-            'fin': celdas[6].get_text(strip=True),
-        })
-
-df = pd.DataFrame(diputados)
-df['fin_date'] = pd.to_datetime(df['fin'], format='%d/%m/%Y', errors='coerce').dt.date
-
-db = SessionLocal()
-result = db.execute(text("SELECT id, nombre_completo FROM legisladores WHERE camara = 'Diputados'"))
-db_diputados = [(row[0], row[1]) for row in result.fetchall()]
-nombres_db = [d[1] for d in db_diputados]
-
-actualizados = 0
-insertados = 0
-
-for _, row in df.iterrows():
-    nombre = row['nombre_completo']
-    fin = row['fin_date']
-
-    match = process.extractOne(nombre.upper(), [n.upper() for n in nombres_db],
-                               scorer=fuzz.token_sort_ratio, score_cutoff=82)
-    if match:
-        _, score, idx = match
-        leg_id = db_diputados[idx][0]
-        db.execute(text("""
-            UPDATE legisladores 
-            SET mandato_hasta = :m, bloque = :b, distrito = :d
-            WHERE id = :id
-        """), {'m': fin, 'b': row['bloque'], 'd': row['distrito'], 'id': leg_id})
-        actualizados += 1
-    else:
-        # Insertar nuevo
-        res = db.execute(text("""
-            INSERT INTO legisladores (nombre_completo, camara, bloque, distrito, mandato_hasta)
-            VALUES (:nombre, 'Diputados', :bloque, :distrito, :mandato)
-            ON CONFLICT DO NOTHING
-            RETURNING id
-        """), {'nombre': nombre, 'bloque': row['bloque'],
-               'distrito': row['distrito'], 'mandato': fin})
-        if res.fetchone():
-            insertados += 1
-            nombres_db.append(nombre)
-            # Actualizar cache local
-            result2 = db.execute(text("SELECT id FROM legisladores WHERE nombre_completo = :n"), {'n': nombre})
-            new_row = result2.fetchone()
-            if new_row:
-                db_diputados.append((new_row[0], nombre))
-
-db.commit()
-db.close()
-
-print(f"Actualizados: {actualizados}")
-print(f"Insertados nuevos: {insertados}")
-print(f"Total: {actualizados + insertados} / {len(df)}")
\ No newline at end of file
+URL = "https://www.diputados.gov.ar/diputados/"
+
+
+def descargar_nomina():
+    r = requests.get(URL, timeout=30, verify=False)
+    soup = BeautifulSoup(r.text, 'html.parser')
+    tabla = soup.find('table')
+    filas = tabla.find_all('tr')[1:]
+
+    diputados = []
+    for fila in filas:
+        celdas = fila.find_all('td')
+        if len(celdas) >= 7:
+            nombre_raw = celdas[1].get_text(strip=True)
+            partes = nombre_raw.split(',', 1)
+            nombre_invertido = f"{partes[1].strip()} {partes[0].strip()}" if len(partes) == 2 else nombre_raw
+            diputados.append({
+                'nombre_completo': nombre_invertido.strip(),
+                'distrito': celdas[2].get_text(strip=True).title(),
+                'bloque': celdas[3].get_text(strip=True),
+                'fin': celdas[6].get_text(strip=True),
+            })
+
+    df = pd.DataFrame(diputados)
+    df['fin_date'] = pd.to_datetime(df['fin'], format='%d/%m/%Y', errors='coerce').dt.date
+    return df
+
+
+def aplicar_mandatos(db, filas):
+    """`filas`: {legislador_id: (mandato_hasta, bloque, distrito)}. Un solo UPDATE para todas."""
+    if not filas:
+        return 0
+    nuevos = values(
+        column('id', Integer), column('mandato_hasta', Date),
+        column('bloque', String), column('distrito', String),
+        name='nuevos',
+    ).data([(legislador_id, *datos) for legislador_id, datos in filas.items()])
+    tabla = Legislador.__table__
+    return db.execute(
+        update(tabla)
+        .where(tabla.c.id == nuevos.c.id)
+        .values(mandato_hasta=nuevos.c.mandato_hasta, bloque=nuevos.c.bloque, distrito=nuevos.c.distrito)
+    ).rowcount
+
+
+def por_legislador(ids, filas):
+    """
+    `filas`: tuplas (nombre, ...datos). Agrupa por legislador_id resuelto.
+    Devuelve ({legislador_id: datos} sin conflictos, {legislador_id: [filas]} con
+    más de una fila distinta, nombres sin match).
+    """
+    grupos = defaultdict(set)
+    sin_match = []
+    for nombre, *datos in filas:
+        leg_id = ids.get(nombre)
+        if leg_id:
+            grupos[leg_id].add((nombre, *datos))
+        else:
+            sin_match.append(nombre)
+    unicos = {leg_id: tuple(next(iter(g))[1:]) for leg_id, g in grupos.items() if len(g) == 1}
+    duplicados = {leg_id: sorted(g, key=str) for leg_id, g in grupos.items() if len(g) > 1}
+    return unicos, duplicados, sin_match
+
+
+def main():
+    logger.info("=== MANDATOS DIPUTADOS ===")
+    df = descargar_nomina()
+    logger.info(f"Diputados en la nómina oficial: {len(df)}")
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        # Resolver compartido: alias → fuzzy (≥82) → alta de los diputados nuevos
+        registros = [
+            {'nombre': nombre, 'bloque': bloque, 'distrito': distrito}
+            for nombre, bloque, distrito in zip(df['nombre_completo'], df['bloque'], df['distrito'])
+        ]
+        ids, creados = IdentityResolver.resolve_many(
+            db, registros, camara='Diputados', threshold=82, source='mandatos',
+            restrict_to_chamber=True, return_created=True,
+        )
+
+        filas, duplicados, sin_match = por_legislador(ids, zip(
+            df['nombre_completo'], (None if pd.isna(fin) else fin for fin in df['fin_date']),
+            df['bloque'], df['distrito'],
+        ))
+        for leg_id, conflicto in duplicados.items():
+            logger.warning(f"  Legislador {leg_id} matcheado por {len(conflicto)} filas de la nómina, "
+                           f"no se actualiza: " + '; '.join(fila[0] for fila in conflicto))
+
+        aplicar_mandatos(db, filas)
+        db.commit()
+
+        insertados = len(creados.intersection(filas))
+        actualizados = len(filas) - insertados
+        logger.info(f"Actualizados: {actualizados} | Insertados nuevos: {insertados} | "
+                    f"Conflictos: {len(duplicados)} | Sin match: {len(sin_match)} | "
+                    f"Total: {len(filas)} / {len(df)}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,83 @@
+"""
+Fin de mandato de senadores desde el listado oficial (JSON de datos abiertos).
+
+Todo el listado se cruza en una pasada con el resolver compartido (alias →
+fuzzy ≥75, sin altas) y se aplica con un único UPDATE ... FROM (VALUES ...).
+Los senadores matcheados por más de una fila del listado no se actualizan.
+"""
 import requests
 import pandas as pd
-from sqlalchemy import text
-from src.database import SessionLocal
-from rapidfuzz import process, fuzz
+from sqlalchemy import Date, Integer, column, update, values
+from src.database import SessionLocal, Base, engine
+from src.models import Legislador
+from src.utils import IdentityResolver, logger
+from actualizar_mandato_diputados import por_legislador
+import src.models  # noqa: F401 — registra los modelos para create_all
 import warnings
 warnings.filterwarnings('ignore')
 
-# Bajar JSON oficial
-url = "https://www.senado.gob.ar/micrositios/DatosAbiertos/ExportarListadoSenadores/json"
-r = requests.get(url, timeout=30, verify=False)
-rows = r.json()['table']['rows']
-df_senado = pd.DataFrame(rows)
-df_senado['nombre_completo'] = (df_senado['APELLIDO'] + ' ' + df_senado['NOMBRE']).str.strip().str.upper()
-df_senado['mandato_hasta'] = pd.to_datetime(df_senado['C_LEGAL'], errors='coerce').dt.date
-print(f"Senadores oficiales: {len(df_senado)}")
-
-# Cargar senadores de nuestra DB
-db = SessionLocal()
-result = db.execute(text("SELECT id, nombre_completo FROM legisladores WHERE camara = 'Senadores'"))
-db_senadores = [(row[0], row[1]) for row in result.fetchall()]
-nombres_db = [s[1] for s in db_senadores]
-
-# Matching fuzzy
-actualizados = 0
-no_encontrados = []
-
-for _, row in df_senado.iterrows():
-    nombre_oficial = row['nombre_completo']
-    mandato = row['mandato_hasta']
-    if not mandato:
-        continue
-
-    match = process.extractOne(nombre_oficial, nombres_db, scorer=fuzz.token_sort_ratio, score_cutoff=75)
-    if match:
-        nombre_match, score, idx = match
-        leg_id = db_senadores[idx][0]
-        db.execute(text("UPDATE legisladores SET mandato_hasta = :m WHERE id = :id"),
-                   {'m': mandato, 'id': leg_id})
-        actualizados += 1
-    else:
-        no_encontrados.append(nombre_oficial)
-
-db.commit()
-db.close()
-
-print(f"\nActualizados: {actualizados}")
-print(f"No encontrados ({len(no_encontrados)}):")
-for n in no_encontrados:
-    print(f"  - {n}")
\ No newline at end of file
+URL = "https://www.senado.gob.ar/micrositios/DatosAbiertos/ExportarListadoSenadores/json"
+
+
+def descargar_listado():
+    r = requests.get(URL, timeout=30, verify=False)
+    rows = r.json()['table']['rows']
+    df_senado = pd.DataFrame(rows)
+    df_senado['nombre_completo'] = (df_senado['APELLIDO'] + ' ' + df_senado['NOMBRE']).str.strip().str.upper()
+    df_senado['mandato_hasta'] = pd.to_datetime(df_senado['C_LEGAL'], errors='coerce').dt.date
+    return df_senado
+
+
+def aplicar_mandatos(db, mandatos):
+    """`mandatos`: {legislador_id: mandato_hasta}. Un solo UPDATE para todos."""
+    if not mandatos:
+        return 0
+    nuevos = values(
+        column('id', Integer), column('mandato_hasta', Date), name='nuevos',
+    ).data(list(mandatos.items()))
+    tabla = Legislador.__table__
+    return db.execute(
+        update(tabla)
+        .where(tabla.c.id == nuevos.c.id)
+        .values(mandato_hasta=nuevos.c.mandato_hasta)
+    ).rowcount
+
+
+def main():
+    logger.info("=== MANDATOS SENADO ===")
+    df_senado = descargar_listado()
+    df_senado = df_senado[df_senado['mandato_hasta'].notna()]
+    logger.info(f"Senadores oficiales con mandato: {len(df_senado)}")
+
+    # Matching contra senadores de nuestra DB con el resolver compartido (alias → fuzzy ≥75)
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        ids = IdentityResolver.resolve_many(db, df_senado['nombre_completo'], camara='Senadores',
+                                            threshold=75, create=False, source='mandatos',
+                                            restrict_to_chamber=True)
+
+        filas, duplicados, no_encontrados = por_legislador(
+            ids, zip(df_senado['nombre_completo'], df_senado['mandato_hasta'])
+        )
+        for leg_id, conflicto in duplicados.items():
+            logger.warning(f"  Senador {leg_id} matcheado por {len(conflicto)} filas del listado, "
+                           f"no se actualiza: " + '; '.join(fila[0] for fila in conflicto))
+
+        actualizados = aplicar_mandatos(db, {leg_id: mandato for leg_id, (mandato,) in filas.items()})
+        db.commit()
+
+        logger.info(f"Actualizados: {actualizados} | Conflictos: {len(duplicados)} | "
+                    f"Sin match: {len(no_encontrados)}")
+        for n in no_encontrados:
+            logger.info(f"  - {n}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
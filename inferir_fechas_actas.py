@@ -0,0 +1,138 @@
+"""
+Etapa de ingesta: fecha inferida para las actas HCDN que tienen votos en el
+CSV de detalle pero no tienen cabecera con fecha.
+
+Cada acta sin fecha toma la fecha del acta con fecha más cercana por acta_id
+(los ids son correlativos dentro de una sesión). Los vecinos se buscan en una
+sola pasada con searchsorted sobre los ids conocidos ordenados; si el más
+cercano está a más de MAX_DISTANCIA ids no se infiere nada. Las filas quedan
+marcadas con fecha_inferida = TRUE.
+"""
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from src import cache
+from src.bulk import asegurar_claves_camara, asegurar_esquema
+from src.database import SessionLocal
+from src.models import ActaCabecera
+from src.utils import logger
+import warnings
+warnings.filterwarnings('ignore')
+
+URL_DETALLES = "https://datos.hcdn.gob.ar:443/dataset/2e08ab84-09f4-4aac-86b3-9573ca9810db/resource/262cc543-3186-401b-b35e-dcdb2635976d/download/detalle-actas-datos-generales-2.4.csv"
+
+MAX_DISTANCIA = 200  # ids de distancia máxima al acta con fecha más cercana
+
+def asegurar_columna(session):
+    """Agrega fecha_inferida y migra las filas viejas marcadas con el título '(Inferido desde acta N)'."""
+    asegurar_esquema(session)
+    migradas = session.execute(text("""
+        UPDATE actas_cabecera
+        SET fecha_inferida = TRUE, titulo = ''
+        WHERE titulo LIKE '(Inferido desde acta %'
+    """)).rowcount
+    session.commit()
+    if migradas:
+        logger.info(f"Actas inferidas migradas a fecha_inferida: {migradas}")
+
+def vecino_mas_cercano(faltantes, conocidos):
+    """
+    Para cada id de `faltantes`, índice en `conocidos` (ordenado) del id más
+    cercano y su distancia. En empate gana el de id menor.
+    """
+    pos = np.searchsorted(conocidos, faltantes)
+    izq = np.clip(pos - 1, 0, len(conocidos) - 1)
+    der = np.clip(pos, 0, len(conocidos) - 1)
+    d_izq = np.abs(faltantes - conocidos[izq])
+    d_der = np.abs(conocidos[der] - faltantes)
+    elegido = np.where(d_izq <= d_der, izq, der)
+    return elegido, np.minimum(d_izq, d_der)
+
+def inferir(session, detalle_path):
+    df = pd.read_csv(detalle_path, encoding='utf-8', usecols=['acta_id'])
+    acta_ids = np.unique(pd.to_numeric(df['acta_id'], errors='coerce').dropna().astype('int64'))
+    logger.info(f"acta_ids unicos en detalles: {len(acta_ids)}")
+
+    # Fechas reales (nunca se infiere a partir de otra inferida)
+    result = session.execute(text("""
+        SELECT acta_id, fecha
+        FROM actas_cabecera
+        WHERE camara = 'Diputados' AND fecha IS NOT NULL AND NOT fecha_inferida
+        ORDER BY acta_id
+    """))
+    df_cab = pd.DataFrame(result.fetchall(), columns=['acta_id', 'fecha'])
+    logger.info(f"Actas con fecha en DB: {len(df_cab)}")
+    if df_cab.empty:
+        logger.info("No hay actas con fecha para tomar de referencia.")
+        return 0
+
+    con_fecha = session.execute(text(
+        "SELECT acta_id FROM actas_cabecera WHERE camara = 'Diputados' AND fecha IS NOT NULL"
+    )).scalars().all()
+    faltantes = np.setdiff1d(acta_ids, np.asarray(con_fecha, dtype='int64'))
+    logger.info(f"acta_ids sin fecha: {len(faltantes)}")
+    if not len(faltantes):
+        logger.info("No hay IDs sin fecha. Nada que hacer.")
+        return 0
+
+    conocidos = df_cab['acta_id'].to_numpy(dtype='int64')
+    elegido, distancia = vecino_mas_cercano(faltantes, conocidos)
+    dentro = distancia <= MAX_DISTANCIA
+    inferidas = pd.DataFrame({
+        'acta_id': faltantes[dentro],
+        'fecha': df_cab['fecha'].to_numpy()[elegido[dentro]],
+    })
+    logger.info(f"Inferibles (vecino a <= {MAX_DISTANCIA} ids): {len(inferidas)} | "
+                f"demasiado lejos: {int((~dentro).sum())}")
+    if inferidas.empty:
+        return 0
+
+    # ✅ Un solo INSERT multi-fila; las cabeceras que existían sin fecha se completan
+    stmt = pg_insert(ActaCabecera.__table__).values([
+        {'acta_id': int(acta_id), 'camara': 'Diputados', 'fecha': fecha,
+         'titulo': '', 'resultado': '', 'fecha_inferida': True}
+        for acta_id, fecha in inferidas.itertuples(index=False)
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['camara', 'acta_id'],
+        set_={'fecha': stmt.excluded.fecha, 'fecha_inferida': True},
+        where=ActaCabecera.__table__.c.fecha.is_(None),
+    )
+    nuevos = session.execute(stmt).rowcount
+    session.commit()
+    return nuevos
+
+def main():
+    logger.info("=== INFIRIENDO FECHAS DE ACTAS ===")
+    session = SessionLocal()
+
+    try:
+        asegurar_claves_camara(session)
+        asegurar_columna(session)
+
+        logger.info("Descargando CSV de detalles...")
+        # Sin salteo por hash: las referencias también cambian cuando entra cabecera nueva
+        descarga = cache.fetch(URL_DETALLES)
+        nuevos = inferir(session, descarga.path)
+        logger.info(f"Total actas inferidas: {nuevos}")
+
+        # Verificar cobertura final
+        result2 = session.execute(text("""
+            SELECT COUNT(DISTINCT v.acta_id) as votos_con_fecha
+            FROM votos v
+            JOIN actas_cabecera a ON a.acta_id = v.acta_id AND a.camara = v.camara
+            WHERE a.fecha IS NOT NULL
+        """))
+        cobertura = result2.fetchone()[0]
+        logger.info(f"Votos con fecha despues de inferencia: {cobertura}")
+
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        session.rollback()
+        raise e
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,16 @@
-import requests
+import argparse
+import csv
+import gzip
+import time
 import pandas as pd
-from io import StringIO
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
 from sqlalchemy import text
+from src import cache
 from src.database import SessionLocal
+from src.bulk import copy_insert
+from src.utils import peak_rss_mb
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -15,92 +23,176 @@ CARGOS_ELECTOS = {
     'DIPUTADA DE LA NACION ARGENTINA', 'DIPUTADO DE LA NACION ARGENTINA'
 }
 
-print("Descargando CSV principal...")
-r2 = requests.get(url_main, timeout=60, verify=False)
-df_main = pd.read_csv(StringIO(r2.text), sep=',', encoding='utf-8-sig', on_bad_lines='skip')
-df_main.columns = df_main.columns.str.strip().str.lstrip('\ufeff')
-leg = df_main[df_main['cargo'].str.upper().str.strip().isin(CARGOS_ELECTOS)]
-cuits_leg = set(leg['cuit'].astype(str).str.replace('.0','').str.strip())
-
-print("Descargando CSV de bienes (182MB)...")
-r = requests.get(url_bienes, timeout=180, verify=False)
-df = pd.read_csv(StringIO(r.text), sep=',', encoding='utf-8-sig', on_bad_lines='skip')
-df.columns = df.columns.str.strip()
-df['bien_importe'] = pd.to_numeric(df['bien_importe'], errors='coerce').fillna(0)
-df['cuit_str'] = df['cuit'].astype(str).str.replace('.0','').str.strip()
-df_leg = df[df['cuit_str'].isin(cuits_leg)].copy()
-print(f"Bienes de legisladores: {len(df_leg)}")
-
-db = SessionLocal()
-try:
-    db.execute(text("""
-        CREATE TABLE IF NOT EXISTS ddjj_bienes (
-            id SERIAL PRIMARY KEY,
-            dj_id INTEGER,
-            cuit VARCHAR,
-            anio INTEGER,
-            funcionario_apellido_nombre VARCHAR,
-            bien_tipo VARCHAR,
-            bien_descripcion TEXT,
-            bien_origen_fondos VARCHAR,
-            bien_titularidad VARCHAR,
-            bien_importe NUMERIC,
-            legislador_id INTEGER REFERENCES legisladores(id)
-        )
-    """))
-    db.execute(text("CREATE INDEX IF NOT EXISTS idx_bienes_cuit ON ddjj_bienes(cuit)"))
-    db.execute(text("CREATE INDEX IF NOT EXISTS idx_bienes_legislador ON ddjj_bienes(legislador_id)"))
-    db.execute(text("DELETE FROM ddjj_bienes WHERE anio = 2024"))
-    db.commit()
-
-    # Cruzar con legisladores por cuit
-    result = db.execute(text("SELECT id, cuit FROM ddjj_legisladores WHERE cuit IS NOT NULL"))
-    cuit_to_id = {str(row[1]).strip(): row[0] for row in result.fetchall()}
-
-    insertados = 0
-    batch = []
-    for _, row in df_leg.iterrows():
-        cuit = str(row.get('cuit','')).replace('.0','').strip()
-        batch.append({
-            'dj_id': int(row.get('dj_id', 0) or 0),
-            'cuit': cuit,
-            'anio': 2024,
-            'nombre': str(row.get('funcionario_apellido_nombre','')).strip(),
-            'tipo': str(row.get('bien_tipo','')).strip(),
-            'desc': str(row.get('bien_descripcion','')).strip(),
-            'origen': str(row.get('bien_origen_fondos','')).strip(),
-            'titularidad': str(row.get('bien_titularidad','')).strip(),
-            'importe': float(row['bien_importe']),
-            'leg_id': cuit_to_id.get(cuit),
-        })
-        if len(batch) >= 500:
-            db.execute(text("""
-                INSERT INTO ddjj_bienes (dj_id, cuit, anio, funcionario_apellido_nombre,
-                    bien_tipo, bien_descripcion, bien_origen_fondos, bien_titularidad,
-                    bien_importe, legislador_id)
-                VALUES (:dj_id, :cuit, :anio, :nombre, :tipo, :desc, :origen,
-                    :titularidad, :importe, :leg_id)
-            """), batch)
-            db.commit()
-            insertados += len(batch)
-            batch = []
-            print(f"  {insertados} insertados...")
-
-    if batch:
+COLUMNAS_BIENES = (
+    'dj_id', 'cuit', 'anio', 'funcionario_apellido_nombre',
+    'bien_tipo', 'bien_descripcion', 'bien_origen_fondos', 'bien_titularidad',
+    'bien_importe', 'legislador_id',
+)
+
+# Columnas que se leen del CSV de bienes en modo arrow (el resto nunca se parsea)
+TIPOS_BIENES = {
+    'dj_id': pa.int64(),
+    'cuit': pa.string(),         # como texto: un valor no numérico no corta la lectura
+    'funcionario_apellido_nombre': pa.string(),
+    'bien_tipo': pa.string(),
+    'bien_descripcion': pa.string(),
+    'bien_origen_fondos': pa.string(),
+    'bien_titularidad': pa.string(),
+    'bien_importe': pa.string(),   # se convierte después del filtro (puede venir sucio)
+}
+BLOCK_BYTES = 8 << 20  # tamaño de bloque del lector arrow (acota memoria por batch)
+
+
+# --- Modo pandas (original): todo el CSV en memoria, filtro al final ---
+
+def cuits_legisladores_pandas(path):
+    df_main = pd.read_csv(path, sep=',', encoding='utf-8-sig', on_bad_lines='skip')
+    df_main.columns = df_main.columns.str.strip().str.lstrip('\ufeff')
+    leg = df_main[df_main['cargo'].str.upper().str.strip().isin(CARGOS_ELECTOS)]
+    return set(leg['cuit'].astype(str).str.replace('.0','').str.strip())
+
+def leer_bienes_pandas(path, cuits_leg):
+    df = pd.read_csv(path, sep=',', encoding='utf-8-sig', on_bad_lines='skip')
+    df.columns = df.columns.str.strip()
+    df['bien_importe'] = pd.to_numeric(df['bien_importe'], errors='coerce').fillna(0)
+    df['cuit_str'] = df['cuit'].astype(str).str.replace('.0','').str.strip()
+    return df[df['cuit_str'].isin(cuits_leg)].copy()
+
+
+# --- Modo arrow: lector CSV multihilo desde disco, columnas podadas, filtro por batch ---
+
+def _abrir_csv(path, tipos):
+    """Lector arrow en streaming sobre el .gz del cache, con nombres de columna sin espacios."""
+    with gzip.open(path, 'rt', encoding='utf-8-sig') as f:
+        columnas = [c.strip() for c in next(csv.reader(f))]
+    return pa_csv.open_csv(
+        pa.input_stream(str(path), compression='gzip'),
+        read_options=pa_csv.ReadOptions(
+            use_threads=True, block_size=BLOCK_BYTES, skip_rows=1, column_names=columnas
+        ),
+        parse_options=pa_csv.ParseOptions(invalid_row_handler=lambda fila: 'skip'),
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=list(tipos), column_types=tipos
+        ),
+    )
+
+def cuits_legisladores_arrow(path):
+    lector = _abrir_csv(path, {'cuit': pa.string(), 'cargo': pa.string()})
+    cuits = set()
+    for batch in lector:
+        cargos = pc.utf8_upper(pc.utf8_trim_whitespace(batch.column('cargo')))
+        electos = batch.filter(pc.is_in(cargos, value_set=pa.array(sorted(CARGOS_ELECTOS))))
+        cuits.update(c for c in pc.utf8_trim_whitespace(electos.column('cuit')).to_pylist() if c)
+    return cuits
+
+def leer_bienes_arrow(path, cuits_leg):
+    """Solo materializa las filas de CUITs de legisladores: el filtro se aplica en cada record batch."""
+    valores = pa.array(sorted(cuits_leg), type=pa.string())
+    lector = _abrir_csv(path, TIPOS_BIENES)
+    batches = [
+        batch.filter(pc.is_in(pc.utf8_trim_whitespace(batch.column('cuit')), value_set=valores))
+        for batch in lector
+    ]
+    df = pa.Table.from_batches(batches, schema=lector.schema).to_pandas()
+    df['bien_importe'] = pd.to_numeric(df['bien_importe'], errors='coerce').fillna(0)
+    texto = [c for c, tipo in TIPOS_BIENES.items() if tipo == pa.string() and c != 'bien_importe']
+    df[texto] = df[texto].fillna('')
+    df['dj_id'] = df['dj_id'].fillna(0)
+    return df
+
+
+def preparar_filas(df_leg, cuit_to_id):
+    """Frame con COLUMNAS_BIENES listo para COPY: limpieza y cruce por cuit en bloque."""
+    cuit = df_leg['cuit'].astype(str).str.replace('.0', '', regex=False).str.strip()
+    filas = pd.DataFrame({
+        'dj_id': pd.to_numeric(df_leg['dj_id'], errors='coerce').fillna(0).astype('int64'),
+        'cuit': cuit,
+        'anio': 2024,
+        **{
+            c: df_leg[c].astype(str).str.strip()
+            for c in ('funcionario_apellido_nombre', 'bien_tipo', 'bien_descripcion',
+                      'bien_origen_fondos', 'bien_titularidad')
+        },
+        'bien_importe': df_leg['bien_importe'].astype(float),
+        'legislador_id': cuit.map(cuit_to_id).astype('Int64'),
+    }, columns=COLUMNAS_BIENES)
+    return filas
+
+
+def guardar(df_leg):
+    db = SessionLocal()
+    try:
         db.execute(text("""
-            INSERT INTO ddjj_bienes (dj_id, cuit, anio, funcionario_apellido_nombre,
-                bien_tipo, bien_descripcion, bien_origen_fondos, bien_titularidad,
-                bien_importe, legislador_id)
-            VALUES (:dj_id, :cuit, :anio, :nombre, :tipo, :desc, :origen,
-                :titularidad, :importe, :leg_id)
-        """), batch)
+            CREATE TABLE IF NOT EXISTS ddjj_bienes (
+                id SERIAL PRIMARY KEY,
+                dj_id INTEGER,
+                cuit VARCHAR,
+                anio INTEGER,
+                funcionario_apellido_nombre VARCHAR,
+                bien_tipo VARCHAR,
+                bien_descripcion TEXT,
+                bien_origen_fondos VARCHAR,
+                bien_titularidad VARCHAR,
+                bien_importe NUMERIC,
+                legislador_id INTEGER REFERENCES legisladores(id)
+            )
+        """))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_bienes_cuit ON ddjj_bienes(cuit)"))
+        db.execute(text("CREATE INDEX IF NOT EXISTS idx_bienes_legislador ON ddjj_bienes(legislador_id)"))
+        db.commit()
+
+        # Cruzar con legisladores por cuit
+        result = db.execute(text("SELECT id, cuit FROM ddjj_legisladores WHERE cuit IS NOT NULL"))
+        cuit_to_id = {str(row[1]).strip(): row[0] for row in result.fetchall()}
+        filas = preparar_filas(df_leg, cuit_to_id)
+
+        # DELETE y COPY en la misma transacción: si la carga falla, quedan las filas anteriores
+        db.execute(text("DELETE FROM ddjj_bienes WHERE anio = 2024"))
+        insertados, _ = copy_insert(db, 'ddjj_bienes', COLUMNAS_BIENES, filas.itertuples(index=False))
         db.commit()
-        insertados += len(batch)
+        return insertados
+    except Exception as e:
+        db.rollback()
+        print(f"Error: {e}")
+        raise
+    finally:
+        db.close()
+
 
+LECTORES = {
+    'arrow': (cuits_legisladores_arrow, leer_bienes_arrow),
+    'pandas': (cuits_legisladores_pandas, leer_bienes_pandas),
+}
+
+def main(modo='arrow', forzar=False):
+    print("Descargando CSV principal...")
+    descarga_main = cache.fetch(url_main, consumer='ingesta_bienes', timeout=60)
+    print("Descargando CSV de bienes (182MB)...")
+    descarga_bienes = cache.fetch(url_bienes, consumer='ingesta_bienes', timeout=180)
+    if not (forzar or descarga_main.changed or descarga_bienes.changed):
+        print("Sin cambios desde la última ingesta — nada que hacer")
+        return
+
+    leer_cuits, leer_bienes = LECTORES[modo]
+    inicio = time.perf_counter()
+    cuits_leg = leer_cuits(descarga_main.path)
+    df_leg = leer_bienes(descarga_bienes.path, cuits_leg)
+    segundos = time.perf_counter() - inicio
+    print(f"Bienes de legisladores: {len(df_leg)}")
+    # El pico de RSS es por proceso: para comparar modos, correr cada uno por separado
+    print(f"Lectura [{modo}]: {segundos:.1f} s | pico RSS {peak_rss_mb():.0f} MB")
+
+    insertados = guardar(df_leg)
+    descarga_main.mark_processed()
+    descarga_bienes.mark_processed()
     print(f"\nTotal insertados: {insertados}")
-except Exception as e:
-    db.rollback()
-    print(f"Error: {e}")
-    raise
-finally:
-    db.close()
\ No newline at end of file
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta de bienes de DDJJ de legisladores")
+    parser.add_argument('--modo', choices=sorted(LECTORES), default='arrow',
+                        help="arrow: streaming con columnas podadas (default); pandas: lectura completa")
+    parser.add_argument('--forzar', action='store_true',
+                        help="procesar aunque los CSV no hayan cambiado (para comparar modos)")
+    args = parser.parse_args()
+    main(modo=args.modo, forzar=args.forzar)
@@ -1,20 +1,51 @@
+import argparse
+import multiprocessing
+import lxml.etree
+import lxml.html
 import requests
+import queue
+import re
+import threading
 from bs4 import BeautifulSoup
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
 from sqlalchemy import text
-from src.database import SessionLocal
-from src.utils import logger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from src.archive import Archive, replay
+from src.bulk import asegurar_claves_camara
+from src.database import SessionLocal, Base, engine
+from src.http import build_session, HostRateLimiter
+from src.models import ActaCabecera, Voto
+from src.utils import logger, IdentityResolver
 import time
 import warnings
 warnings.filterwarnings('ignore')
 
 BASE = "https://www.senado.gob.ar"
-MAX_ID = 2700  # actualizar periódicamente
 
-def get_acta_con_retry(url, max_intentos=3):
+# Frontier: qué acta_ids probar en cada corrida
+LISTADO_URLS = [f"{BASE}/votaciones/actas"]   # páginas con links a detalleActa/{id}
+RE_DETALLE = re.compile(r'detalleActa/(\d+)')
+LOOKAHEAD = 5           # ids por encima del máximo conocido que se prueban siempre
+REPROBAR_DIAS = 1       # primera re-prueba de una vacía; después se duplica...
+REPROBAR_MAX_DIAS = 90  # ...hasta este tope
+
+# Pipeline fetch → parse → write
+FETCHERS = 4        # requests concurrentes
+RATE = 3.0          # requests/seg máx. contra senado.gob.ar
+PARSERS = 2         # procesos de parseo
+BATCH_ACTAS = 50    # actas por transacción
+QUEUE_SIZE = 64     # tamaño de las colas entre etapas
+
+FUENTE_ARCHIVO = 'senado.acta'  # respuestas crudas de detalleActa en src.archive
+
+def get_acta_con_retry(url, max_intentos=3, session=None):
+    http = session or requests
     for intento in range(max_intentos):
         try:
-            r = requests.get(url, timeout=20, verify=False)
+            r = http.get(url, timeout=20, verify=False)
             return r
         except Exception as e:
             if intento < max_intentos - 1:
@@ -22,21 +53,22 @@ def get_acta_con_retry(url, max_intentos=3):
             else:
                 raise e
 
-def parsear_acta(acta_id):
+def parsear_acta(acta_id, backend='bs4'):
     url = f"{BASE}/votaciones/detalleActa/{acta_id}"
     r = get_acta_con_retry(url)
     if r.status_code != 200:
         return None
-    soup = BeautifulSoup(r.text, 'html.parser')
-    texto = soup.get_text(separator='\n', strip=True)
-    if 'Senador' not in texto and 'AFIRMATIVO' not in texto:
-        return None
+    return parsear_html(acta_id, r.text, backend)
+
+def parsear_html(acta_id, html, backend='bs4'):
+    """Parsea el HTML de detalleActa. Devuelve (metadata, votos) o None si está vacía."""
+    return BACKENDS[backend](acta_id, html)
 
+def _metadata(acta_id, lineas):
     metadata = {
         'acta_id': acta_id, 'titulo': '', 'fecha': None, 'resultado': '',
         'afirmativos': 0, 'negativos': 0, 'abstenciones': 0, 'ausentes': 0,
     }
-    lineas = [l.strip() for l in texto.split('\n') if l.strip()]
     for i, linea in enumerate(lineas):
         if linea.startswith('Acta Nro:'):
             if i + 1 < len(lineas):
@@ -58,6 +90,16 @@ def parsear_acta(acta_id):
         if 'AUSENTES' in linea:
             try: metadata['ausentes'] = int(lineas[i - 1])
             except: pass
+    return metadata
+
+def parsear_html_bs4(acta_id, html):
+    soup = BeautifulSoup(html, 'html.parser')
+    texto = soup.get_text(separator='\n', strip=True)
+    if 'Senador' not in texto and 'AFIRMATIVO' not in texto:
+        return None
+
+    lineas = [l.strip() for l in texto.split('\n') if l.strip()]
+    metadata = _metadata(acta_id, lineas)
 
     votos = []
     tabla = soup.find('table')
@@ -74,17 +116,321 @@ def parsear_acta(acta_id):
 
     return metadata, votos
 
+# Textos que get_text de BeautifulSoup no incluye
+XP_TEXTOS = lxml.etree.XPath('//text()[not(parent::script or parent::style or parent::template)]')
+XP_FILAS = lxml.etree.XPath('(//table)[1]//tr')
+XP_CELDAS = lxml.etree.XPath('.//td')
+
+def _texto_celda(celda):
+    return ''.join(t.strip() for t in celda.itertext())
+
+def parsear_html_lxml(acta_id, html):
+    """
+    Mismo resultado que parsear_html_bs4, con lxml (C) y XPath: las líneas de
+    texto salen directo de los nodos de texto y la tabla de votos por XPath,
+    sin construir el árbol de BeautifulSoup.
+    """
+    try:
+        doc = lxml.html.document_fromstring(html)
+    except (ValueError, lxml.etree.ParserError):
+        # Documento vacío o con declaración de encoding: lo resuelve el parser de referencia
+        return parsear_html_bs4(acta_id, html)
+
+    lineas = [l for l in (t.strip() for t in XP_TEXTOS(doc)) if l]
+    if not any('Senador' in l or 'AFIRMATIVO' in l for l in lineas):
+        return None
+    metadata = _metadata(acta_id, lineas)
+
+    votos = []
+    for fila in XP_FILAS(doc)[1:]:
+        celdas = XP_CELDAS(fila)
+        if len(celdas) >= 4:
+            nombre = _texto_celda(celdas[1])
+            bloque = _texto_celda(celdas[2])
+            provincia = _texto_celda(celdas[3])
+            voto = _texto_celda(celdas[4]) if len(celdas) > 4 else ''
+            if nombre and voto:
+                votos.append({'nombre': nombre, 'bloque': bloque, 'provincia': provincia, 'voto': voto})
+
+    return metadata, votos
+
+BACKENDS = {'bs4': parsear_html_bs4, 'lxml': parsear_html_lxml}
+
+
+class Throughput:
+    """Contadores por etapa para loguear items/seg y poder ajustar la concurrencia."""
+
+    def __init__(self):
+        self.inicio = time.time()
+        self.contador = Counter()
+        self._lock = threading.Lock()
+
+    def sumar(self, etapa, n=1):
+        with self._lock:
+            self.contador[etapa] += n
+
+    def resumen(self):
+        segundos = max(time.time() - self.inicio, 1e-9)
+        return ' | '.join(
+            f"{etapa}: {n} ({n / segundos:.1f}/s)" for etapa, n in self.contador.items()
+        )
+
+
+def _alimentar(ids, salida):
+    for acta_id in ids:
+        salida.put(acta_id)
+    for _ in range(FETCHERS):
+        salida.put(None)
+
+
+def _fetcher(entrada, salida, http, limiter, stats, archivo):
+    while True:
+        acta_id = entrada.get()
+        if acta_id is None:
+            salida.put(None)
+            return
+        url = f"{BASE}/votaciones/detalleActa/{acta_id}"
+        try:
+            limiter.wait(url)
+            r = get_acta_con_retry(url, session=http)
+            archivo.put_response(FUENTE_ARCHIVO, r, clave=acta_id)
+            salida.put((acta_id, r.status_code, r.text))
+        except Exception as e:
+            logger.warning(f"  Error en acta {acta_id}: {e}")
+            salida.put((acta_id, None, None))
+        stats.sumar('fetch')
+
+
+def _parseado(acta_id, salida, en_vuelo, stats, futuro):
+    en_vuelo.release()
+    try:
+        resultado = futuro.result()
+        salida.put((acta_id, 'ok' if resultado else 'vacia', resultado))
+    except Exception as e:
+        logger.warning(f"  Error parseando acta {acta_id}: {e}")
+        salida.put((acta_id, 'error', None))
+    stats.sumar('parse')
+
+
+def _pool_parseo():
+    """
+    Pool de procesos para el parseo. Se crea en el thread principal y con
+    'spawn': los workers se abren a demanda desde el thread _parser, y un fork
+    en un proceso con threads (fetchers) puede heredar locks tomados y colgarse.
+    """
+    return ProcessPoolExecutor(max_workers=PARSERS, mp_context=multiprocessing.get_context('spawn'))
+
+
+def _parser(entrada, salida, stats, backend, pool):
+    """Despacha el HTML al pool de procesos, con trabajos en vuelo acotados."""
+    en_vuelo = threading.Semaphore(QUEUE_SIZE)
+    terminados = 0
+    with pool:
+        while terminados < FETCHERS:
+            item = entrada.get()
+            if item is None:
+                terminados += 1
+                continue
+            acta_id, status, html = item
+            if status is None:
+                salida.put((acta_id, 'error', None))
+                continue
+            if status != 200:
+                salida.put((acta_id, 'vacia', None))
+                continue
+            en_vuelo.acquire()
+            futuro = pool.submit(parsear_html, acta_id, html, backend)
+            futuro.add_done_callback(partial(_parseado, acta_id, salida, en_vuelo, stats))
+    salida.put(None)
+
+
+def crear_tabla_frontier(session):
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS senado_frontier (
+            acta_id INTEGER PRIMARY KEY,
+            estado VARCHAR NOT NULL DEFAULT 'pendiente',   -- pendiente / found / empty / error
+            intentos INTEGER NOT NULL DEFAULT 0,
+            probado_en TIMESTAMP,
+            proximo_intento TIMESTAMP DEFAULT NOW(),
+            origen VARCHAR
+        )
+    """))
+    session.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_senado_frontier_proximo ON senado_frontier(estado, proximo_intento)"
+    ))
+    session.commit()
+
+
+def descubrir_ids(http):
+    """acta_ids linkeados desde las páginas de listado de votaciones."""
+    ids = set()
+    for url in LISTADO_URLS:
+        try:
+            r = get_acta_con_retry(url, session=http)
+            ids.update(int(m) for m in RE_DETALLE.findall(r.text))
+        except Exception as e:
+            logger.warning(f"  No se pudo leer el listado {url}: {e}")
+    return ids
+
+
+def sembrar_frontier(session, http):
+    """
+    Agrega al frontier los ids a probar: los del listado (reabre los que
+    estaban vacíos), y en la primera corrida las actas ya cargadas + los huecos.
+    Siempre suma LOOKAHEAD ids por encima del máximo conocido.
+    """
+    vacio = session.execute(text("SELECT NOT EXISTS (SELECT 1 FROM senado_frontier)")).scalar()
+    if vacio:
+        session.execute(text("""
+            INSERT INTO senado_frontier (acta_id, estado, probado_en, proximo_intento, origen)
+            SELECT DISTINCT acta_id, 'found', NOW(), NULL, 'db'
+            FROM actas_cabecera WHERE camara = 'Senado' AND acta_id IS NOT NULL
+            ON CONFLICT (acta_id) DO NOTHING
+        """))
+        session.execute(text("""
+            INSERT INTO senado_frontier (acta_id, origen)
+            SELECT g, 'hueco' FROM generate_series(1, (SELECT COALESCE(MAX(acta_id), 0) FROM senado_frontier)) g
+            ON CONFLICT (acta_id) DO NOTHING
+        """))
+
+    listado = descubrir_ids(http)
+    logger.info(f"Listado de votaciones: {len(listado)} actas linkeadas")
+    if listado:
+        session.execute(text("""
+            INSERT INTO senado_frontier (acta_id, origen) VALUES (:id, 'listado')
+            ON CONFLICT (acta_id) DO UPDATE
+                SET estado = 'pendiente', proximo_intento = NOW()
+                WHERE senado_frontier.estado = 'empty'
+        """), [{'id': i} for i in sorted(listado)])
+
+    maximo = session.execute(text(
+        "SELECT COALESCE(MAX(acta_id), 0) FROM senado_frontier WHERE estado = 'found'"
+    )).scalar()
+    maximo = max([maximo, *listado])
+    session.execute(text("""
+        INSERT INTO senado_frontier (acta_id, origen) VALUES (:id, 'lookahead')
+        ON CONFLICT (acta_id) DO NOTHING
+    """), [{'id': i} for i in range(maximo + 1, maximo + LOOKAHEAD + 1)])
+    session.commit()
 
-def main():
+
+def ids_a_probar(session):
+    return [row[0] for row in session.execute(text("""
+        SELECT acta_id FROM senado_frontier
+        WHERE estado = 'pendiente'
+           OR (estado IN ('empty', 'error') AND proximo_intento <= NOW())
+        ORDER BY acta_id
+    """)).fetchall()]
+
+
+def registrar_probados(session, probados):
+    """
+    Actualiza el frontier con el resultado de cada id probado. Las vacías se
+    re-prueban con espera creciente (REPROBAR_DIAS * 2^intentos, con tope).
+    """
+    if not probados:
+        return
+    session.execute(text("""
+        INSERT INTO senado_frontier (acta_id, estado, intentos, probado_en, proximo_intento, origen)
+        VALUES (:acta_id, :estado, 1, NOW(), NOW(), 'crawler')
+        ON CONFLICT (acta_id) DO UPDATE SET
+            estado = EXCLUDED.estado,
+            intentos = senado_frontier.intentos + 1,
+            probado_en = NOW(),
+            proximo_intento = CASE EXCLUDED.estado
+                WHEN 'found' THEN NULL
+                WHEN 'error' THEN NOW()
+                ELSE NOW() + make_interval(days => LEAST(
+                    :max_dias, :base_dias * POWER(2, senado_frontier.intentos)
+                )::int)
+            END
+    """), [
+        {'acta_id': acta_id, 'estado': estado,
+         'base_dias': REPROBAR_DIAS, 'max_dias': REPROBAR_MAX_DIAS}
+        for acta_id, estado in probados
+    ])
+    session.commit()
+
+
+def escribir_lote(session, lote, cache_senadores):
+    """Escribe un lote de actas (metadata, votos) en una sola transacción. Devuelve votos nuevos."""
+    # Senadores no vistos: un solo paso por el resolver compartido (alias → fuzzy → alta)
+    nuevos = [
+        {'nombre': v['nombre'], 'bloque': v['bloque'], 'distrito': v['provincia']}
+        for _, votos in lote for v in votos if v['nombre'] not in cache_senadores
+    ]
+    if nuevos:
+        cache_senadores.update(IdentityResolver.resolve_many(
+            session, nuevos, camara='Senadores', source='senado',
+            restrict_to_chamber=True
+        ))
+
+    # ✅ Upserts multi-fila con claves por cámara: re-correr un rango ya cargado no duplica nada
+    session.execute(
+        pg_insert(ActaCabecera.__table__).values([
+            {
+                'acta_id': m['acta_id'], 'camara': 'Senado', 'titulo': m['titulo'],
+                'fecha': m['fecha'], 'resultado': m['resultado'],
+                'votos_afirmativos': m['afirmativos'], 'votos_negativos': m['negativos'],
+                'abstenciones': m['abstenciones'], 'ausentes': m['ausentes'],
+            }
+            for m, _ in lote
+        ]).on_conflict_do_nothing(index_elements=['camara', 'acta_id'])
+    )
+
+    filas = [
+        {'legislador_id': cache_senadores[v['nombre']], 'acta_id': metadata['acta_id'],
+         'camara': 'Senado', 'voto_individual': v['voto']}
+        for metadata, votos in lote for v in votos if cache_senadores.get(v['nombre'])
+    ]
+    insertados = 0
+    if filas:
+        insertados = session.execute(
+            pg_insert(Voto.__table__).values(filas)
+            .on_conflict_do_nothing(index_elements=['camara', 'acta_id', 'legislador_id'])
+        ).rowcount
+    session.commit()
+    return insertados
+
+
+def _escribir(session, lote, cache_senadores):
+    """
+    Escribe el lote; si falla, reintenta acta por acta para aislar la que rompe.
+    Devuelve (acta_ids escritos, votos escritos).
+    """
+    try:
+        return [m['acta_id'] for m, _ in lote], escribir_lote(session, lote, cache_senadores)
+    except Exception as e:
+        session.rollback()
+        logger.warning(f"  Error escribiendo lote ({e}), reintentando acta por acta")
+    escritas = []
+    votos = 0
+    for item in lote:
+        try:
+            votos += escribir_lote(session, [item], cache_senadores)
+            escritas.append(item[0]['acta_id'])
+        except Exception as e:
+            session.rollback()
+            logger.warning(f"  Error en acta {item[0]['acta_id']}: {e}")
+    return escritas, votos
+
+
+def main(backend='bs4'):
     logger.info("=== INGESTA VOTACIONES SENADO ===")
+    Base.metadata.create_all(bind=engine)
     session = SessionLocal()
     try:
-        # ✅ Arrancar desde el último acta conocido
-        row = session.execute(
-            text("SELECT COALESCE(MAX(acta_id), 0) FROM actas_cabecera WHERE camara = 'Senado'")
-        ).fetchone()
-        ultimo_id = row[0]
-        logger.info(f"Ultimo acta en DB: {ultimo_id} — arrancando desde {ultimo_id + 1}")
+        asegurar_claves_camara(session)
+        crear_tabla_frontier(session)
+        http = build_session(pool_size=FETCHERS)
+
+        # ✅ Solo se piden los ids que el frontier marca como pendientes
+        sembrar_frontier(session, http)
+        pendientes = ids_a_probar(session)
+        logger.info(f"Frontier: {len(pendientes)} actas a probar")
+        if not pendientes:
+            logger.info("Nada pendiente en el frontier")
+            return
 
         cache_senadores = {
             row[1]: row[0] for row in session.execute(
@@ -93,69 +439,64 @@ def main():
         }
         logger.info(f"Senadores en cache: {len(cache_senadores)}")
 
+        # Etapas: alimentador → N fetchers (rate limit por host) → pool de parseo → writer (este thread)
+        stats = Throughput()
+        q_ids = queue.Queue(maxsize=QUEUE_SIZE)
+        q_html = queue.Queue(maxsize=QUEUE_SIZE)
+        q_parseado = queue.Queue(maxsize=QUEUE_SIZE)
+        limiter = HostRateLimiter(RATE)
+        archivo = Archive()
+
+        hilos = [threading.Thread(target=_alimentar, args=(pendientes, q_ids), daemon=True)]
+        hilos += [
+            threading.Thread(target=_fetcher, args=(q_ids, q_html, http, limiter, stats, archivo), daemon=True)
+            for _ in range(FETCHERS)
+        ]
+        pool = _pool_parseo()
+        hilos.append(threading.Thread(target=_parser, args=(q_html, q_parseado, stats, backend, pool), daemon=True))
+        for hilo in hilos:
+            hilo.start()
+
         actas_nuevas = 0
         votos_nuevos = 0
-        vacias_consecutivas = 0
+        lote = []
+        probados = []   # (acta_id, estado frontier) sin acta que escribir
+        estados_frontier = {'vacia': 'empty', 'error': 'error'}
 
-        for acta_id in range(ultimo_id + 1, MAX_ID + 1):
-            try:
-                resultado = parsear_acta(acta_id)
-                if not resultado:
-                    vacias_consecutivas += 1
-                    if vacias_consecutivas >= 20:
-                        logger.info(f"20 actas vacías consecutivas — fin de datos en ID {acta_id}")
-                        break
-                    continue
-
-                vacias_consecutivas = 0
-                metadata, votos = resultado
-                if not votos:
-                    continue
-
-                session.execute(text("""
-                    INSERT INTO actas_cabecera
-                        (acta_id, titulo, fecha, resultado,
-                         votos_afirmativos, votos_negativos, abstenciones, ausentes, camara)
-                    VALUES
-                        (:acta_id, :titulo, :fecha, :resultado,
-                         :afirmativos, :negativos, :abstenciones, :ausentes, 'Senado')
-                    ON CONFLICT (acta_id) DO NOTHING
-                """), metadata)
-
-                for v in votos:
-                    nombre = v['nombre']
-                    if nombre not in cache_senadores:
-                        res = session.execute(text("""
-                            INSERT INTO legisladores (nombre_completo, camara, bloque, distrito)
-                            VALUES (:nombre, 'Senadores', :bloque, :provincia)
-                            ON CONFLICT DO NOTHING RETURNING id
-                        """), {'nombre': nombre, 'bloque': v['bloque'], 'provincia': v['provincia']})
-                        row = res.fetchone()
-                        if row:
-                            cache_senadores[nombre] = row[0]
-
-                    legislador_id = cache_senadores.get(nombre)
-                    if not legislador_id:
-                        continue
-
-                    session.execute(text("""
-                        INSERT INTO votos (legislador_id, acta_id, voto_individual)
-                        VALUES (:leg_id, :acta_id, :voto)
-                    """), {'leg_id': legislador_id, 'acta_id': acta_id, 'voto': v['voto']})
-                    votos_nuevos += 1
-
-                actas_nuevas += 1
-                if actas_nuevas % 50 == 0:
-                    session.commit()
-                    logger.info(f"  Actas: {actas_nuevas} | Votos: {votos_nuevos} | ID: {acta_id}")
-
-                time.sleep(0.3)
-
-            except Exception as e:
-                logger.warning(f"  Error en acta {acta_id}: {e}")
-                continue
+        def volcar(lote, probados):
+            escritas, votos = _escribir(session, lote, cache_senadores)
+            fallidas = {m['acta_id'] for m, _ in lote} - set(escritas)
+            registrar_probados(
+                session,
+                probados + [(i, 'found') for i in escritas] + [(i, 'error') for i in fallidas],
+            )
+            stats.sumar('write', len(lote))
+            return len(escritas), votos
 
-        session.commit()
+        while True:
+            item = q_parseado.get()
+            if item is None:
+                break
+            acta_id, estado, resultado = item
+            if estado == 'ok' and resultado[1]:
+                lote.append(resultado)
+            else:
+                # Acta con página pero sin votos: se trata como vacía y se re-prueba
+                probados.append((acta_id, estados_frontier.get(estado, 'empty')))
+
+            if len(lote) + len(probados) >= BATCH_ACTAS:
+                actas, votos = volcar(lote, probados)
+                actas_nuevas += actas
+                votos_nuevos += votos
+                lote, probados = [], []
+                logger.info(f"  Actas: {actas_nuevas} | Votos: {votos_nuevos} | {stats.resumen()}")
+
+        if lote or probados:
+            actas, votos = volcar(lote, probados)
+            actas_nuevas += actas
+            votos_nuevos += votos
+
+        logger.info(f"Throughput por etapa — {stats.resumen()}")
         logger.info(f"Ingesta completa — Actas nuevas: {actas_nuevas} | Votos nuevos: {votos_nuevos}")
 
     except Exception as e:
@@ -166,5 +507,130 @@ def main():
         session.close()
 
 
+def _parsear_archivado(backend, clave, html):
+    return parsear_html(int(clave), html, backend)
+
+
+def recargar_lote(session, lote, cache_senadores):
+    """Reemplaza en la DB las actas del lote (cabecera + votos del Senado) por las re-parseadas."""
+    ids = [metadata['acta_id'] for metadata, _ in lote]
+    session.execute(text(
+        "DELETE FROM votos WHERE camara = 'Senado' AND acta_id = ANY(:ids)"
+    ), {'ids': ids})
+    session.execute(text(
+        "DELETE FROM actas_cabecera WHERE camara = 'Senado' AND acta_id = ANY(:ids)"
+    ), {'ids': ids})
+    return escribir_lote(session, lote, cache_senadores)
+
+
+def reparsear(workers=None, backend='bs4'):
+    """
+    Re-parsea las actas del archivo local con el parser actual y recarga la DB,
+    sin pedir nada a senado.gob.ar.
+    """
+    logger.info("=== REPARSE VOTACIONES SENADO (desde archivo) ===")
+    Base.metadata.create_all(bind=engine)
+    archivo = Archive()
+    registros = archivo.registros(FUENTE_ARCHIVO, status=200)
+    logger.info(f"Actas archivadas: {len(registros)}")
+
+    session = SessionLocal()
+    try:
+        asegurar_claves_camara(session)
+        crear_tabla_frontier(session)
+        cache_senadores = {
+            row[1]: row[0] for row in session.execute(
+                text("SELECT id, nombre_completo FROM legisladores WHERE camara = 'Senadores'")
+            ).fetchall()
+        }
+        stats = Throughput()
+        actas = votos = 0
+        lote, probados = [], []
+
+        def volcar(lote, probados):
+            escritos = recargar_lote(session, lote, cache_senadores) if lote else 0
+            registrar_probados(session, probados + [(m['acta_id'], 'found') for m, _ in lote])
+            stats.sumar('write', len(lote))
+            return escritos
+
+        for registro, resultado in replay(registros, partial(_parsear_archivado, backend), workers=workers):
+            stats.sumar('parse')
+            if isinstance(resultado, Exception):
+                logger.warning(f"  Error parseando acta {registro.clave}: {resultado}")
+            elif resultado and resultado[1]:
+                lote.append(resultado)
+            else:
+                probados.append((int(registro.clave), 'empty'))
+
+            if len(lote) >= BATCH_ACTAS:
+                votos += volcar(lote, probados)
+                actas += len(lote)
+                lote, probados = [], []
+                logger.info(f"  Actas: {actas} | Votos: {votos} | {stats.resumen()}")
+
+        if lote or probados:
+            votos += volcar(lote, probados)
+            actas += len(lote)
+
+        logger.info(f"Reparse completo — Actas: {actas} | Votos: {votos}")
+
+    except Exception as e:
+        logger.error(f"Error fatal: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        archivo.close()
+
+
+def comparar_parsers(muestra=200, repeticiones=3):
+    """
+    Corre ambos backends sobre una muestra de actas archivadas: verifica que
+    devuelvan exactamente lo mismo y reporta páginas/seg de cada uno.
+    """
+    archivo = Archive()
+    registros = archivo.registros(FUENTE_ARCHIVO, status=200)
+    archivo.close()
+    if not registros:
+        logger.warning("No hay actas archivadas para comparar (correr la ingesta primero)")
+        return
+    paso = max(1, len(registros) // muestra)
+    paginas = [(int(r.clave), r.texto()) for r in registros[::paso][:muestra]]
+    logger.info(f"Muestra: {len(paginas)} actas archivadas")
+
+    distintas = [
+        acta_id for acta_id, html in paginas
+        if parsear_html_bs4(acta_id, html) != parsear_html_lxml(acta_id, html)
+    ]
+    if distintas:
+        logger.warning(f"  Salida distinta en {len(distintas)} actas: {distintas[:20]}")
+    else:
+        logger.info("  Salida idéntica en todas las actas de la muestra")
+
+    for backend, fn in BACKENDS.items():
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            for acta_id, html in paginas:
+                fn(acta_id, html)
+        segundos = time.perf_counter() - inicio
+        logger.info(f"  {backend:>5}: {len(paginas) * repeticiones / segundos:.1f} páginas/s")
+    return distintas
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Ingesta de votaciones del Senado")
+    parser.add_argument('--reparse', action='store_true',
+                        help="re-parsear el archivo local en vez de crawlear")
+    parser.add_argument('--workers', type=int, help="procesos de parseo para --reparse")
+    parser.add_argument('--parser', choices=sorted(BACKENDS), default='bs4',
+                        help="backend de parseo de detalleActa")
+    parser.add_argument('--bench-parser', action='store_true',
+                        help="comparar salida y velocidad de los backends sobre el archivo local")
+    parser.add_argument('--muestra', type=int, default=200, help="actas a usar en --bench-parser")
+    args = parser.parse_args()
+    if args.bench_parser:
+        comparar_parsers(muestra=args.muestra)
+    elif args.reparse:
+        reparsear(workers=args.workers, backend=args.parser)
+    else:
+        main(backend=args.parser)
@@ -1,7 +1,10 @@
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import text
 from src.database import SessionLocal
-from src.models import ActaCabecera
+from src import cache
+from src.http import build_session
+from src.bulk import copy_insert, asegurar_esquema
 from src.utils import logger
 import warnings
 warnings.filterwarnings('ignore')
@@ -13,69 +16,103 @@ URLS_CABECERA = [
     "https://datos.hcdn.gob.ar:443/dataset/59fff38a-0a79-405b-a11b-29bc8722891b/resource/c3c30d22-5b4f-4f4c-8873-cf298cb1ea53/download/votaciones-nominales-periodos-129-a-135-cabecera.csv",
 ]
 
+COLUMNAS = (
+    'acta_id', 'sesion_id', 'nroperiodo', 'tipo_periodo', 'reunion', 'fecha', 'hora',
+    'titulo', 'resultado', 'votos_afirmativos', 'votos_negativos', 'abstenciones', 'ausentes',
+    'camara',
+)
+
+def normalizar(df):
+    """Normalización vectorizada del frame combinado a las COLUMNAS de actas_cabecera."""
+    enteros = ['acta_id', 'nroperiodo', 'reunion', 'votos_afirmativos',
+               'votos_negativos', 'abstenciones', 'ausentes']
+    textos = ['sesion_id', 'tipo_periodo', 'hora', 'titulo', 'resultado']
+    vacia = pd.Series(pd.NA, index=df.index, dtype='string')
+    salida = pd.DataFrame(index=df.index)
+    for col in enteros:
+        salida[col] = pd.to_numeric(df.get(col, vacia), errors='coerce').astype('Int32')
+    for col in textos:
+        salida[col] = df.get(col, vacia).fillna('')
+    salida['fecha'] = pd.to_datetime(df.get('fecha', vacia), errors='coerce', format='mixed').dt.date
+    salida['camara'] = 'Diputados'
+    salida = salida.dropna(subset=['acta_id']).drop_duplicates(subset=['acta_id'])
+    return salida[list(COLUMNAS)]
+
 def main():
     logger.info("=== INGESTA CABECERA VOTACIONES ===")
     session = SessionLocal()
 
     try:
-        # Cargar y combinar todos los CSVs
-        dfs = []
-        for url in URLS_CABECERA:
+        asegurar_esquema(session)
+
+        # Descargar (o revalidar en cache) los CSVs en paralelo
+        http = build_session(pool_size=len(URLS_CABECERA))
+        with ThreadPoolExecutor(max_workers=len(URLS_CABECERA)) as pool:
+            futuros = {
+                url: pool.submit(cache.fetch, url, consumer='ingestar_cabecera', session=http)
+                for url in URLS_CABECERA
+            }
+        descargas = []
+        for url, futuro in futuros.items():
             try:
-                logger.info(f"Descargando: {url.split('/')[-1]}")
-                df_temp = pd.read_csv(url, encoding='utf-8')
-                df_temp.columns = df_temp.columns.str.lower().str.strip()
-                dfs.append(df_temp)
-                logger.info(f"  {len(df_temp)} registros")
+                descargas.append(futuro.result())
             except Exception as e:
                 logger.warning(f"No se pudo descargar {url}: {e}")
 
-        df = pd.concat(dfs, ignore_index=True)
-        df = df.drop_duplicates(subset=['acta_id'])
-        logger.info(f"Total registros cabecera combinados: {len(df)}")
+        if not any(d.changed for d in descargas):
+            logger.info("Cabeceras sin cambios desde la última ingesta — nada que hacer")
+            return
 
-        # Cache de acta_ids ya existentes
-        existentes = {
-            row[0] for row in session.execute(text("SELECT acta_id FROM actas_cabecera")).fetchall()
-        }
-        logger.info(f"Ya en DB: {len(existentes)}")
-
-        nuevos = 0
-        for _, row in df.iterrows():
-            acta_id = row.get('acta_id')
-            if pd.isna(acta_id) or int(acta_id) in existentes:
-                continue
+        # Cargar y combinar todos los CSVs (todo como texto: los tipos se fijan una vez en normalizar)
+        dfs = []
+        for descarga in descargas:
+            df_temp = pd.read_csv(descarga.path, encoding='utf-8', dtype='string')
+            df_temp.columns = df_temp.columns.str.lower().str.strip()
+            dfs.append(df_temp)
+            logger.info(f"  {len(df_temp)} registros")
 
-            fecha = None
-            try:
-                fecha = pd.to_datetime(row.get('fecha')).date()
-            except:
-                pass
+        df = normalizar(pd.concat(dfs, ignore_index=True))
+        logger.info(f"Total registros cabecera combinados: {len(df)}")
 
-            session.add(ActaCabecera(
-                acta_id=int(acta_id),
-                sesion_id=str(row.get('sesion_id', '')),
-                nroperiodo=int(row['nroperiodo']) if not pd.isna(row.get('nroperiodo')) else None,
-                tipo_periodo=str(row.get('tipo_periodo', '')),
-                reunion=int(row['reunion']) if not pd.isna(row.get('reunion')) else None,
-                fecha=fecha,
-                hora=str(row.get('hora', '')),
-                titulo=str(row.get('titulo', '')),
-                resultado=str(row.get('resultado', '')),
-                votos_afirmativos=int(row['votos_afirmativos']) if not pd.isna(row.get('votos_afirmativos')) else None,
-                votos_negativos=int(row['votos_negativos']) if not pd.isna(row.get('votos_negativos')) else None,
-                abstenciones=int(row['abstenciones']) if not pd.isna(row.get('abstenciones')) else None,
-                ausentes=int(row['ausentes']) if not pd.isna(row.get('ausentes')) else None,
-            ))
-            existentes.add(int(acta_id))
-            nuevos += 1
+        # ✅ Anti-join en un solo paso contra los acta_id ya cargados de Diputados.
+        # Los placeholders de inferir_fechas_actas (fecha_inferida) no cuentan
+        # como existentes: la cabecera real los reemplaza.
+        cargadas = pd.DataFrame(
+            session.execute(text(
+                "SELECT acta_id, fecha_inferida FROM actas_cabecera WHERE camara = 'Diputados'"
+            )).fetchall(),
+            columns=['acta_id', 'fecha_inferida'],
+        )
+        es_inferida = cargadas['fecha_inferida'].astype(bool)
+        inferidas = cargadas.loc[es_inferida, 'acta_id'].astype('Int32')
+        existentes = cargadas.loc[~es_inferida, 'acta_id'].astype('Int32')
+        nuevas = df[~df['acta_id'].isin(existentes) & ~df['acta_id'].isin(inferidas)]
+        reemplazos = df[df['acta_id'].isin(inferidas)]
+        saltados = len(df) - len(nuevas) - len(reemplazos)
 
-            if nuevos % 500 == 0:
-                session.commit()
-                logger.info(f"  {nuevos} actas insertadas...")
+        # ✅ Un solo COPY (ON CONFLICT (camara, acta_id) queda como red de seguridad)
+        nuevos, en_conflicto = copy_insert(
+            session, 'actas_cabecera', COLUMNAS, nuevas.itertuples(index=False),
+            conflict="(camara, acta_id)"
+        )
 
+        # Upsert de las inferidas: solo pisa filas que siguen siendo placeholder
+        reemplazadas = 0
+        if not reemplazos.empty:
+            reemplazadas, _ = copy_insert(
+                session, 'actas_cabecera', COLUMNAS + ('fecha_inferida',),
+                reemplazos.assign(fecha_inferida=False).itertuples(index=False),
+                conflict="(camara, acta_id)",
+                update_columns=[c for c in COLUMNAS if c not in ('acta_id', 'camara')] + ['fecha_inferida'],
+                update_where="actas_cabecera.fecha_inferida",
+            )
         session.commit()
-        logger.info(f"Actas insertadas: {nuevos}")
+        for descarga in descargas:
+            descarga.mark_processed()
+        logger.info(
+            f"Actas insertadas: {nuevos} | Inferidas reemplazadas: {reemplazadas} | "
+            f"Ya existían: {saltados + en_conflicto}"
+        )
 
     except Exception as e:
         logger.error(f"Error: {e}")
@@ -85,4 +122,4 @@ def main():
         session.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,9 +1,10 @@
-import requests
 import pandas as pd
-from io import StringIO
 from sqlalchemy import text
-from src.database import SessionLocal
-from src.utils import logger
+from src.database import SessionLocal, Base, engine
+from src.utils import logger, IdentityResolver
+import src.models  # noqa: F401 — registra los modelos para create_all
+from src import cache
+from src.bulk import copy_insert
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -15,13 +16,80 @@ CARGOS_ELECTOS = {
     'DIPUTADA DE LA NACION ARGENTINA', 'DIPUTADO DE LA NACION ARGENTINA'
 }
 
-def limpiar_monto(val):
-    if pd.isna(val) or str(val).strip() in ['-00', '', '---']:
-        return 0.0
-    try:
-        return float(str(val).strip().replace('-', '.'))
-    except:
-        return 0.0
+COLUMNAS = (
+    'legislador_id', 'cuit', 'anio', 'funcionario_apellido_nombre',
+    'organismo', 'cargo', 'total_bienes', 'total_deudas',
+    'patrimonio_neto', 'ingresos_neto_gastos',
+    'proveedor_contratista', 'tipo_declaracion', 'rectificativa',
+)
+
+def limpiar_montos(serie):
+    """Montos del CSV ('1234-56', '-00', '---') a float, vectorizado. Lo no parseable queda en 0."""
+    texto = serie.astype('string').str.strip()
+    texto = texto.mask(texto.isin(['-00', '', '---']))
+    return pd.to_numeric(texto.str.replace('-', '.', regex=False), errors='coerce').fillna(0.0)
+
+def cruzar_por_cuit(session, cuits):
+    """
+    legislador_id por CUIT limpio contra legisladores.dni_cuit: primero CUIT
+    completo, después el DNI contenido en el CUIT (posiciones 3 a 10).
+    Devuelve (ids, metodo) como Series alineadas con `cuits`.
+    """
+    legisladores = pd.DataFrame(
+        session.execute(text(
+            "SELECT id, dni_cuit FROM legisladores WHERE dni_cuit IS NOT NULL"
+        )).fetchall(),
+        columns=['id', 'dni_cuit'],
+    )
+    claves = legisladores['dni_cuit'].astype('string').str.replace(r'\D', '', regex=True).str.lstrip('0')
+    por_clave = dict(zip(claves, legisladores['id']))
+
+    cuits = cuits.astype('string').str.replace(r'\D', '', regex=True)
+    por_cuit = cuits.str.lstrip('0').map(por_clave)
+    por_dni = cuits.where(cuits.str.len() == 11).str[2:10].str.lstrip('0').map(por_clave)
+
+    ids = por_cuit.fillna(por_dni).astype('Int64')
+    metodo = pd.Series(pd.NA, index=cuits.index, dtype='string')
+    metodo[por_cuit.notna()] = 'cuit'
+    metodo[por_cuit.isna() & por_dni.notna()] = 'dni'
+    return ids, metodo
+
+def filtrar_electos(df):
+    """Filas de legisladores electos con montos limpios y patrimonio neto calculado."""
+    leg = df[df['organismo'].str.contains('DIPUTADOS|SENADO', case=False, na=False)]
+    electos = leg[leg['cargo'].str.upper().str.strip().isin(CARGOS_ELECTOS)].copy()
+
+    # Limpiar montos
+    for col in ['total_bienes_final', 'total_deudas_final', 'ingresos_neto_gastos']:
+        electos[col] = limpiar_montos(electos[col])
+    electos['patrimonio_neto'] = electos['total_bienes_final'] - electos['total_deudas_final']
+    electos['funcionario_apellido_nombre'] = electos['funcionario_apellido_nombre'].astype(str).str.strip()
+    return electos
+
+def cruzar_legisladores(session, electos):
+    """
+    Agrega legislador_id y metodo (cuit / dni / nombre / sin_match) a `electos`
+    y loguea la tasa de match por método.
+    """
+    # 1. Match fuerte: CUIT (o el DNI dentro del CUIT) contra legisladores.dni_cuit
+    electos['legislador_id'], electos['metodo'] = cruzar_por_cuit(session, electos['cuit'])
+
+    # 2. El resto: una sola pasada por el resolver compartido (alias → exacto → fuzzy) con nombre completo
+    resto = electos['legislador_id'].isna()
+    ids_por_nombre = IdentityResolver.resolve_many(
+        session, electos.loc[resto, 'funcionario_apellido_nombre'].unique(),
+        create=False, source='ddjj'
+    )
+    por_nombre = electos.loc[resto, 'funcionario_apellido_nombre'].map(ids_por_nombre).astype('Int64')
+    electos.loc[resto, 'legislador_id'] = por_nombre
+    electos.loc[resto & electos['legislador_id'].notna(), 'metodo'] = 'nombre'
+    electos['metodo'] = electos['metodo'].fillna('sin_match')
+
+    tasas = electos['metodo'].value_counts()
+    logger.info("Match por método: " + ' | '.join(
+        f"{metodo}={n} ({n / len(electos):.1%})" for metodo, n in tasas.items()
+    ))
+    return electos
 
 def crear_tabla(session):
     session.execute(text("""
@@ -47,90 +115,52 @@ def crear_tabla(session):
     session.commit()
     logger.info("Tabla ddjj_legisladores creada/verificada")
 
-def cruzar_legislador(session, apellido_nombre):
-    """Cruzar por apellido con tabla legisladores."""
-    # El formato es 'APELLIDO NOMBRE' — tomamos primera palabra como apellido
-    partes = apellido_nombre.strip().split()
-    if not partes:
-        return None
-    apellido = partes[0]
-    
-    result = session.execute(text("""
-        SELECT id FROM legisladores 
-        WHERE nombre_completo ILIKE :apellido
-        LIMIT 1
-    """), {"apellido": f"%{apellido}%"})
-    row = result.fetchone()
-    return row[0] if row else None
-
 def main():
     logger.info("=== INGESTA DDJJ LEGISLADORES ===")
     
     logger.info("Descargando CSV...")
-    r = requests.get(URL_DDJJ, timeout=120, verify=False)
-    df = pd.read_csv(StringIO(r.text), sep=',', encoding='utf-8-sig', on_bad_lines='skip')
+    descarga = cache.fetch(URL_DDJJ, consumer='ingestar_ddjj', timeout=120)
+    if not descarga.changed:
+        logger.info("CSV de DDJJ sin cambios desde la última ingesta — nada que hacer")
+        return
+    df = pd.read_csv(descarga.path, sep=',', encoding='utf-8-sig', on_bad_lines='skip', dtype={'cuit': 'string'})
     logger.info(f"Total registros: {len(df)}")
 
-    # Filtrar legisladores electos
-    leg = df[df['organismo'].str.contains('DIPUTADOS|SENADO', case=False, na=False)]
-    electos = leg[leg['cargo'].str.upper().str.strip().isin(CARGOS_ELECTOS)].copy()
+    electos = filtrar_electos(df)
     logger.info(f"Legisladores electos: {len(electos)}")
 
-    # Limpiar montos
-    for col in ['total_bienes_final', 'total_deudas_final', 'ingresos_neto_gastos']:
-        electos[col] = electos[col].apply(limpiar_monto)
-    electos['patrimonio_neto'] = electos['total_bienes_final'] - electos['total_deudas_final']
-
+    Base.metadata.create_all(bind=engine)
     session = SessionLocal()
     try:
         crear_tabla(session)
-        
-        # Limpiar datos previos del año
-        session.execute(text("DELETE FROM ddjj_legisladores WHERE anio = 2024"))
-        session.commit()
 
-        insertados = 0
-        sin_match = []
-
-        for _, row in electos.iterrows():
-            nombre = str(row['funcionario_apellido_nombre']).strip()
-            leg_id = cruzar_legislador(session, nombre)
-            
-            if not leg_id:
-                sin_match.append(nombre)
-
-            session.execute(text("""
-                INSERT INTO ddjj_legisladores (
-                    legislador_id, cuit, anio, funcionario_apellido_nombre,
-                    organismo, cargo, total_bienes, total_deudas,
-                    patrimonio_neto, ingresos_neto_gastos,
-                    proveedor_contratista, tipo_declaracion, rectificativa
-                ) VALUES (
-                    :leg_id, :cuit, :anio, :nombre,
-                    :organismo, :cargo, :bienes, :deudas,
-                    :patrimonio, :ingresos,
-                    :proveedor, :tipo, :rectif
-                )
-            """), {
-                'leg_id': leg_id,
-                'cuit': str(row.get('cuit', '')),
-                'anio': int(row.get('anio', 2024)),
-                'nombre': nombre,
-                'organismo': str(row.get('organismo', '')),
-                'cargo': str(row.get('cargo', '')),
-                'bienes': float(row['total_bienes_final']),
-                'deudas': float(row['total_deudas_final']),
-                'patrimonio': float(row['patrimonio_neto']),
-                'ingresos': float(row.get('ingresos_neto_gastos', 0) or 0),
-                'proveedor': str(row.get('proveedor_contratista', '')),
-                'tipo': str(row.get('tipo_declaracion_jurada_descripcion', '')),
-                'rectif': bool(row.get('rectificativa', 0)),
-            })
-            insertados += 1
+        electos = cruzar_legisladores(session, electos)
+
+        salida = pd.DataFrame({
+            'legislador_id': electos['legislador_id'],
+            'cuit': electos['cuit'].astype('string').fillna(''),
+            'anio': pd.to_numeric(electos['anio'], errors='coerce').fillna(2024).astype(int),
+            'funcionario_apellido_nombre': electos['funcionario_apellido_nombre'],
+            'organismo': electos['organismo'].astype('string').fillna(''),
+            'cargo': electos['cargo'].astype('string').fillna(''),
+            'total_bienes': electos['total_bienes_final'],
+            'total_deudas': electos['total_deudas_final'],
+            'patrimonio_neto': electos['patrimonio_neto'],
+            'ingresos_neto_gastos': electos['ingresos_neto_gastos'],
+            'proveedor_contratista': electos['proveedor_contratista'].astype('string').fillna(''),
+            'tipo_declaracion': electos['tipo_declaracion_jurada_descripcion'].astype('string').fillna(''),
+            'rectificativa': electos['rectificativa'].fillna(0).astype(bool),
+        }, columns=COLUMNAS)
 
+        # ✅ Reemplazo de los años del CSV + COPY en una sola transacción
+        anios = [int(a) for a in salida['anio'].unique()]
+        session.execute(text("DELETE FROM ddjj_legisladores WHERE anio = ANY(:anios)"), {'anios': anios})
+        insertados, _ = copy_insert(session, 'ddjj_legisladores', COLUMNAS, salida.itertuples(index=False))
         session.commit()
+        descarga.mark_processed()
         logger.info(f"Insertados: {insertados}")
-        logger.info(f"Sin match con legisladores ({len(sin_match)}): {sin_match[:10]}")
+        sin_match = electos.loc[electos['metodo'] == 'sin_match', 'funcionario_apellido_nombre'].unique()
+        logger.info(f"Sin match con legisladores ({len(sin_match)}): {list(sin_match[:10])}")
 
     except Exception as e:
         session.rollback()
@@ -0,0 +1,191 @@
+"""
+Serie histórica de DDJJ de legisladores (2012 → hoy) en ddjj_historico.
+
+Los recursos anuales del dataset de DDJJ se descubren vía CKAN y se bajan y
+parsean en paralelo (un proceso por recurso). Un recurso cuyo contenido no
+cambió desde la última corrida se saltea (hash del cache de descargas), así
+que sumar un año nuevo cuesta procesar un solo archivo. Las filas se upsertean
+por (cuit, anio, tipo_declaracion): nunca se borra un año entero.
+
+Uso: python ingestar_ddjj_historico.py [--forzar] [--workers N]
+"""
+import argparse
+import re
+import requests
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from sqlalchemy import text
+from src import cache
+from src.bulk import copy_insert
+from src.database import SessionLocal, Base, engine
+from src.utils import logger
+import src.models  # noqa: F401 — registra los modelos para create_all
+from ingestar_ddjj import URL_DDJJ, filtrar_electos, cruzar_legisladores
+import warnings
+warnings.filterwarnings('ignore')
+
+CKAN_JUS = "https://datos.jus.gob.ar/api/3/action"
+DATASET_DDJJ = "4680199f-6234-4262-8a2a-8f7993bf784d"
+RE_RECURSO = re.compile(r'/ddjj-(\d{4})[^/]*\.csv$', re.IGNORECASE)   # ddjj-2024-12-22.csv
+ANIO_DESDE = 2012
+WORKERS = 4
+CONSUMER = 'ingestar_ddjj_historico'
+
+# Columnas del CSV que hacen falta (el resto no se parsea)
+NECESARIAS = {
+    'cuit', 'anio', 'funcionario_apellido_nombre', 'organismo', 'cargo',
+    'total_bienes_final', 'total_deudas_final', 'ingresos_neto_gastos',
+    'tipo_declaracion_jurada_descripcion',
+}
+
+COLUMNAS = (
+    'cuit', 'anio', 'tipo_declaracion', 'funcionario_apellido_nombre', 'legislador_id',
+    'patrimonio_neto', 'total_bienes', 'total_deudas', 'ingresos_neto_gastos', 'cargo',
+)
+CLAVE = ('cuit', 'anio', 'tipo_declaracion')
+
+
+def descubrir_recursos():
+    """(anio, url) de cada CSV anual de DDJJ del dataset, desde ANIO_DESDE."""
+    try:
+        r = requests.get(f"{CKAN_JUS}/package_show", params={'id': DATASET_DDJJ},
+                         timeout=60, verify=False)
+        r.raise_for_status()
+        recursos = set()
+        for recurso in r.json()['result']['resources']:
+            match = RE_RECURSO.search(recurso.get('url', ''))
+            if match and int(match.group(1)) >= ANIO_DESDE:
+                recursos.add((int(match.group(1)), recurso['url']))
+        if recursos:
+            return sorted(recursos)
+        logger.warning("El dataset no listó recursos anuales de DDJJ")
+    except Exception as e:
+        logger.warning(f"No se pudo listar el dataset de DDJJ: {e}")
+    return [(2024, URL_DDJJ)]
+
+
+def crear_tabla(session):
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS ddjj_historico (
+            id SERIAL PRIMARY KEY,
+            cuit VARCHAR NOT NULL,
+            anio INTEGER NOT NULL,
+            tipo_declaracion VARCHAR NOT NULL DEFAULT '',
+            funcionario_apellido_nombre VARCHAR,
+            legislador_id INTEGER REFERENCES legisladores(id),
+            patrimonio_neto NUMERIC,
+            total_bienes NUMERIC,
+            total_deudas NUMERIC,
+            ingresos_neto_gastos NUMERIC,
+            cargo VARCHAR
+        )
+    """))
+    # Tablas armadas a mano antes de este script: deduplicar una vez para poder crear la clave
+    if not session.execute(text("SELECT to_regclass('ux_ddjj_historico_clave')")).scalar():
+        session.execute(text("UPDATE ddjj_historico SET tipo_declaracion = '' WHERE tipo_declaracion IS NULL"))
+        borrados = session.execute(text("""
+            DELETE FROM ddjj_historico a
+            USING ddjj_historico b
+            WHERE a.id < b.id
+              AND a.cuit = b.cuit AND a.anio = b.anio AND a.tipo_declaracion = b.tipo_declaracion
+        """)).rowcount
+        session.execute(text(
+            "CREATE UNIQUE INDEX ux_ddjj_historico_clave ON ddjj_historico (cuit, anio, tipo_declaracion)"
+        ))
+        if borrados:
+            logger.info(f"ddjj_historico: {borrados} filas duplicadas borradas")
+    session.execute(text("CREATE INDEX IF NOT EXISTS idx_ddjj_historico_legislador ON ddjj_historico(legislador_id)"))
+    session.commit()
+    logger.info("Tabla ddjj_historico creada/verificada")
+
+
+def procesar_recurso(url, forzar=False):
+    """
+    Worker: baja (o revalida en cache) un CSV anual y devuelve (descarga, electos).
+    electos es None si el contenido no cambió desde la última ingesta.
+    """
+    descarga = cache.fetch(url, consumer=CONSUMER, timeout=180)
+    if not (descarga.changed or forzar):
+        return descarga, None
+    df = pd.read_csv(
+        descarga.path, sep=',', encoding='utf-8-sig', on_bad_lines='skip',
+        usecols=lambda c: c.strip() in NECESARIAS, dtype={'cuit': 'string'},
+    )
+    df.columns = df.columns.str.strip()
+    return descarga, filtrar_electos(df)
+
+
+def armar_filas(electos):
+    salida = pd.DataFrame({
+        'cuit': electos['cuit'].astype('string').str.replace(r'\D', '', regex=True),
+        'anio': pd.to_numeric(electos['anio'], errors='coerce').astype('Int64'),
+        'tipo_declaracion': electos['tipo_declaracion_jurada_descripcion'].astype('string').fillna(''),
+        'funcionario_apellido_nombre': electos['funcionario_apellido_nombre'],
+        'legislador_id': electos['legislador_id'],
+        'patrimonio_neto': electos['patrimonio_neto'],
+        'total_bienes': electos['total_bienes_final'],
+        'total_deudas': electos['total_deudas_final'],
+        'ingresos_neto_gastos': electos['ingresos_neto_gastos'],
+        'cargo': electos['cargo'].astype('string').fillna(''),
+    }, columns=COLUMNAS)
+    salida = salida.dropna(subset=['anio'])
+    salida = salida[salida['cuit'].fillna('') != '']
+    # Una fila por clave (el upsert no puede tocar la misma fila dos veces en un lote)
+    return salida.drop_duplicates(subset=list(CLAVE), keep='last')
+
+
+def main(forzar=False, workers=WORKERS):
+    logger.info("=== INGESTA DDJJ HISTÓRICO ===")
+    recursos = descubrir_recursos()
+    logger.info(f"Recursos anuales: {len(recursos)} ({recursos[0][0]}–{recursos[-1][0]})")
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        crear_tabla(session)
+
+        sin_cambios = 0
+        total = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {pool.submit(procesar_recurso, url, forzar): anio for anio, url in recursos}
+            for futuro in as_completed(futuros):
+                anio = futuros[futuro]
+                try:
+                    descarga, electos = futuro.result()
+                except Exception as e:
+                    logger.warning(f"  {anio}: error bajando/parseando — {e}")
+                    continue
+                if electos is None:
+                    sin_cambios += 1
+                    logger.info(f"  {anio}: sin cambios, se saltea")
+                    continue
+
+                # Escritura en el proceso principal, un recurso por transacción
+                electos = cruzar_legisladores(session, electos)
+                filas = armar_filas(electos)
+                escritas, _ = copy_insert(
+                    session, 'ddjj_historico', COLUMNAS, filas.itertuples(index=False),
+                    conflict=f"({', '.join(CLAVE)})",
+                    update_columns=[c for c in COLUMNAS if c not in CLAVE],
+                )
+                session.commit()
+                descarga.mark_processed()
+                total += escritas
+                logger.info(f"  {anio}: {escritas} filas upserteadas")
+
+        logger.info(f"Histórico completo — upserts: {total} | recursos sin cambios: {sin_cambios}/{len(recursos)}")
+
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error: {e}")
+        raise
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingesta de la serie histórica de DDJJ")
+    parser.add_argument('--forzar', action='store_true', help="reprocesar aunque el recurso no haya cambiado")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="procesos de descarga/parseo")
+    args = parser.parse_args()
+    main(forzar=args.forzar, workers=args.workers)
@@ -1,48 +1,159 @@
-import requests
+import numpy as np
 import pandas as pd
-from io import StringIO
-from src.database import SessionLocal
+from sqlalchemy import String, Integer, column, update, values
+from src import cache
+from src.bulk import copy_insert, asegurar_esquema
+from src.database import SessionLocal, Base, engine
 from src.models import Sesion
 from src.utils import logger
+import src.models  # noqa: F401 — registra los modelos para create_all
 import warnings
 warnings.filterwarnings('ignore')
 
 URL = "https://datos.hcdn.gob.ar/dataset/f744ea10-83b4-4493-8bef-6fc9fb9e41e9/resource/4ac70a51-a82d-4290-8a73-d7f8ec38d5a0/download/sesiones.csv"
+URL_PERIODOS = "https://datos.hcdn.gob.ar:443/dataset/b2081b7c-0fd5-4ea5-804d-daec6c97176e/resource/a3ccd8d8-800b-49bf-bcc5-564e3c51489d/download/periodosparlamentarios1.6.csv"
+
+TIPOS_PERIODO = {'O': 'Ordinaria', 'E': 'Extraordinaria', 'D': 'Prórroga'}
+SIN_CLASIFICAR = 'Sin clasificar'
+
+COLUMNAS = ('fecha', 'anio', 'tipo_periodo', 'tipo_reunion', 'duracion_horas', 'hubo_quorum', 'periodo_id')
+DERIVADAS = ('anio', 'tipo_periodo', 'duracion_horas')
+
+
+def cargar_periodos(path):
+    """Períodos parlamentarios (HCDN142O, HCDN142E, ...) como nro_periodo, tipo_periodo, inicio, fin."""
+    df = pd.read_csv(path, encoding='utf-8-sig')
+    partes = df['ID'].astype('string').str.extract(r'HCDN(\d+)([OED])')
+    periodos = pd.DataFrame({
+        'nro_periodo': pd.to_numeric(partes[0], errors='coerce').astype('Int64'),
+        'tipo_periodo': partes[1].map(TIPOS_PERIODO),
+        'inicio': pd.to_datetime(df['Inicio'], errors='coerce', format='mixed').dt.normalize(),
+        'fin': pd.to_datetime(df['Fin'], errors='coerce', format='mixed').dt.normalize(),
+    })
+    return periodos.dropna().sort_values('inicio', ignore_index=True)
+
+
+def clasificar_periodos(fechas, nros, periodos):
+    """
+    Tipo de período de cada sesión: el rango [inicio, fin] de su nro_periodo que
+    contiene la fecha (comparando por día). Un solo merge_asof por nro_periodo en
+    lugar de filtrar la tabla de períodos fila por fila.
+    Devuelve una serie alineada con `fechas`; SIN_CLASIFICAR si ningún rango la contiene.
+    """
+    sesiones = pd.DataFrame({
+        'fecha': pd.to_datetime(fechas).dt.normalize(),
+        'nro_periodo': pd.array(nros, dtype='Int64'),
+    }, index=fechas.index).dropna()
+    tipos = pd.Series(SIN_CLASIFICAR, index=fechas.index, dtype='string')
+    if sesiones.empty or periodos.empty:
+        return tipos
+
+    # Para cada sesión, el último período de su número que empezó antes (o ese día)
+    cruce = pd.merge_asof(
+        sesiones.sort_values('fecha').reset_index(), periodos,
+        left_on='fecha', right_on='inicio', by='nro_periodo', direction='backward',
+    ).set_index('index')
+    dentro = cruce['fecha'] <= cruce['fin']
+    tipos.loc[cruce.index[dentro]] = cruce.loc[dentro, 'tipo_periodo']
+    return tipos
+
+
+def normalizar(df, periodos):
+    """Frame del CSV → COLUMNAS de sesiones, con año, duración y período calculados en bloque."""
+    inicio = pd.to_datetime(df['reunion_inicio'], errors='coerce', format='mixed')
+    if 'reunion_fin' in df:
+        fin = pd.to_datetime(df['reunion_fin'], errors='coerce', format='mixed')
+        duracion = (fin - inicio).dt.total_seconds() / 3600
+        duracion = duracion.fillna(pd.to_numeric(df.get('duracion_horas'), errors='coerce'))
+    else:
+        duracion = pd.to_numeric(df['duracion_horas'], errors='coerce')
+    if 'hubo_quorum' in df:
+        quorum = df['hubo_quorum']
+    else:
+        quorum = np.where(df['reunion_tipo'].astype('string').str.contains('Minoría', na=False), 'No', 'Sí')
+    nros = pd.to_numeric(df['periodo_id'].astype('string').str.extract(r'HCDN(\d+)R')[0], errors='coerce')
+    tipos = clasificar_periodos(inicio, nros, periodos)
+    if 'tipo_periodo' in df:
+        # Lo que no cae en ningún rango conserva la etiqueta que trae el CSV, si la hay
+        tipos = tipos.mask(tipos.eq(SIN_CLASIFICAR) & df['tipo_periodo'].notna(), df['tipo_periodo'])
+
+    salida = pd.DataFrame({
+        'fecha': inicio.dt.date,
+        'anio': inicio.dt.year.astype('Int32'),
+        'tipo_periodo': tipos,
+        'tipo_reunion': df['reunion_tipo'],
+        'duracion_horas': duracion.round(2).astype('string'),
+        'hubo_quorum': quorum,
+        'periodo_id': df['periodo_id'].astype('string'),
+    }, columns=COLUMNAS)
+    salida = salida[salida['periodo_id'].fillna('') != '']
+    return salida.drop_duplicates(subset=['periodo_id'], keep='last')
+
+
+def actualizar_derivadas(session, df):
+    """Recalcula año, tipo de período y duración de sesiones ya cargadas: un solo UPDATE ... FROM (VALUES ...)."""
+    if df.empty:
+        return 0
+    tabla = Sesion.__table__
+    nuevos = values(
+        column('periodo_id', String), column('anio', Integer),
+        column('tipo_periodo', String), column('duracion_horas', String),
+        name='nuevos',
+    ).data([
+        (periodo_id, None if pd.isna(anio) else int(anio),
+         None if pd.isna(tipo) else tipo, None if pd.isna(duracion) else duracion)
+        for periodo_id, anio, tipo, duracion in df[['periodo_id', *DERIVADAS]].itertuples(index=False)
+    ])
+    stmt = (
+        update(tabla)
+        .where(tabla.c.periodo_id == nuevos.c.periodo_id)
+        .where(
+            tabla.c.anio.is_distinct_from(nuevos.c.anio)
+            | tabla.c.tipo_periodo.is_distinct_from(nuevos.c.tipo_periodo)
+            | tabla.c.duracion_horas.is_distinct_from(nuevos.c.duracion_horas)
+        )
+        .values({c: nuevos.c[c] for c in DERIVADAS})
+    )
+    return session.execute(stmt).rowcount
+
 
 def main():
     logger.info("=== INGESTA DE SESIONES ===")
+    Base.metadata.create_all(bind=engine)
     session = SessionLocal()
     try:
-        logger.info("Descargando CSV de sesiones...")
-        r = requests.get(URL, timeout=30, verify=False)
-        df = pd.read_csv(StringIO(r.text), encoding='utf-8-sig', on_bad_lines='skip')
-        logger.info(f"CSV cargado: {len(df)} sesiones")
+        asegurar_esquema(session)
+
+        logger.info("Descargando CSV de sesiones y períodos...")
+        descarga = cache.fetch(URL, consumer='ingestar_sesiones', timeout=30)
+        descarga_periodos = cache.fetch(URL_PERIODOS, consumer='ingestar_sesiones', timeout=30)
+        if not (descarga.changed or descarga_periodos.changed):
+            logger.info("CSV de sesiones y períodos sin cambios desde la última ingesta — nada que hacer")
+            return
+        df = pd.read_csv(descarga.path, encoding='utf-8-sig', on_bad_lines='skip')
+        periodos = cargar_periodos(descarga_periodos.path)
+        logger.info(f"CSV cargado: {len(df)} sesiones | {len(periodos)} períodos")
+
+        df = normalizar(df, periodos)
+        conteo = df['tipo_periodo'].value_counts()
+        logger.info("Clasificación: " + ', '.join(f"{tipo}={n}" for tipo, n in conteo.items()))
 
         existentes = {
-            s.periodo_id
-            for s in session.query(Sesion.periodo_id).all()
-            if s.periodo_id
+            periodo_id for (periodo_id,) in session.query(Sesion.periodo_id)
+            if periodo_id
         }
         logger.info(f"Sesiones ya en DB: {len(existentes)}")
 
-        nuevas = 0
-        for _, row in df.iterrows():
-            periodo_id = row.get('periodo_id')
-            if not periodo_id or periodo_id in existentes:
-                continue
-            session.add(Sesion(
-                fecha=pd.to_datetime(row.get('reunion_inicio')).date() if pd.notna(row.get('reunion_inicio')) else None,
-                tipo_periodo=row.get('tipo_periodo'),
-                tipo_reunion=row.get('reunion_tipo'),
-                duracion_horas=str(round(row.get('duracion_horas', 0), 2)),
-                hubo_quorum=row.get('hubo_quorum'),
-                periodo_id=periodo_id,
-            ))
-            existentes.add(periodo_id)
-            nuevas += 1
+        es_nueva = ~df['periodo_id'].isin(existentes)
+        nuevas, _ = copy_insert(
+            session, 'sesiones', COLUMNAS, df[es_nueva].itertuples(index=False)
+        )
+        actualizadas = actualizar_derivadas(session, df[~es_nueva])
 
         session.commit()
-        logger.info(f"Sesiones insertadas: {nuevas}")
+        descarga.mark_processed()
+        descarga_periodos.mark_processed()
+        logger.info(f"Sesiones insertadas: {nuevas} | reclasificadas: {actualizadas}")
     except Exception as e:
         logger.error(f"Error: {e}")
         session.rollback()
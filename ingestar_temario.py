@@ -1,78 +1,405 @@
-import pandas as pd
-from src.database import SessionLocal
-from src.models import Sesion
+"""
+Temario de las sesiones (sumario del diario de sesiones) en temario_items.
+
+Los diarios de un período se descubren en el listado de dtaquigrafos/diarios
+(o se arman desde fecha + reunión de las sesiones cargadas) y se procesan en
+un pool de procesos: cada worker baja el PDF, lo guarda en el archivo crudo y
+hace el análisis de layout página por página solo hasta encontrar el sumario.
+El texto extraído se cachea por hash del PDF, así que re-correr no vuelve a
+pasar por pdfminer. Los ítems se escriben en bloque al final. Las sesiones
+sin diario o sin sumario quedan en temario_intentos y se re-prueban con espera
+creciente; al re-probar, el GET es condicional (ETag / Last-Modified del último
+diario archivado) y si el PDF no cambió la sesión se saltea sin re-procesarlo.
+Con --reparse se re-parsean los diarios archivados sin pedir nada a hcdn.gob.ar.
+
+Uso: python ingestar_temario.py [--periodo N ...] [--forzar] [--reparse] [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from io import BytesIO
+from pathlib import Path
+
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LTTextContainer
+from sqlalchemy import text
+
+from src.archive import Archive, replay
+from src.bulk import copy_insert
+from src.database import SessionLocal, Base, engine
+from src.http import build_session
 from src.utils import logger
+import src.models  # noqa: F401 — registra los modelos para create_all
+import warnings
+warnings.filterwarnings('ignore')
+
+BASE_URL = "https://www3.hcdn.gob.ar/dependencias/dtaquigrafos/diarios"
+RE_DIARIO = re.compile(r'diario_(\d{8})(\d+)\.pdf', re.IGNORECASE)   # diario_2024013112.pdf → reunión 12
+RE_PERIODO_ID = re.compile(r'^HCDN(\d+)R(\d+)$')
+RE_ITEM = re.compile(r'^\s*\d+\.\s+\w', re.MULTILINE)
+RE_SUMARIO = re.compile(r'(\d+)\.\s+(.+?)(?=\n\s*\d+\.\s+|\Z)', re.DOTALL)
+
+MAX_PAGINAS = 10        # el sumario está siempre al principio del diario
+MIN_ITEMS_SUMARIO = 3   # página con al menos 3 ítems numerados = es el sumario
+WORKERS = 4
+REPROBAR_DIAS = 7       # sesión sin sumario / sin diario: se re-prueba con espera creciente...
+REPROBAR_MAX_DIAS = 180 # ...hasta este tope
+TEXTO_DIR = Path(os.getenv('LOBBY_TEMARIO_DIR', '.cache/temario'))
+FUENTE_ARCHIVO = 'hcdn.diario'
+
+COLUMNAS = ('sesion_id', 'item_nro', 'descripcion')
+
+
+# --- Extracción (corre en los workers) ---
+
+def extraer_sumario(pdf_bytes, max_paginas=MAX_PAGINAS):
+    """
+    Texto de la página del sumario. pdfminer analiza el layout de a una página
+    (extract_pages es un generador), así que se corta apenas aparece.
+    Devuelve {'paginas': páginas analizadas, 'sumario': texto o None}.
+    """
+    leidas = 0
+    for leidas, pagina in enumerate(extract_pages(BytesIO(pdf_bytes), maxpages=max_paginas), start=1):
+        texto = '\n'.join(e.get_text() for e in pagina if isinstance(e, LTTextContainer))
+        if len(RE_ITEM.findall(texto)) >= MIN_ITEMS_SUMARIO:
+            return {'paginas': leidas, 'sumario': texto}
+    return {'paginas': leidas, 'sumario': None}
+
+
+def parsear_sumario(texto):
+    """[(item_nro, descripcion)] de los ítems numerados del sumario."""
+    items = {}
+    for match in RE_SUMARIO.finditer(texto or ''):
+        contenido = ' '.join(match.group(2).split())
+        if len(contenido) > 10:  # filtrar ítems vacíos
+            items.setdefault(int(match.group(1)), contenido[:500])
+    return list(items.items())
+
+
+def _texto_cacheado(sha, pdf_bytes):
+    """extraer_sumario con cache en disco por hash del PDF."""
+    path = TEXTO_DIR / f"{sha}.json"
+    if path.exists():
+        return json.loads(path.read_text())
+    extraido = extraer_sumario(pdf_bytes)
+    TEXTO_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    tmp.write_text(json.dumps(extraido, ensure_ascii=False))
+    os.replace(tmp, path)
+    return extraido
+
+
+_recursos = {}
+
+def _worker():
+    """Session HTTP y archivo por proceso (se abren una vez por worker)."""
+    if not _recursos:
+        _recursos['http'] = build_session(pool_size=1)
+        _recursos['archivo'] = Archive()
+    return _recursos['http'], _recursos['archivo']
+
+
+def _validadores(registro):
+    """Headers de GET condicional a partir del último diario archivado de esa URL."""
+    if registro is None:
+        return {}
+    headers = {k.lower(): v for k, v in registro.headers.items()}
+    condicionales = {}
+    if headers.get('etag'):
+        condicionales['If-None-Match'] = headers['etag']
+    if headers.get('last-modified'):
+        condicionales['If-Modified-Since'] = headers['last-modified']
+    return condicionales
+
+
+def _items(pdf_bytes):
+    extraido = _texto_cacheado(hashlib.sha256(pdf_bytes).hexdigest(), pdf_bytes)
+    return extraido['paginas'], parsear_sumario(extraido['sumario'])
+
+
+def procesar_diario(url, clave, reusar=True):
+    """
+    Worker: baja (GET condicional) y archiva el diario; devuelve (páginas
+    analizadas, ítems del sumario). Si el PDF es el mismo que el último
+    archivado y no se pide `reusar`, devuelve None: la sesión ya se procesó
+    con esa fuente y re-procesarla daría lo mismo.
+    """
+    http, archivo = _worker()
+    previo = archivo.ultimo(FUENTE_ARCHIVO, url)
+    r = http.get(url, timeout=120, headers=_validadores(previo))
+    if r.status_code == 304:
+        contenido = previo.body()
+    else:
+        r.raise_for_status()
+        archivo.put_response(FUENTE_ARCHIVO, r, clave=clave)
+        contenido = r.content
+    if not reusar and previo is not None and hashlib.sha256(contenido).hexdigest() == previo.sha256:
+        return None
+    return _items(contenido)
+
+
+def _parsear_archivado(clave, pdf_bytes):
+    return _items(pdf_bytes)[1]
+
+
+# --- Descubrimiento y escritura (proceso principal) ---
+
+def asegurar_clave(session):
+    """Clave única (sesion_id, item_nro); la primera vez borra los duplicados de cargas anteriores."""
+    if session.execute(text("SELECT to_regclass('ux_temario_items_sesion_item')")).scalar():
+        return
+    borrados = session.execute(text("""
+        DELETE FROM temario_items a
+        USING temario_items b
+        WHERE a.id > b.id AND a.sesion_id = b.sesion_id AND a.item_nro = b.item_nro
+    """)).rowcount
+    session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_temario_items_sesion_item ON temario_items (sesion_id, item_nro)"
+    ))
+    session.commit()
+    if borrados:
+        logger.info(f"temario_items: {borrados} ítems duplicados borrados")
+
+
+def crear_tabla_intentos(session):
+    """Sesiones cuyo diario no está o no trae sumario, con la fecha del próximo intento."""
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS temario_intentos (
+            sesion_id INTEGER PRIMARY KEY REFERENCES sesiones(id),
+            estado VARCHAR NOT NULL,   -- sin_diario / sin_sumario
+            intentos INTEGER NOT NULL DEFAULT 0,
+            probado_en TIMESTAMP,
+            proximo_intento TIMESTAMP
+        )
+    """))
+    session.commit()
 
-# Necesitamos agregar un modelo TemarioItem - por ahora guardamos en la tabla sesiones
-# como campo de texto JSON, o creamos tabla nueva.
-# Opción simple: tabla temario_items
 
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
-from sqlalchemy.orm import relationship
-from src.database import Base, engine
+def registrar_intentos(session, fallidas, resueltas):
+    """
+    `fallidas`: [(sesion_id, estado)] → se re-prueban a los REPROBAR_DIAS * 2^intentos
+    (con tope); `resueltas`: sesion_ids con temario, que salen de la tabla.
+    """
+    if fallidas:
+        session.execute(text("""
+            INSERT INTO temario_intentos (sesion_id, estado, intentos, probado_en, proximo_intento)
+            VALUES (:sesion_id, :estado, 1, NOW(), NOW() + make_interval(days => :base_dias))
+            ON CONFLICT (sesion_id) DO UPDATE SET
+                estado = EXCLUDED.estado,
+                intentos = temario_intentos.intentos + 1,
+                probado_en = NOW(),
+                proximo_intento = NOW() + make_interval(days => LEAST(
+                    :max_dias, :base_dias * POWER(2, temario_intentos.intentos)
+                )::int)
+        """), [
+            {'sesion_id': sesion_id, 'estado': estado,
+             'base_dias': REPROBAR_DIAS, 'max_dias': REPROBAR_MAX_DIAS}
+            for sesion_id, estado in fallidas
+        ])
+    if resueltas:
+        session.execute(text("DELETE FROM temario_intentos WHERE sesion_id = ANY(:ids)"),
+                        {'ids': list(resueltas)})
 
-class TemarioItem(Base):
-    __tablename__ = 'temario_items'
-    
-    id = Column(Integer, primary_key=True, index=True)
-    sesion_id = Column(Integer, ForeignKey('sesiones.id'))
-    item_nro = Column(Integer)
-    descripcion = Column(Text)
 
-Base.metadata.create_all(bind=engine)
+def sesiones_pendientes(session, periodos=None, forzar=False):
+    """
+    {nro_periodo: [(sesion_id, periodo_id, reunion, fecha, diario_url, estado)]}
+    de las sesiones sin temario (todas con `forzar`). Las que ya fallaron esperan
+    a su proximo_intento en temario_intentos; `estado` es el del último intento
+    (None si nunca se probó). Sin `periodos`, solo el último período cargado.
+    """
+    filas = session.execute(text("""
+        SELECT s.id, s.periodo_id, s.fecha, s.diario_sesion_url,
+               EXISTS (SELECT 1 FROM temario_items t WHERE t.sesion_id = s.id) AS tiene_temario,
+               COALESCE(i.proximo_intento > NOW(), FALSE) AS en_espera,
+               i.estado
+        FROM sesiones s
+        LEFT JOIN temario_intentos i ON i.sesion_id = s.id
+        WHERE s.periodo_id LIKE 'HCDN%'
+    """)).fetchall()
 
-def main():
+    por_periodo = defaultdict(list)
+    for sesion_id, periodo_id, fecha, diario_url, tiene_temario, en_espera, estado in filas:
+        match = RE_PERIODO_ID.match(periodo_id or '')
+        if match and (forzar or not (tiene_temario or en_espera)):
+            nro, reunion = int(match.group(1)), int(match.group(2))
+            por_periodo[nro].append((sesion_id, periodo_id, reunion, fecha, diario_url, estado))
+    if not periodos:
+        periodos = [max(por_periodo)] if por_periodo else []
+    return {nro: por_periodo[nro] for nro in periodos if nro in por_periodo}
+
+
+def descubrir_diarios(http, periodo):
+    """{reunion: url} de los diarios listados en el directorio del período ({} si no hay listado)."""
+    try:
+        r = http.get(f"{BASE_URL}/periodo-{periodo}/", timeout=30)
+        r.raise_for_status()
+    except Exception as e:
+        logger.warning(f"  Período {periodo}: sin listado de diarios ({e}), se arman las URLs")
+        return {}
+    return {
+        int(match.group(2)): f"{BASE_URL}/periodo-{periodo}/{match.group(0)}"
+        for match in RE_DIARIO.finditer(r.text)
+    }
+
+
+def url_diario(periodo, reunion, fecha):
+    """URL del diario según la convención diario_AAAAMMDD<reunión>.pdf."""
+    if fecha is None:
+        return None
+    return f"{BASE_URL}/periodo-{periodo}/diario_{fecha:%Y%m%d}{reunion}.pdf"
+
+
+def main(periodos=None, forzar=False, workers=WORKERS):
     logger.info("=== INGESTA DE TEMARIO ===")
+    inicio = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
     session = SessionLocal()
-    
+
     try:
-        df = pd.read_csv('temario_extraordinarias.csv', encoding='utf-8-sig')
-        logger.info(f"CSV cargado: {len(df)} items")
-
-        # Cache de sesiones por periodo_id
-        sesiones = {s.periodo_id: s.id for s in session.query(Sesion).all()}
-        logger.info(f"Sesiones en DB: {len(sesiones)}")
-
-        # Cache de items ya existentes
-        existentes = {
-            (t.sesion_id, t.item_nro)
-            for t in session.query(TemarioItem.sesion_id, TemarioItem.item_nro).all()
-        }
-
-        nuevos = 0
-        sin_sesion = 0
-
-        for _, row in df.iterrows():
-            periodo_id = row.get('periodo_id')
-            sesion_id = sesiones.get(periodo_id)
-            
-            if not sesion_id:
-                sin_sesion += 1
-                continue
+        asegurar_clave(session)
+        crear_tabla_intentos(session)
+        pendientes = sesiones_pendientes(session, periodos, forzar)
+        if not pendientes:
+            logger.info("No hay sesiones sin temario — nada que hacer")
+            return
 
-            key = (sesion_id, int(row['item_nro']))
-            if key in existentes:
-                continue
+        http = build_session()
+        trabajos = {}   # sesion_id → (periodo_id, url, estado del último intento)
+        for periodo, sesiones in sorted(pendientes.items()):
+            listados = descubrir_diarios(http, periodo)
+            for sesion_id, periodo_id, reunion, fecha, diario_url, estado in sesiones:
+                url = listados.get(reunion) or diario_url or url_diario(periodo, reunion, fecha)
+                if url:
+                    trabajos[sesion_id] = (periodo_id, url, estado)
+            logger.info(f"  Período {periodo}: {len(sesiones)} sesiones pendientes, "
+                        f"{len(listados)} diarios listados")
+
+        filas, urls, fallidas = [], [], []
+        sin_diario = sin_sumario = sin_cambios = paginas = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Solo se re-procesa un diario igual al archivado si la sesión nunca se probó o con --forzar
+            futuros = {
+                pool.submit(procesar_diario, url, periodo_id, forzar or estado is None): sesion_id
+                for sesion_id, (periodo_id, url, estado) in trabajos.items()
+            }
+            for futuro in as_completed(futuros):
+                sesion_id = futuros[futuro]
+                periodo_id, url, estado = trabajos[sesion_id]
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    sin_diario += 1
+                    fallidas.append((sesion_id, 'sin_diario'))
+                    logger.warning(f"  {periodo_id}: sin diario ({e})")
+                    continue
+                if resultado is None:
+                    # Mismo PDF que en el intento anterior: sigue en espera creciente
+                    sin_cambios += 1
+                    fallidas.append((sesion_id, estado))
+                    continue
+                leidas, items = resultado
+                paginas += leidas
+                urls.append({'id': sesion_id, 'url': url})
+                if not items:
+                    sin_sumario += 1
+                    fallidas.append((sesion_id, 'sin_sumario'))
+                    logger.warning(f"  {periodo_id}: sumario no encontrado en {leidas} páginas")
+                filas.extend((sesion_id, nro, descripcion) for nro, descripcion in items)
+
+        insertados, _ = copy_insert(
+            session, 'temario_items', COLUMNAS, filas, conflict="(sesion_id, item_nro)",
+            update_columns=['descripcion'] if forzar else None,
+        )
+        if urls:
+            session.execute(text("UPDATE sesiones SET diario_sesion_url = :url WHERE id = :id"), urls)
+        registrar_intentos(session, fallidas, {sesion_id for sesion_id, _, _ in filas})
+        session.commit()
+
+        logger.info(f"Diarios procesados: {len(urls)}/{len(trabajos)} | sin diario: {sin_diario} | "
+                    f"sin sumario: {sin_sumario} | sin cambios: {sin_cambios} | páginas analizadas: {paginas}")
+        logger.info(f"Items insertados: {insertados} | {time.perf_counter() - inicio:.1f} s")
 
-            session.add(TemarioItem(
-                sesion_id=sesion_id,
-                item_nro=int(row['item_nro']),
-                descripcion=row.get('descripcion')
-            ))
-            existentes.add(key)
-            nuevos += 1
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def reparsear(workers=WORKERS):
+    """
+    Re-parsea los diarios archivados (FUENTE_ARCHIVO) con el parser actual del
+    sumario y reemplaza los ítems de esas sesiones, sin pedir nada a hcdn.gob.ar.
+    """
+    logger.info("=== REPARSE DE TEMARIO (desde archivo) ===")
+    inicio = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    archivo = Archive()
+    session = SessionLocal()
 
+    try:
+        asegurar_clave(session)
+        crear_tabla_intentos(session)
+        sesiones = dict(session.execute(text(
+            "SELECT periodo_id, id FROM sesiones WHERE periodo_id LIKE 'HCDN%'"
+        )).fetchall())
+
+        registros = archivo.registros(FUENTE_ARCHIVO, status=200)
+        logger.info(f"{FUENTE_ARCHIVO}: {len(registros)} diarios archivados")
+        items_por_sesion = {}
+        for registro, items in replay(registros, _parsear_archivado, workers=workers, binario=True):
+            if isinstance(items, Exception):
+                logger.warning(f"  Error parseando {registro.clave}: {items}")
+                continue
+            sesion_id = sesiones.get(registro.clave)
+            if sesion_id is None:
+                logger.warning(f"  {registro.clave}: sesión no encontrada en DB, salteando")
+                continue
+            # Registros en orden de id: si una sesión tiene varias URLs, gana el último diario
+            items_por_sesion[sesion_id] = items
+
+        filas = [
+            (sesion_id, nro, descripcion)
+            for sesion_id, items in items_por_sesion.items() for nro, descripcion in items
+        ]
+        insertados, _ = copy_insert(
+            session, 'temario_items', COLUMNAS, filas, conflict="(sesion_id, item_nro)",
+            update_columns=['descripcion'],
+        )
+        registrar_intentos(session, [], {sesion_id for sesion_id, _, _ in filas})
         session.commit()
-        logger.info(f"Items insertados: {nuevos}")
-        if sin_sesion:
-            logger.warning(f"Items sin sesion matching: {sin_sesion}")
+
+        sin_sumario = sum(not items for items in items_por_sesion.values())
+        logger.info(f"Diarios re-parseados: {len(items_por_sesion)} | sin sumario: {sin_sumario} | "
+                    f"ítems escritos: {insertados} | {time.perf_counter() - inicio:.1f} s")
 
     except Exception as e:
         logger.error(f"Error: {e}")
         session.rollback()
-        raise e
+        raise
     finally:
         session.close()
+        archivo.close()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Temario de sesiones desde los diarios en PDF")
+    parser.add_argument('--periodo', type=int, action='append',
+                        help="nro de período a procesar (repetible; default: el último cargado)")
+    parser.add_argument('--forzar', action='store_true',
+                        help="reprocesar también sesiones que ya tienen temario")
+    parser.add_argument('--reparse', action='store_true',
+                        help="re-parsear los diarios archivados en vez de descargarlos")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="procesos de extracción")
+    args = parser.parse_args()
+    if args.reparse:
+        reparsear(workers=args.workers)
+    else:
+        main(periodos=args.periodo, forzar=args.forzar, workers=args.workers)
@@ -1,10 +1,12 @@
 import sys
 import requests
 from datetime import datetime
+from itertools import repeat
 
 from src.database import engine, Base, SessionLocal
-from src.utils import logger, IdentityResolver
-from src.models import Legislador, Proyecto, Voto
+from src.utils import logger, IdentityResolver, peak_rss_mb
+from src.models import Legislador, Proyecto, SyncWatermark
+from src.bulk import load_votes, asegurar_esquema
 from src.extractors.api_client import ArgentinaDatosClient, OpenDataPortalClient
 
 def main():
@@ -14,12 +16,17 @@ def main():
     session = SessionLocal()
 
     try:
+        asegurar_esquema(session)
         api_client = ArgentinaDatosClient()
         portal_client = OpenDataPortalClient()
 
-        # PASO 1: INGESTA DE PROYECTOS (con paginación completa)
+        # PASO 1: INGESTA DE PROYECTOS (incremental por watermark de _id)
         logger.info("--- Iniciando Ingesta de Proyectos ---")
-        df_proyectos = portal_client.extract_hcdn_bills()
+        watermark = session.get(SyncWatermark, portal_client.RESOURCE_ID)
+        df_proyectos, nuevo_valor, schema_hash = portal_client.sync_hcdn_bills(
+            watermark=watermark.valor if watermark else None,
+            schema_hash=watermark.schema_hash if watermark else None,
+        )
 
         nuevos_proyectos_count = 0
         if not df_proyectos.empty:
@@ -56,25 +63,18 @@ def main():
             session.commit()
             logger.info(f"Se insertaron {nuevos_proyectos_count} proyectos nuevos.")
 
+        # ✅ El watermark avanza recién con los proyectos ya commiteados
+        if watermark is None:
+            watermark = SyncWatermark(recurso=portal_client.RESOURCE_ID)
+            session.add(watermark)
+        watermark.valor = nuevo_valor
+        watermark.schema_hash = schema_hash
+        session.commit()
+
         # ---------------------------------------------------------
         # PASO 2: VOTACIONES Y RESOLUCIÓN DE IDENTIDADES
         # ---------------------------------------------------------
         logger.info("--- Iniciando Ingesta de Votos e Identidades ---")
-        votos_data = api_client.get_votes_history("diputados")
-
-        # Resolver legisladores únicos
-        nombres_unicos = {
-            r.get('diputado_nombre') for r in votos_data
-            if r.get('diputado_nombre') and isinstance(r.get('diputado_nombre'), str)
-        }
-        logger.info(f"Procesando {len(nombres_unicos)} legisladores únicos...")
-
-        for nombre in nombres_unicos:
-            IdentityResolver.resolve_legislator(
-                session, nombre=nombre, dni_cuit=None,
-                camara='Diputados', bloque=None, distrito=None
-            )
-        session.commit()
 
         # ✅ Cache en memoria: evita query a DB por cada voto
         cache_legisladores = {
@@ -83,48 +83,58 @@ def main():
         }
         logger.info(f"Cache cargado: {len(cache_legisladores)} legisladores.")
 
-        # ✅ Deduplicación: traer acta_detalle_ids ya insertados
-        from src.models import Voto as VotoModel
-        ids_existentes = {
-            v.acta_detalle_id
-            for v in session.query(VotoModel.acta_detalle_id).all()
-            if v.acta_detalle_id is not None
-        }
-        logger.info(f"Votos ya existentes en DB: {len(ids_existentes)}")
-
-        logger.info("Insertando votos...")
+        # ✅ Si el CSV no cambió desde la última corrida exitosa, no hay nada que hacer
+        descarga = api_client.download_votes_history(consumer='main.votos')
         nuevos_votos = 0
         saltados = 0
+        if not descarga.changed:
+            logger.info("CSV de votaciones sin cambios: se saltea la ingesta de votos.")
+
+        # ✅ Se consume el CSV por bloques tipados: nunca se materializa la lista completa
+        chunks = api_client.iter_votes_history("diputados", path=descarga.path) if descarga.changed else []
+        for nro_bloque, chunk in enumerate(chunks, 1):
+            chunk = chunk.dropna(subset=['diputado_nombre'])
+
+            # Resolver solo los nombres que aparecen por primera vez
+            nombres_nuevos = [
+                n for n in chunk['diputado_nombre'].unique()
+                if isinstance(n, str) and n not in cache_legisladores
+            ]
+            if nombres_nuevos:
+                logger.info(f"Procesando {len(nombres_nuevos)} legisladores nuevos...")
+                cache_legisladores.update(IdentityResolver.resolve_many(
+                    session, nombres_nuevos, camara='Diputados'
+                ))
+            session.commit()
 
-        for registro in votos_data:
-            nombre = registro.get('diputado_nombre')
-            if not nombre or not isinstance(nombre, str):
-                continue
-
-            # ✅ Deduplicación por acta_detalle_id
-            acta_detalle_id = registro.get('acta_detalle_id')
-            if acta_detalle_id and acta_detalle_id in ids_existentes:
-                saltados += 1
-                continue
-
-            legislador_id = cache_legisladores.get(nombre)
-            if not legislador_id:
+            legislador_ids = chunk['diputado_nombre'].astype(object).map(cache_legisladores)
+            chunk = chunk.assign(legislador_id=legislador_ids).dropna(subset=['legislador_id'])
+            if chunk.empty:
                 continue
 
-            session.add(Voto(
-                legislador_id=legislador_id,
-                acta_detalle_id=acta_detalle_id,
-                acta_id=registro.get('acta_id'),
-                voto_individual=registro.get('voto'),
-            ))
-            nuevos_votos += 1
-
-            if nuevos_votos % 5000 == 0:
-                session.commit()
-                logger.info(f"  {nuevos_votos} votos insertados...")
+            # ✅ COPY a staging + INSERT ... ON CONFLICT: la deduplicación la hace la DB
+            filas = zip(
+                chunk['legislador_id'].astype('int64'),
+                chunk['acta_detalle_id'],
+                chunk['acta_id'],
+                chunk['voto'],
+                repeat('Diputados'),
+            )
+            insertados, ya_existian = load_votes(session, filas)
+            session.commit()
+            nuevos_votos += insertados
+            saltados += ya_existian
+            logger.info(
+                f"  Bloque {nro_bloque}: +{insertados} votos "
+                f"| pico RSS {peak_rss_mb():.0f} MB"
+            )
 
-        session.commit()
+        # Solo se llega acá si el CSV se leyó entero sin errores (si no, la excepción
+        # sale del generador y el archivo queda pendiente para la próxima corrida)
+        if descarga.changed:
+            descarga.mark_processed()
         logger.info(f"Pipeline finalizado. Nuevos: {nuevos_votos} | Saltados (ya existían): {saltados}")
+        logger.info(f"Pico de memoria (RSS): {peak_rss_mb():.0f} MB")
 
     except Exception as e:
         logger.error(f"ERROR FATAL EN PIPELINE: {e}")
@@ -0,0 +1,15 @@
+"""
+migrar.py — Aplica las migraciones de esquema (tablas, columnas e índices)
+sobre una base existente. Lo corre actualizar.py al arrancar; a mano:
+python migrar.py
+"""
+from src.database import migrar
+from src.utils import logger
+
+def main():
+    logger.info("Aplicando migraciones de esquema...")
+    migrar()
+    logger.info("Esquema al día.")
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,12 @@ import streamlit as st
 import pandas as pd
 from src.styles import apply_styles, show_logo
 from sqlalchemy import text
-from src.database import SessionLocal
+from src.database import SessionLocal, esquema_faltante
 st.set_page_config(page_title="...", layout="wide")
 apply_styles()
+faltantes = esquema_faltante()
+if faltantes:
+    st.warning(f"Faltan migraciones en la base ({', '.join(faltantes)}). Correr `python migrar.py`.")
 show_logo()  
 st.sidebar.title("Monitor Legislativo")
 
@@ -35,10 +38,10 @@ def es_subtitulo(titulo):
 def cargar_votaciones(limit=100):
     db = SessionLocal()
     result = db.execute(text("""
-        SELECT acta_id, titulo, fecha, resultado,
+        SELECT acta_id, camara, titulo, fecha, resultado,
                votos_afirmativos, votos_negativos, abstenciones, ausentes
         FROM actas_cabecera
-        WHERE fecha IS NOT NULL
+        WHERE fecha IS NOT NULL AND NOT fecha_inferida
         ORDER BY fecha DESC, acta_id DESC
         LIMIT :limit
     """), {"limit": limit})
@@ -50,7 +53,7 @@ def cargar_votaciones(limit=100):
     return df
 
 @st.cache_data(ttl=3600)
-def cargar_detalle_votacion(acta_id):
+def cargar_detalle_votacion(acta_id, camara):
     db = SessionLocal()
     result = db.execute(text("""
         SELECT
@@ -60,16 +63,16 @@ def cargar_detalle_votacion(acta_id):
             v.voto_individual
         FROM votos v
         JOIN legisladores l ON l.id = v.legislador_id
-        WHERE v.acta_id = :acta_id
+        WHERE v.acta_id = :acta_id AND v.camara = :camara
         ORDER BY l.bloque, l.nombre_completo
-    """), {"acta_id": acta_id})
+    """), {"acta_id": acta_id, "camara": camara})
     df = pd.DataFrame(result.fetchall(), columns=result.keys())
     db.close()
     df['bloque'] = df['bloque'].apply(limpiar)
     return df
 
-def mostrar_votos_acta(acta_id, titulo):
-    df = cargar_detalle_votacion(acta_id)
+def mostrar_votos_acta(acta_id, titulo, camara):
+    df = cargar_detalle_votacion(acta_id, camara)
     if df.empty:
         st.caption("Sin detalle de votos.")
         return
@@ -160,7 +163,7 @@ for (tema, fecha), grp in grupos:
         if not acta_principal.empty:
             row = acta_principal.iloc[0]
             st.markdown(f"##### Votación general")
-            mostrar_votos_acta(int(row['acta_id']), row['titulo'])
+            mostrar_votos_acta(int(row['acta_id']), row['titulo'], row['camara'])
 
         # Subtítulos colapsados
         if not subtitulos.empty:
@@ -171,4 +174,4 @@ for (tema, fecha), grp in grupos:
                 afirm_s = int(sub['votos_afirmativos'] or 0)
                 neg_s = int(sub['votos_negativos'] or 0)
                 with st.expander(f"↳ {subtitulo_limpio} · {afirm_s}✔ {neg_s}✘"):
-                    mostrar_votos_acta(int(sub['acta_id']), sub['titulo'])
\ No newline at end of file
+                    mostrar_votos_acta(int(sub['acta_id']), sub['titulo'], sub['camara'])
\ No newline at end of file
@@ -1,11 +1,14 @@
 import streamlit as st
 import pandas as pd
 from sqlalchemy import text
-from src.database import SessionLocal
+from src.database import SessionLocal, esquema_faltante
 from src.styles import apply_styles, show_logo
 
 st.set_page_config(page_title="Afinidades · Lobby", layout="wide")
 apply_styles()
+faltantes = esquema_faltante()
+if faltantes:
+    st.warning(f"Faltan migraciones en la base ({', '.join(faltantes)}). Correr `python migrar.py`.")
 show_logo()
 st.sidebar.title("Monitor Legislativo")
 
@@ -38,7 +41,7 @@ def calcular_afinidad(legislador_id, top_n=20):
     db = SessionLocal()
     result = db.execute(text("""
         WITH votos_ref AS (
-            SELECT acta_id, voto_individual
+            SELECT camara, acta_id, voto_individual
             FROM votos
             WHERE legislador_id = :id AND acta_id IS NOT NULL
         ),
@@ -48,7 +51,7 @@ def calcular_afinidad(legislador_id, top_n=20):
                 COUNT(*) as votaciones_compartidas,
                 SUM(CASE WHEN v.voto_individual = r.voto_individual THEN 1 ELSE 0 END) as coincidencias
             FROM votos v
-            JOIN votos_ref r ON r.acta_id = v.acta_id
+            JOIN votos_ref r ON r.acta_id = v.acta_id AND r.camara = v.camara
             WHERE v.legislador_id != :id AND v.acta_id IS NOT NULL
             GROUP BY v.legislador_id
             HAVING COUNT(*) >= 20
@@ -74,7 +77,7 @@ def calcular_divergencia(legislador_id, top_n=20):
     db = SessionLocal()
     result = db.execute(text("""
         WITH votos_ref AS (
-            SELECT acta_id, voto_individual
+            SELECT camara, acta_id, voto_individual
             FROM votos
             WHERE legislador_id = :id AND acta_id IS NOT NULL
         ),
@@ -84,7 +87,7 @@ def calcular_divergencia(legislador_id, top_n=20):
                 COUNT(*) as votaciones_compartidas,
                 SUM(CASE WHEN v.voto_individual = r.voto_individual THEN 1 ELSE 0 END) as coincidencias
             FROM votos v
-            JOIN votos_ref r ON r.acta_id = v.acta_id
+            JOIN votos_ref r ON r.acta_id = v.acta_id AND r.camara = v.camara
             WHERE v.legislador_id != :id AND v.acta_id IS NOT NULL
             GROUP BY v.legislador_id
             HAVING COUNT(*) >= 20
@@ -117,8 +120,8 @@ def cargar_divergencias(leg_id_a, leg_id_b):
             ac.fecha,
             ac.resultado
         FROM votos a
-        JOIN votos b ON b.acta_id = a.acta_id AND b.legislador_id = :leg_b
-        LEFT JOIN actas_cabecera ac ON ac.acta_id = a.acta_id
+        JOIN votos b ON b.acta_id = a.acta_id AND b.camara = a.camara AND b.legislador_id = :leg_b
+        LEFT JOIN actas_cabecera ac ON ac.acta_id = a.acta_id AND ac.camara = a.camara
         WHERE a.legislador_id = :leg_a
           AND a.acta_id IS NOT NULL
           AND a.voto_individual != b.voto_individual
@@ -141,8 +144,8 @@ def cargar_coincidencias(leg_id_a, leg_id_b):
             ac.fecha,
             ac.resultado
         FROM votos a
-        JOIN votos b ON b.acta_id = a.acta_id AND b.legislador_id = :leg_b
-        LEFT JOIN actas_cabecera ac ON ac.acta_id = a.acta_id
+        JOIN votos b ON b.acta_id = a.acta_id AND b.camara = a.camara AND b.legislador_id = :leg_b
+        LEFT JOIN actas_cabecera ac ON ac.acta_id = a.acta_id AND ac.camara = a.camara
         WHERE a.legislador_id = :leg_a
           AND a.acta_id IS NOT NULL
           AND a.voto_individual = b.voto_individual
@@ -1,14 +1,37 @@
-import requests
+import argparse
+import hashlib
+import json
+import time
+from collections import Counter
 from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import text
-from src.database import SessionLocal
-from src.utils import logger
-import time
+from src.archive import Archive, replay
+from src.database import SessionLocal, Base, engine
+from src.http import build_session, HostRateLimiter
+from src.utils import logger, IdentityResolver, SurnameIndex
+import src.models  # noqa: F401 — registra los modelos para create_all
 import warnings
 warnings.filterwarnings('ignore')
 
 BASE = "https://www.hcdn.gob.ar"
 
+# Respuestas crudas en src.archive, por slug de comisión
+FUENTE_INTEGRANTES = 'hcdn.comision.integrantes'
+
+# Por parte de la página: tabla, clave natural y atributos que se sincronizan.
+# Cada tabla tiene un <tabla>_historial con las altas/bajas/cambios fechados.
+# Cada parte tiene un solo dueño: integrantes este script; reuniones (la página
+# se arma con JS) scrapear_reuniones. Dos parsers sobre la misma parte
+# pisarían las filas del otro en cada corrida.
+PARTES = {
+    'integrantes': ('comision_integrantes', ('cargo', 'nombre_raw'), ('bloque', 'distrito', 'legislador_id')),
+    'reuniones': ('comision_reuniones', ('fecha', 'descripcion'), ('tipo',)),
+}
+
+MAX_WORKERS = 4      # descargas concurrentes
+RATE_POR_HOST = 4    # requests/s a www.hcdn.gob.ar
+
 COMISIONES = [
     "/comisiones/permanentes/caconstitucionales",
     "/comisiones/permanentes/clgeneral",
@@ -61,9 +84,39 @@ COMISIONES = [
 def get_nombre_comision(slug):
     return slug.split('/')[-1]
 
-def scrapear_integrantes(url_base):
-    r = requests.get(f"{BASE}{url_base}/integrantes.html", timeout=15, verify=False)
-    soup = BeautifulSoup(r.text, 'html.parser')
+def descargar(http, limiter, url, fuente, slug, archivo=None):
+    limiter.wait(url)
+    r = http.get(url, timeout=15, verify=False)
+    if archivo is not None:
+        archivo.put_response(fuente, r, clave=slug)
+    r.raise_for_status()
+    return r.text
+
+def descargar_todo(archivo=None, workers=MAX_WORKERS):
+    """
+    Fase de descarga: la página de integrantes de cada comisión, concurrentes
+    sobre una sola session keep-alive. Devuelve {slug: html o la excepción}.
+    """
+    http = build_session(pool_size=workers)
+    limiter = HostRateLimiter(RATE_POR_HOST)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futuros = {
+            get_nombre_comision(url_base): pool.submit(
+                descargar, http, limiter, f"{BASE}{url_base}/integrantes.html",
+                FUENTE_INTEGRANTES, get_nombre_comision(url_base), archivo
+            )
+            for url_base in COMISIONES
+        }
+    paginas = {}
+    for clave, futuro in futuros.items():
+        try:
+            paginas[clave] = futuro.result()
+        except Exception as e:
+            paginas[clave] = e
+    return paginas
+
+def parsear_integrantes(html):
+    soup = BeautifulSoup(html, 'html.parser')
     tabla = soup.find('table')
     if not tabla:
         return []
@@ -79,142 +132,292 @@ def scrapear_integrantes(url_base):
             })
     return integrantes
 
-def scrapear_reuniones(url_base):
-    r = requests.get(f"{BASE}{url_base}/reuniones/", timeout=15, verify=False)
-    soup = BeautifulSoup(r.text, 'html.parser')
-    reuniones = []
-    fecha_actual = None
-
-    for elem in soup.find_all(['h3', 'div', 'p']):
-        texto = elem.get_text(strip=True)
-
-        # Detectar fecha
-        if 'REUNIONES DEL DIA' in texto:
-            fecha_actual = texto.replace('REUNIONES DEL DIA', '').strip()
-            continue
-
-        # Detectar invitados
-        if 'INVITADO' in texto.upper() and fecha_actual:
-            reuniones.append({
-                'fecha': fecha_actual,
-                'tipo': 'INVITADO',
-                'descripcion': texto,
-            })
-        elif 'REUNIÓN' in texto.upper() and fecha_actual and len(texto) > 10:
-            reuniones.append({
-                'fecha': fecha_actual,
-                'tipo': 'REUNION',
-                'descripcion': texto[:300],
-            })
+def _parsear_archivado(slug, html):
+    return parsear_integrantes(html)
+
+def parsear_todo(paginas):
+    """
+    Fase de parseo: {slug: integrantes}. Una página que no se pudo bajar o
+    parsear queda en None y esa comisión no se toca.
+    """
+    parseado = {}
+    for url_base in COMISIONES:
+        slug = get_nombre_comision(url_base)
+        html = paginas.get(slug)
+        try:
+            if isinstance(html, Exception):
+                raise html
+            parseado[slug] = parsear_integrantes(html) if html is not None else None
+        except Exception as e:
+            logger.warning(f"  {slug}: error integrantes — {e}")
+            parseado[slug] = None
+    return parseado
+
+def crear_tablas(session):
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS comisiones (
+            id SERIAL PRIMARY KEY,
+            slug VARCHAR UNIQUE NOT NULL,
+            nombre VARCHAR,
+            camara VARCHAR DEFAULT 'Diputados'
+        )
+    """))
+
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS comision_integrantes (
+            id SERIAL PRIMARY KEY,
+            comision_id INTEGER REFERENCES comisiones(id),
+            legislador_id INTEGER REFERENCES legisladores(id),
+            nombre_raw VARCHAR,
+            cargo VARCHAR,
+            bloque VARCHAR,
+            distrito VARCHAR
+        )
+    """))
+
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS comision_reuniones (
+            id SERIAL PRIMARY KEY,
+            comision_id INTEGER REFERENCES comisiones(id),
+            fecha VARCHAR,
+            tipo VARCHAR,
+            descripcion TEXT
+        )
+    """))
+
+    # Historial de cambios (lo escribe sincronizar_parte)
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS comision_integrantes_historial (
+            id SERIAL PRIMARY KEY,
+            comision_id INTEGER REFERENCES comisiones(id),
+            accion VARCHAR NOT NULL,            -- alta / baja / cambio
+            registrado_en TIMESTAMP NOT NULL DEFAULT now(),
+            cargo VARCHAR,
+            nombre_raw VARCHAR,
+            bloque VARCHAR,
+            distrito VARCHAR,
+            legislador_id INTEGER REFERENCES legisladores(id)
+        )
+    """))
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS comision_reuniones_historial (
+            id SERIAL PRIMARY KEY,
+            comision_id INTEGER REFERENCES comisiones(id),
+            accion VARCHAR NOT NULL,
+            registrado_en TIMESTAMP NOT NULL DEFAULT now(),
+            fecha VARCHAR,
+            descripcion TEXT,
+            tipo VARCHAR
+        )
+    """))
+
+    # Huella del contenido de cada parte en la última corrida
+    session.execute(text("""
+        CREATE TABLE IF NOT EXISTS comision_huellas (
+            comision_id INTEGER REFERENCES comisiones(id),
+            parte VARCHAR,
+            huella VARCHAR NOT NULL,
+            actualizado TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (comision_id, parte)
+        )
+    """))
+    session.commit()
+    logger.info("Tablas creadas")
+
+def cargar_huellas(session):
+    return {
+        (comision_id, parte): huella
+        for comision_id, parte, huella in session.execute(
+            text("SELECT comision_id, parte, huella FROM comision_huellas")
+        )
+    }
+
+def huella(filas):
+    """Hash del contenido parseado (independiente del orden y del HTML que lo rodea)."""
+    canonico = sorted(json.dumps(fila, sort_keys=True, ensure_ascii=False) for fila in filas)
+    return hashlib.sha256('\n'.join(canonico).encode()).hexdigest()
+
+def sincronizar_parte(session, comision_id, parte, filas, huellas):
+    """
+    Lleva la tabla de `parte` al contenido de `filas` (dicts con la clave y los
+    atributos de PARTES). Si la huella coincide con la de la última corrida no
+    toca nada y devuelve None; si no, aplica solo las diferencias por clave
+    natural, las anota en el historial y devuelve un Counter alta/baja/cambio.
+    No commitea.
+    """
+    tabla, clave, atributos = PARTES[parte]
+    actual = huella(filas)
+    if huellas.get((comision_id, parte)) == actual:
+        return None
+
+    columnas = clave + atributos
+    existentes = {}
+    sobrantes = []   # filas repetidas de cargas anteriores (misma clave natural)
+    for fila in session.execute(
+        text(f"SELECT id, {', '.join(columnas)} FROM {tabla} WHERE comision_id = :cid ORDER BY id"),
+        {'cid': comision_id}
+    ):
+        k = tuple(fila[1:1 + len(clave)])
+        if k in existentes:
+            sobrantes.append(fila[0])
+        else:
+            existentes[k] = (fila[0], dict(zip(columnas, fila[1:])))
+    nuevas = {}
+    for fila in filas:
+        nuevas.setdefault(tuple(fila[c] for c in clave), fila)
+
+    altas = [fila for k, fila in nuevas.items() if k not in existentes]
+    bajas = [existentes[k] for k in existentes if k not in nuevas]
+    cambios = [
+        (existentes[k][0], fila) for k, fila in nuevas.items()
+        if k in existentes and any(existentes[k][1][a] != fila[a] for a in atributos)
+    ]
+
+    borrar = [id_ for id_, _ in bajas] + sobrantes
+    if borrar:
+        session.execute(text(f"DELETE FROM {tabla} WHERE id = ANY(:ids)"), {'ids': borrar})
+    if altas:
+        session.execute(text(
+            f"INSERT INTO {tabla} (comision_id, {', '.join(columnas)}) "
+            f"VALUES (:comision_id, {', '.join(':' + c for c in columnas)})"
+        ), [{'comision_id': comision_id, **fila} for fila in altas])
+    if cambios:
+        session.execute(text(
+            f"UPDATE {tabla} SET {', '.join(f'{a} = :{a}' for a in atributos)} WHERE id = :id"
+        ), [{'id': id_, **{a: fila[a] for a in atributos}} for id_, fila in cambios])
+
+    historial = (
+        [('alta', fila) for fila in altas]
+        + [('baja', fila) for _, fila in bajas]
+        + [('cambio', fila) for _, fila in cambios]
+    )
+    if historial:
+        session.execute(text(
+            f"INSERT INTO {tabla}_historial (comision_id, accion, {', '.join(columnas)}) "
+            f"VALUES (:comision_id, :accion, {', '.join(':' + c for c in columnas)})"
+        ), [
+            {'comision_id': comision_id, 'accion': accion, **{c: fila[c] for c in columnas}}
+            for accion, fila in historial
+        ])
+
+    session.execute(text("""
+        INSERT INTO comision_huellas (comision_id, parte, huella)
+        VALUES (:cid, :parte, :huella)
+        ON CONFLICT (comision_id, parte) DO UPDATE SET huella = EXCLUDED.huella, actualizado = now()
+    """), {'cid': comision_id, 'parte': parte, 'huella': actual})
+    huellas[comision_id, parte] = actual
+    return Counter(alta=len(altas), baja=len(bajas), cambio=len(cambios))
+
+def obtener_comision_id(session, slug):
+    res = session.execute(text("""
+        INSERT INTO comisiones (slug, nombre)
+        VALUES (:slug, :nombre)
+        ON CONFLICT (slug) DO UPDATE SET nombre = EXCLUDED.nombre
+        RETURNING id
+    """), {'slug': slug, 'nombre': slug})
+    return res.fetchone()[0]
 
-    return reuniones
+def guardar_comision(session, slug, integrantes, ids_legisladores, huellas):
+    """
+    Sincroniza los integrantes de una comisión (ver sincronizar_parte).
+    Una lista en None (descarga o parseo fallido) deja esa parte como estaba.
+    Cada parte va en un savepoint: si falla, se descarta solo esa. No commitea.
+    `ids_legisladores`: {nombre: legislador_id} ya resuelto para todas las comisiones.
+    Devuelve {parte: Counter de cambios o None si no cambió}.
+    """
+    comision_id = obtener_comision_id(session, slug)
 
-def main():
+    partes = {}
+    if integrantes is not None:
+        partes['integrantes'] = [{
+            'cargo': ing['cargo'],
+            'nombre_raw': ing['nombre'],
+            'bloque': ing['bloque'],
+            'distrito': ing['distrito'],
+            'legislador_id': ids_legisladores.get(ing['nombre']),
+        } for ing in integrantes]
+
+    cambios = {}
+    for parte, filas in partes.items():
+        try:
+            with session.begin_nested():
+                cambios[parte] = sincronizar_parte(session, comision_id, parte, filas, huellas)
+        except Exception as e:
+            logger.warning(f"  {slug}: error guardando {parte} — {e}")
+    return cambios
+
+def resolver_integrantes(session, parseado):
+    """
+    Cruza los integrantes de todas las comisiones con legisladores de Diputados
+    en memoria: dos queries para armar el índice (legisladores y alias) y
+    ninguna por integrante. Los matches nuevos se guardan como alias 'comisiones'.
+    """
+    registros = [
+        ing for integrantes in parseado.values() if integrantes
+        for ing in integrantes
+    ]
+    indice = SurnameIndex.from_session(session, camara='Diputados', source='comisiones')
+    ids_legisladores, metodos, aliases_nuevos = indice.resolve_many(registros)
+    IdentityResolver.save_aliases(session, aliases_nuevos, 'comisiones')
+    logger.info(f"Integrantes: {len(registros)} | "
+                + ' '.join(f"{k}={v}" for k, v in sorted(metodos.items())))
+    for ing in registros:
+        if ids_legisladores[ing['nombre']] is None:
+            logger.debug(f"  Sin legislador: {ing['nombre']} ({ing['bloque']}, {ing['distrito']})")
+    return ids_legisladores
+
+def describir_cambios(cambios):
+    if cambios is None:
+        return "sin cambios"
+    return f"+{cambios['alta']} -{cambios['baja']} ~{cambios['cambio']}"
+
+def guardar_todo(session, parseado):
+    """Fase de escritura: todas las comisiones en una sola transacción."""
+    ids_legisladores = resolver_integrantes(session, parseado)
+    huellas = cargar_huellas(session)
+    totales = Counter()
+    sin_cambios = 0
+    for slug, integrantes in sorted(parseado.items()):
+        cambios = guardar_comision(session, slug, integrantes, ids_legisladores, huellas)
+        for parte, conteo in cambios.items():
+            if conteo is None:
+                sin_cambios += 1
+            else:
+                totales.update({f"{parte}_{accion}": n for accion, n in conteo.items()})
+        if any(conteo is not None for conteo in cambios.values()):
+            logger.info(f"  {slug}: " + ', '.join(
+                f"{parte} {describir_cambios(conteo)}" for parte, conteo in cambios.items()
+            ))
+    session.commit()
+    logger.info(f"Partes sin cambios: {sin_cambios} | "
+                + (' '.join(f"{k}={v}" for k, v in sorted(totales.items())) or "ningún cambio"))
+
+def main(workers=MAX_WORKERS):
     logger.info("=== SCRAPING COMISIONES HCDN ===")
+    Base.metadata.create_all(bind=engine)
     session = SessionLocal()
+    archivo = Archive()
 
     try:
-        # Crear tablas si no existen
-        session.execute(text("""
-            CREATE TABLE IF NOT EXISTS comisiones (
-                id SERIAL PRIMARY KEY,
-                slug VARCHAR UNIQUE NOT NULL,
-                nombre VARCHAR,
-                camara VARCHAR DEFAULT 'Diputados'
-            )
-        """))
-
-        session.execute(text("""
-            CREATE TABLE IF NOT EXISTS comision_integrantes (
-                id SERIAL PRIMARY KEY,
-                comision_id INTEGER REFERENCES comisiones(id),
-                legislador_id INTEGER REFERENCES legisladores(id),
-                nombre_raw VARCHAR,
-                cargo VARCHAR,
-                bloque VARCHAR,
-                distrito VARCHAR
-            )
-        """))
-
-        session.execute(text("""
-            CREATE TABLE IF NOT EXISTS comision_reuniones (
-                id SERIAL PRIMARY KEY,
-                comision_id INTEGER REFERENCES comisiones(id),
-                fecha VARCHAR,
-                tipo VARCHAR,
-                descripcion TEXT
-            )
-        """))
-        session.commit()
-        logger.info("Tablas creadas")
-
-        for url_base in COMISIONES:
-            slug = get_nombre_comision(url_base)
-            logger.info(f"Procesando: {slug}")
-
-            # Insertar o recuperar comisión
-            res = session.execute(text("""
-                INSERT INTO comisiones (slug, nombre)
-                VALUES (:slug, :nombre)
-                ON CONFLICT (slug) DO UPDATE SET nombre = EXCLUDED.nombre
-                RETURNING id
-            """), {'slug': slug, 'nombre': slug})
-            comision_id = res.fetchone()[0]
-
-            # Borrar integrantes anteriores para reinsertar frescos
-            session.execute(text("DELETE FROM comision_integrantes WHERE comision_id = :id"), {'id': comision_id})
-
-            # Integrantes
-            try:
-                integrantes = scrapear_integrantes(url_base)
-                for ing in integrantes:
-                    # Intentar cruzar con legisladores en DB
-                    apellido = ing['nombre'].split(',')[0].strip().upper() if ',' in ing['nombre'] else ing['nombre'].split()[0].upper()
-                    res_leg = session.execute(text("""
-                        SELECT id FROM legisladores
-                        WHERE nombre_completo ILIKE :apellido
-                        LIMIT 1
-                    """), {'apellido': f'%{apellido}%'})
-                    row = res_leg.fetchone()
-                    legislador_id = row[0] if row else None
-
-                    session.execute(text("""
-                        INSERT INTO comision_integrantes 
-                            (comision_id, legislador_id, nombre_raw, cargo, bloque, distrito)
-                        VALUES (:cid, :lid, :nombre, :cargo, :bloque, :distrito)
-                    """), {
-                        'cid': comision_id,
-                        'lid': legislador_id,
-                        'nombre': ing['nombre'],
-                        'cargo': ing['cargo'],
-                        'bloque': ing['bloque'],
-                        'distrito': ing['distrito'],
-                    })
-                logger.info(f"  {len(integrantes)} integrantes")
-            except Exception as e:
-                logger.warning(f"  Error integrantes: {e}")
-
-            # Reuniones
-            try:
-                session.execute(text("DELETE FROM comision_reuniones WHERE comision_id = :id"), {'id': comision_id})
-                reuniones = scrapear_reuniones(url_base)
-                for reu in reuniones:
-                    session.execute(text("""
-                        INSERT INTO comision_reuniones (comision_id, fecha, tipo, descripcion)
-                        VALUES (:cid, :fecha, :tipo, :descripcion)
-                    """), {
-                        'cid': comision_id,
-                        'fecha': reu['fecha'],
-                        'tipo': reu['tipo'],
-                        'descripcion': reu['descripcion'],
-                    })
-                logger.info(f"  {len(reuniones)} reuniones")
-            except Exception as e:
-                logger.warning(f"  Error reuniones: {e}")
-
-            session.commit()
-            time.sleep(0.5)
+        crear_tablas(session)
+        tiempos = {}
+
+        inicio = time.perf_counter()
+        paginas = descargar_todo(archivo, workers)
+        tiempos['descarga'] = time.perf_counter() - inicio
+        fallidas = sum(isinstance(html, Exception) for html in paginas.values())
+        logger.info(f"Descargadas {len(paginas) - fallidas}/{len(paginas)} páginas "
+                    f"(piso por rate limit: {len(paginas) / RATE_POR_HOST:.1f} s)")
+
+        inicio = time.perf_counter()
+        parseado = parsear_todo(paginas)
+        tiempos['parseo'] = time.perf_counter() - inicio
 
+        inicio = time.perf_counter()
+        guardar_todo(session, parseado)
+        tiempos['escritura'] = time.perf_counter() - inicio
+
+        logger.info("Tiempos: " + ' | '.join(f"{fase} {seg:.1f} s" for fase, seg in tiempos.items()))
         logger.info("=== SCRAPING COMPLETO ===")
 
     except Exception as e:
@@ -223,6 +426,47 @@ def main():
         raise
     finally:
         session.close()
+        archivo.close()
+
+def reparsear(workers=None):
+    """Re-parsea las páginas archivadas de cada comisión y recarga la DB sin pedir nada a hcdn.gob.ar."""
+    logger.info("=== REPARSE COMISIONES HCDN (desde archivo) ===")
+    Base.metadata.create_all(bind=engine)
+    archivo = Archive()
+    session = SessionLocal()
+
+    try:
+        crear_tablas(session)
+
+        parseado = {}
+        registros = archivo.registros(FUENTE_INTEGRANTES, status=200)
+        logger.info(f"{FUENTE_INTEGRANTES}: {len(registros)} páginas archivadas")
+        for registro, resultado in replay(registros, _parsear_archivado, workers=workers):
+            if isinstance(resultado, Exception):
+                logger.warning(f"  Error parseando {registro.clave}: {resultado}")
+                continue
+            parseado[registro.clave] = resultado
+
+        guardar_todo(session, parseado)
+
+        logger.info(f"=== REPARSE COMPLETO — {len(parseado)} comisiones ===")
+
+    except Exception as e:
+        logger.error(f"Error fatal: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        archivo.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Scraping de comisiones HCDN")
+    parser.add_argument('--reparse', action='store_true',
+                        help="re-parsear el archivo local en vez de scrapear")
+    parser.add_argument('--workers', type=int,
+                        help="descargas concurrentes (o procesos de parseo con --reparse)")
+    args = parser.parse_args()
+    if args.reparse:
+        reparsear(workers=args.workers)
+    else:
+        main(workers=args.workers or MAX_WORKERS)
@@ -1,15 +1,17 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
+import argparse
+from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from sqlalchemy import text
+from src.archive import Archive, replay
+from src.browser import BrowserPool, WORKERS, esperar
 from src.database import SessionLocal
 from src.utils import logger
+from scrapear_comisiones import crear_tablas, cargar_huellas, sincronizar_parte, describir_cambios
 import time
 
 BASE = "https://www.hcdn.gob.ar"
+# DOM ya renderizado por el JS (driver.page_source), por slug de comisión
+FUENTE_DOM = 'hcdn.comision.reuniones.dom'
 
 COMISIONES = [
     "/comisiones/permanentes/caconstitucionales",
@@ -60,107 +62,186 @@ COMISIONES = [
     "/comisiones/permanentes/cmujeresydiv",
 ]
 
-def iniciar_driver():
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--ignore-certificate-errors')
-    driver = webdriver.Chrome(
-        service=Service(ChromeDriverManager().install()),
-        options=options
-    )
-    return driver
-
-def scrapear_reuniones_selenium(driver, url_base):
-    url = f"{BASE}{url_base}/reuniones/"
-    driver.get(url)
-    time.sleep(3)  # esperar JS
-
+XPATH_REUNIONES = "//*[contains(text(), 'REUNIONES DEL DIA')]"
+# Avisos con los que la página dice explícitamente que la comisión no tiene reuniones
+SIN_REUNIONES = ('NO HAY REUNIONES', 'NO SE REGISTRAN REUNIONES', 'NO EXISTEN REUNIONES',
+                 'NO SE ENCONTRARON REUNIONES')
+MAX_DESCRIPCION = 400
+
+def normalizar_descripcion(texto):
+    """Espacios colapsados y largo acotado: la descripción es parte de la clave natural de la reunión."""
+    return ' '.join(texto.split())[:MAX_DESCRIPCION]
+
+def texto_visible(html):
+    """Texto del <body> línea por línea, como lo muestra el navegador."""
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(['script', 'style', 'noscript']):
+        tag.decompose()
+    body = soup.body or soup
+    return body.get_text('\n')
+
+def parsear_reuniones(html):
+    """Reuniones del DOM renderizado de la página. Un error de parseo se propaga."""
     reuniones = []
     fecha_actual = None
+    lineas = [l.strip() for l in texto_visible(html).split('\n') if l.strip()]
+
+    for i, linea in enumerate(lineas):
+        if 'REUNIONES DEL DIA' in linea:
+            fecha_actual = linea.replace('REUNIONES DEL DIA', '').strip()
+            if not fecha_actual and i + 1 < len(lineas):
+                # La fecha en su propio nodo (get_text corta línea por elemento)
+                fecha_actual = lineas[i + 1]
+        elif fecha_actual and any(t in linea.upper() for t in ['INVITADO', 'REUNIÓN CONSTITUTIVA', 'INFORMATIVA', 'EMPLAZAMIENTO', 'CONJUNTA']):
+            # Capturar descripción siguiente
+            desc = linea
+            if i + 1 < len(lineas):
+                desc += ' ' + lineas[i + 1]
+            reuniones.append({
+                'fecha': fecha_actual,
+                'tipo': 'INVITADO' if 'INVITADO' in linea.upper() else 'REUNION',
+                'descripcion': normalizar_descripcion(desc),
+            })
 
-    try:
-        elementos = driver.find_elements(By.XPATH, "//*[contains(text(), 'REUNIONES DEL DIA') or contains(@class, 'reunion') or contains(@class, 'citacion')]")
-        
-        # Si no encontramos nada específico, tomamos todo el texto
-        body_text = driver.find_element(By.TAG_NAME, 'body').text
-        lineas = [l.strip() for l in body_text.split('\n') if l.strip()]
-
-        for i, linea in enumerate(lineas):
-            if 'REUNIONES DEL DIA' in linea:
-                fecha_actual = linea.replace('REUNIONES DEL DIA', '').strip()
-            elif fecha_actual and any(t in linea.upper() for t in ['INVITADO', 'REUNIÓN CONSTITUTIVA', 'INFORMATIVA', 'EMPLAZAMIENTO', 'CONJUNTA']):
-                # Capturar descripción siguiente
-                desc = linea
-                if i + 1 < len(lineas):
-                    desc += ' ' + lineas[i + 1]
-                reuniones.append({
-                    'fecha': fecha_actual,
-                    'tipo': 'INVITADO' if 'INVITADO' in linea.upper() else 'REUNION',
-                    'descripcion': desc[:400],
-                })
+    return reuniones
 
-    except Exception as e:
-        logger.warning(f"  Error parseando reuniones: {e}")
+def _parsear_archivado(slug, html):
+    return parsear_reuniones(html)
 
-    return reuniones
+def url_reuniones(url_base):
+    return f"{BASE}{url_base}/reuniones/"
 
-def main():
+def scrapear_reuniones_selenium(driver, url_base):
+    """
+    DOM renderizado de la página de reuniones de una comisión. Devuelve None si
+    la página no terminó de renderizar (ni bloques 'REUNIONES DEL DIA' ni aviso
+    de que no hay): en ese caso la comisión no se sincroniza, para no borrar
+    sus reuniones.
+    """
+    driver.get(url_reuniones(url_base))
+    # Esperar a que el JS arme los bloques de reuniones
+    if not esperar(driver, XPATH_REUNIONES):
+        body_text = driver.find_element(By.TAG_NAME, 'body').text
+        if not any(aviso in body_text.upper() for aviso in SIN_REUNIONES):
+            logger.warning(f"  {url_base.split('/')[-1]}: la página no mostró reuniones ni aviso de que no hay")
+            return None
+    return driver.page_source
+
+def guardar_reuniones(session, comision_id, slug, reuniones, huellas):
+    """Sincroniza y commitea las reuniones de una comisión. Devuelve el Counter de cambios (None = sin cambios)."""
+    cambios = sincronizar_parte(session, comision_id, 'reuniones', [{
+        'fecha': reu['fecha'],
+        'descripcion': reu['descripcion'],
+        'tipo': reu['tipo'],
+    } for reu in reuniones], huellas)
+    session.commit()
+    logger.info(f"  {slug}: {len(reuniones)} reuniones ({describir_cambios(cambios)})")
+    return cambios
+
+def cargar_comisiones(session):
+    return dict(session.execute(text("SELECT slug, id FROM comisiones")).fetchall())
+
+def main(workers=WORKERS):
     logger.info("=== SCRAPING REUNIONES COMISIONES (Selenium) ===")
     session = SessionLocal()
-    driver = iniciar_driver()
+    archivo = Archive()
 
     try:
+        crear_tablas(session)
+        huellas = cargar_huellas(session)
+        comisiones = cargar_comisiones(session)
         total_reuniones = 0
+        sin_cambios = 0
 
+        pendientes = []
         for url_base in COMISIONES:
             slug = url_base.split('/')[-1]
-
-            # Obtener comision_id
-            res = session.execute(text("SELECT id FROM comisiones WHERE slug = :slug"), {'slug': slug})
-            row = res.fetchone()
-            if not row:
+            if slug in comisiones:
+                pendientes.append(url_base)
+            else:
                 logger.warning(f"  {slug} no encontrada en DB, salteando")
-                continue
-            comision_id = row[0]
 
-            logger.info(f"Procesando reuniones: {slug}")
+        # Las páginas se scrapean en paralelo; archivo, parseo y escritura siguen en este thread
+        inicio = time.perf_counter()
+        with BrowserPool(workers) as pool:
+            for url_base, html in pool.map(scrapear_reuniones_selenium, pendientes):
+                slug = url_base.split('/')[-1]
+                try:
+                    if isinstance(html, Exception):
+                        raise html
+                    if html is None:
+                        logger.info(f"  {slug}: sin datos confiables, no se toca")
+                        continue
+                    archivo.put(FUENTE_DOM, url_reuniones(url_base), 200, {},
+                                html.encode('utf-8'), clave=slug, encoding='utf-8')
+                    reuniones = parsear_reuniones(html)
+                    cambios = guardar_reuniones(session, comisiones[slug], slug, reuniones, huellas)
+                    total_reuniones += len(reuniones)
+                    sin_cambios += cambios is None
+
+                except Exception as e:
+                    logger.warning(f"  Error en {slug}: {e}")
+                    session.rollback()
+                    huellas = cargar_huellas(session)
+
+        logger.info(f"Total reuniones scrapeadas: {total_reuniones} | comisiones sin cambios: {sin_cambios} "
+                    f"| {time.perf_counter() - inicio:.1f} s con {workers} navegadores")
 
-            try:
-                session.execute(text("DELETE FROM comision_reuniones WHERE comision_id = :id"), {'id': comision_id})
-                reuniones = scrapear_reuniones_selenium(driver, url_base)
-
-                for reu in reuniones:
-                    session.execute(text("""
-                        INSERT INTO comision_reuniones (comision_id, fecha, tipo, descripcion)
-                        VALUES (:cid, :fecha, :tipo, :descripcion)
-                    """), {
-                        'cid': comision_id,
-                        'fecha': reu['fecha'],
-                        'tipo': reu['tipo'],
-                        'descripcion': reu['descripcion'],
-                    })
-
-                session.commit()
-                total_reuniones += len(reuniones)
-                logger.info(f"  {len(reuniones)} reuniones")
+    except Exception as e:
+        logger.error(f"Error fatal: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+        archivo.close()
 
+def reparsear(workers=None):
+    """Re-parsea los DOM archivados de cada comisión y recarga sus reuniones sin abrir navegadores."""
+    logger.info("=== REPARSE REUNIONES COMISIONES (desde archivo) ===")
+    archivo = Archive()
+    session = SessionLocal()
+
+    try:
+        crear_tablas(session)
+        huellas = cargar_huellas(session)
+        comisiones = cargar_comisiones(session)
+
+        registros = archivo.registros(FUENTE_DOM, status=200)
+        logger.info(f"{FUENTE_DOM}: {len(registros)} páginas archivadas")
+        total = 0
+        for registro, reuniones in replay(registros, _parsear_archivado, workers=workers):
+            slug = registro.clave
+            try:
+                if isinstance(reuniones, Exception):
+                    raise reuniones
+                if slug not in comisiones:
+                    logger.warning(f"  {slug} no encontrada en DB, salteando")
+                    continue
+                guardar_reuniones(session, comisiones[slug], slug, reuniones, huellas)
+                total += 1
             except Exception as e:
                 logger.warning(f"  Error en {slug}: {e}")
                 session.rollback()
+                huellas = cargar_huellas(session)
 
-            time.sleep(1)
-
-        logger.info(f"Total reuniones scrapeadas: {total_reuniones}")
+        logger.info(f"=== REPARSE COMPLETO — {total} comisiones ===")
 
     except Exception as e:
         logger.error(f"Error fatal: {e}")
         session.rollback()
         raise
     finally:
-        driver.quit()
         session.close()
+        archivo.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Reuniones de comisiones HCDN (Selenium)")
+    parser.add_argument('--reparse', action='store_true',
+                        help="re-parsear los DOM archivados en vez de scrapear")
+    parser.add_argument('--workers', type=int,
+                        help="navegadores en paralelo (o procesos de parseo con --reparse)")
+    args = parser.parse_args()
+    if args.reparse:
+        reparsear(workers=args.workers)
+    else:
+        main(workers=args.workers or WORKERS)
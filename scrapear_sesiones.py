@@ -1,12 +1,5 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from webdriver_manager.chrome import ChromeDriverManager
 from bs4 import BeautifulSoup
-import pandas as pd
-import time
+from src.browser import BrowserPool, WORKERS, esperar
 
 BASE = "https://www.hcdn.gob.ar"
 
@@ -19,32 +12,30 @@ sesiones_extraordinarias = [
     {'id': 3550, 'reunion': 22, 'periodo': 142, 'fecha': '12/02/2025', 'descripcion': '2° Sesión Extraordinaria'},
 ]
 
-options = webdriver.ChromeOptions()
-options.add_argument('--headless')
-options.add_argument('--no-sandbox')
-options.add_argument('--disable-dev-shm-usage')
-
-driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
-
-resultados = []
-
-for sesion in sesiones_extraordinarias:
+def scrapear_sesion(driver, sesion):
     url = f"{BASE}/sesiones/sesion.html?id={sesion['id']}&numVid=0&reunion={sesion['reunion']}&periodo={sesion['periodo']}"
-    print(f"\nScrapeando: {sesion['fecha']} - {sesion['descripcion']}")
-    
     driver.get(url)
-    time.sleep(3)  # esperar que cargue el JS
-    
+    esperar(driver, "//table")  # el JS arma las tablas de la sesión
+
     soup = BeautifulSoup(driver.page_source, 'html.parser')
-    
-    tablas = soup.find_all('table')
-    print(f"  Tablas encontradas: {len(tablas)}")
-    
     temas = soup.find_all(['h2', 'h3', 'h4', 'li', 'td'])
     textos = [t.get_text(strip=True) for t in temas if len(t.get_text(strip=True)) > 30]
-    print(f"  Primeros textos:")
-    for t in textos[:8]:
-        print(f"    - {t[:120]}")
+    return len(soup.find_all('table')), textos
+
+def main(workers=WORKERS):
+    with BrowserPool(workers) as pool:
+        for sesion, resultado in pool.map(scrapear_sesion, sesiones_extraordinarias):
+            print(f"\nScrapeando: {sesion['fecha']} - {sesion['descripcion']}")
+            if isinstance(resultado, Exception):
+                print(f"  Error: {resultado}")
+                continue
+            tablas, textos = resultado
+            print(f"  Tablas encontradas: {tablas}")
+            print(f"  Primeros textos:")
+            for t in textos[:8]:
+                print(f"    - {t[:120]}")
+
+    print("\n✅ Scraping completado")
 
-driver.quit()
-print("\n✅ Scraping completado")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Archivo crudo de respuestas HTTP (HTML/PDF) para re-parsear sin volver a bajar.
+
+Cada respuesta se agrega (append-only) a un segmento de su fuente como un
+miembro gzip independiente; un índice SQLite guarda url, clave, fecha de
+descarga, status, headers y la posición del cuerpo en el segmento. Si el
+cuerpo es idéntico al último guardado para esa URL solo se agrega la fila
+al índice, apuntando al mismo cuerpo.
+
+`replay(registros, fn)` pasa los cuerpos archivados por un parser en un pool
+de procesos: cada worker lee su cuerpo del disco, así que por el pool solo
+viajan las posiciones del índice.
+
+    archivo = Archive()
+    archivo.put_response('senado.acta', r, clave=acta_id)
+    for registro, resultado in replay(archivo.registros('senado.acta'), parsear):
+        ...
+"""
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+ARCHIVE_DIR = Path(os.getenv('LOBBY_ARCHIVE_DIR', '.cache/archivo'))
+SEGMENTO_MB = 256  # tamaño a partir del cual se abre un segmento nuevo
+
+
+@dataclass
+class Registro:
+    id: int
+    fuente: str
+    clave: str
+    url: str
+    fetched_at: str
+    status: int
+    headers: dict
+    encoding: str
+    sha256: str
+    segmento: str   # path del segmento
+    offset: int
+    length: int     # bytes comprimidos
+
+    def body(self):
+        with open(self.segmento, 'rb') as f:
+            f.seek(self.offset)
+            return gzip.decompress(f.read(self.length))
+
+    def texto(self):
+        """Cuerpo decodificado igual que lo hizo requests (`r.text`) al descargarlo."""
+        return self.body().decode(self.encoding or 'utf-8', errors='replace')
+
+
+class Archive:
+    """Índice + segmentos de una raíz de archivo. Seguro entre threads y procesos."""
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.root / 'index.sqlite', check_same_thread=False, timeout=60)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS registros (
+                id INTEGER PRIMARY KEY,
+                fuente TEXT NOT NULL,
+                clave TEXT,
+                url TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                status INTEGER,
+                headers TEXT,
+                encoding TEXT,
+                sha256 TEXT NOT NULL,
+                segmento TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_registros_fuente_url ON registros(fuente, url)")
+        self._db.commit()
+
+    def _segmento_actual(self, fuente):
+        carpeta = self.root / 'segmentos' / fuente
+        carpeta.mkdir(parents=True, exist_ok=True)
+        segmentos = sorted(carpeta.glob('*.seg'))
+        if segmentos and segmentos[-1].stat().st_size < SEGMENTO_MB * 1024 * 1024:
+            return segmentos[-1]
+        siguiente = int(segmentos[-1].stem) + 1 if segmentos else 0
+        return carpeta / f"{siguiente:06d}.seg"
+
+    def put(self, fuente, url, status, headers, body, clave=None, encoding=None):
+        """Agrega una respuesta al archivo. `body` en bytes. Devuelve el id del registro."""
+        sha = hashlib.sha256(body).hexdigest()
+        ahora = datetime.now().isoformat(timespec='seconds')
+        with self._lock, open(self.root / '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            previo = self._db.execute(
+                "SELECT sha256, segmento, offset, length FROM registros "
+                "WHERE fuente = ? AND url = ? ORDER BY id DESC LIMIT 1",
+                (fuente, url)
+            ).fetchone()
+            if previo and previo[0] == sha:
+                segmento, offset, length = previo[1:]
+            else:
+                comprimido = gzip.compress(body, compresslevel=6)
+                segmento = self._segmento_actual(fuente)
+                with open(segmento, 'ab') as f:
+                    offset = f.tell()
+                    f.write(comprimido)
+                segmento, length = str(segmento), len(comprimido)
+            cursor = self._db.execute(
+                "INSERT INTO registros (fuente, clave, url, fetched_at, status, headers, encoding, "
+                "sha256, segmento, offset, length) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (fuente, None if clave is None else str(clave), url, ahora, status,
+                 json.dumps(dict(headers or {})), encoding, sha, segmento, offset, length)
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def put_response(self, fuente, response, clave=None):
+        return self.put(fuente, response.url, response.status_code, response.headers,
+                        response.content, clave=clave,
+                        encoding=response.encoding or response.apparent_encoding)
+
+    def registros(self, fuente, ultimos=True, status=None):
+        """Registros de una fuente (por defecto solo la última descarga de cada URL)."""
+        sql = "SELECT * FROM registros WHERE fuente = ?"
+        params = [fuente]
+        if ultimos:
+            sql += " AND id IN (SELECT MAX(id) FROM registros WHERE fuente = ? GROUP BY url)"
+            params.append(fuente)
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        sql += " ORDER BY id"
+        with self._lock:
+            filas = self._db.execute(sql, params).fetchall()
+        return [
+            Registro(*fila[:6], json.loads(fila[6] or '{}'), *fila[7:])
+            for fila in filas
+        ]
+
+    def ultimo(self, fuente, url):
+        """Último registro archivado de `url` en la fuente, o None."""
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT * FROM registros WHERE fuente = ? AND url = ? ORDER BY id DESC LIMIT 1",
+                (fuente, url)
+            ).fetchone()
+        if fila is None:
+            return None
+        return Registro(*fila[:6], json.loads(fila[6] or '{}'), *fila[7:])
+
+    def close(self):
+        self._db.close()
+
+
+def _aplicar(fn, registro, binario=False):
+    return fn(registro.clave, registro.body() if binario else registro.texto())
+
+
+def replay(registros, fn, workers=None, binario=False):
+    """
+    Pasa cada registro por `fn(clave, texto)` en un pool de procesos (con
+    `binario`, `fn(clave, bytes)`: para PDFs).
+    Genera (registro, resultado) en orden; si `fn` falla el resultado es la excepción.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futuros = [pool.submit(_aplicar, fn, r, binario) for r in registros]
+        for registro, futuro in zip(registros, futuros):
+            try:
+                yield registro, futuro.result()
+            except Exception as e:
+                yield registro, e
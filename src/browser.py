@@ -0,0 +1,140 @@
+"""
+Pool de navegadores headless (Chrome/Selenium) para páginas que arman el
+contenido con JS (reuniones de comisiones, sesiones).
+
+Cada worker es un Chrome reutilizado entre páginas, con imágenes, fuentes y
+CSS bloqueados. En lugar de sleeps fijos, los scrapers esperan la condición
+real del DOM con `esperar`. El chromedriver se toma, en orden, de
+$LOBBY_CHROMEDRIVER, del PATH o del cache de webdriver-manager (que solo baja
+el binario la primera vez).
+
+    with BrowserPool(workers=3) as pool:
+        for url, resultado in pool.map(scrapear, urls):
+            ...
+"""
+import os
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from selenium import webdriver
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from src.utils import logger
+
+WORKERS = 3
+ESPERA = 10  # segundos máximos esperando una condición del DOM
+
+# Recursos que no hacen falta para leer texto
+BLOQUEADOS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.svg', '*.webp', '*.ico',
+    '*.css', '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+]
+
+
+@lru_cache(maxsize=1)
+def ruta_driver():
+    """Binario de chromedriver: variable de entorno → PATH → webdriver-manager (cacheado en disco)."""
+    ruta = os.getenv('LOBBY_CHROMEDRIVER')
+    if ruta and os.path.exists(ruta):
+        return ruta
+    ruta = shutil.which('chromedriver')
+    if ruta:
+        return ruta
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def iniciar_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless=new')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--ignore-certificate-errors')
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    options.page_load_strategy = 'eager'  # no esperar subrecursos: lo que importa se espera con `esperar`
+    driver = webdriver.Chrome(service=Service(ruta_driver()), options=options)
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOQUEADOS})
+    return driver
+
+
+def esperar(driver, xpath, timeout=ESPERA):
+    """Espera a que exista un elemento que matchee `xpath`. Devuelve False si no apareció a tiempo."""
+    try:
+        WebDriverWait(driver, timeout).until(EC.presence_of_element_located((By.XPATH, xpath)))
+        return True
+    except TimeoutException:
+        return False
+
+
+class BrowserPool:
+    """`workers` Chromes reutilizables; `map` reparte las tareas entre ellos."""
+
+    def __init__(self, workers=WORKERS):
+        self.workers = workers
+        self._libres = queue.Queue()
+        self._todos = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        ruta_driver()  # resolver el binario una sola vez, antes de abrir los workers
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for driver in pool.map(lambda _: iniciar_driver(), range(self.workers)):
+                self._todos.append(driver)
+                self._libres.put(driver)
+        logger.info(f"BrowserPool: {self.workers} navegadores listos")
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for driver in self._todos:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._todos = []
+
+    def _reemplazar(self, driver):
+        """Un Chrome que se cayó se cierra y se abre otro en su lugar."""
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        nuevo = iniciar_driver()
+        with self._lock:
+            self._todos = [nuevo if d is driver else d for d in self._todos]
+        return nuevo
+
+    def _ejecutar(self, fn, item):
+        driver = self._libres.get()
+        try:
+            return fn(driver, item)
+        except InvalidSessionIdException:
+            driver = self._reemplazar(driver)
+            raise
+        finally:
+            self._libres.put(driver)
+
+    def map(self, fn, items):
+        """
+        Corre `fn(driver, item)` para cada item en paralelo.
+        Genera (item, resultado) en orden; si `fn` falla el resultado es la excepción.
+        """
+        items = list(items)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futuros = [pool.submit(self._ejecutar, fn, item) for item in items]
+            for item, futuro in zip(items, futuros):
+                try:
+                    yield item, futuro.result()
+                except Exception as e:
+                    yield item, e
@@ -0,0 +1,166 @@
+"""
+Carga masiva vía COPY FROM STDIN.
+
+Las filas se streamean en bloques a una tabla temporal (staging) y después
+un único INSERT ... SELECT ... ON CONFLICT DO NOTHING las pasa a la tabla
+destino. Reemplaza los session.add / execute fila por fila de los ingestores.
+"""
+import io
+import math
+from itertools import islice
+
+import pandas as pd
+from sqlalchemy import text
+
+from src.utils import logger
+
+COPY_CHUNK = 50_000  # filas por bloque de COPY (acota la memoria del buffer)
+
+VOTOS_COLUMNAS = ('legislador_id', 'acta_detalle_id', 'acta_id', 'voto_individual', 'camara')
+# Sin target: salta tanto acta_detalle_id repetidos como (camara, acta_id, legislador_id)
+VOTOS_CONFLICTO = ""
+
+
+def _copy_value(value):
+    """Serializa un valor al formato text de COPY (\\N = NULL)."""
+    if value is None or value is pd.NaT or value is pd.NA:
+        return r'\N'
+    if isinstance(value, float) and math.isnan(value):
+        return r'\N'
+    s = str(value)
+    return (s.replace('\\', '\\\\').replace('\t', '\\t')
+             .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def _chunk_buffer(rows):
+    buf = io.StringIO()
+    for row in rows:
+        buf.write('\t'.join(_copy_value(v) for v in row))
+        buf.write('\n')
+    buf.seek(0)
+    return buf
+
+
+def copy_insert(session, table, columns, rows, conflict=None, chunk_size=COPY_CHUNK,
+                update_columns=None, update_where=None):
+    """
+    Inserta `rows` (iterable de tuplas en el orden de `columns`) en `table`.
+
+    `conflict` es el target de ON CONFLICT, ej. "(camara, acta_id)" ("" = cualquier
+    clave única); si es None se hace un INSERT plano. Con `update_columns` el
+    conflicto actualiza esas columnas (upsert) y las filas no deben repetir la
+    clave dentro del lote; `update_where` restringe qué filas existentes se pisan
+    (ej. "actas_cabecera.fecha_inferida"). No commitea: la transacción queda en manos del caller.
+    Devuelve (insertados, saltados); en un upsert, insertados incluye los actualizados.
+    """
+    cols = ', '.join(columns)
+    staging = f"_stg_{table}"
+
+    session.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    session.execute(text(
+        f"CREATE TEMP TABLE {staging} AS SELECT {cols} FROM {table} WITH NO DATA"
+    ))
+
+    # Mismo connection que la sesión → mismo transaction
+    cursor = session.connection().connection.cursor()
+    staged = 0
+    try:
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            cursor.copy_expert(f"COPY {staging} ({cols}) FROM STDIN", _chunk_buffer(chunk))
+            staged += len(chunk)
+            logger.info(f"  {staged} filas en staging ({table})...")
+    finally:
+        cursor.close()
+
+    sql = f"INSERT INTO {table} ({cols}) SELECT {cols} FROM {staging}"
+    if conflict is not None and update_columns:
+        sets = ', '.join(f"{c} = EXCLUDED.{c}" for c in update_columns)
+        sql += f" ON CONFLICT {conflict} DO UPDATE SET {sets}"
+        if update_where:
+            sql += f" WHERE {update_where}"
+    elif conflict is not None:
+        sql += f" ON CONFLICT {conflict} DO NOTHING"
+    insertados = session.execute(text(sql)).rowcount
+    session.execute(text(f"DROP TABLE {staging}"))
+
+    return insertados, staged - insertados
+
+
+def load_votes(session, rows, chunk_size=COPY_CHUNK):
+    """
+    Carga votos deduplicando contra la tabla votos (acta_detalle_id y
+    camara + acta_id + legislador_id).
+    `rows`: tuplas (legislador_id, acta_detalle_id, acta_id, voto_individual, camara).
+    """
+    return copy_insert(session, 'votos', VOTOS_COLUMNAS, rows,
+                       conflict=VOTOS_CONFLICTO, chunk_size=chunk_size)
+
+
+def asegurar_claves_camara(session):
+    """
+    Migra votos y actas_cabecera a claves únicas por cámara: agrega `camara`,
+    la completa, borra los votos duplicados y crea los índices. Solo hace el
+    trabajo pesado la primera vez (cuando falta el índice de votos).
+    """
+    if session.execute(text("SELECT to_regclass('ix_votos_camara_acta_legislador')")).scalar():
+        return
+    logger.info("Migrando votos/actas_cabecera a claves por cámara...")
+    session.execute(text("ALTER TABLE actas_cabecera ADD COLUMN IF NOT EXISTS camara VARCHAR DEFAULT 'Diputados'"))
+    session.execute(text("UPDATE actas_cabecera SET camara = 'Diputados' WHERE camara IS NULL"))
+    session.execute(text("ALTER TABLE votos ADD COLUMN IF NOT EXISTS camara VARCHAR DEFAULT 'Diputados'"))
+    # Los votos de Diputados vienen del CSV y traen acta_detalle_id; los del
+    # Senado no. Sin acta_detalle_id, la cámara es la del acta a la que
+    # pertenece el voto (no la del legislador, que pudo pasar de una a otra).
+    # Tiene que correr antes de deduplicar: la dedup compara por cámara.
+    session.execute(text("""
+        UPDATE votos v
+        SET camara = CASE
+            WHEN v.acta_detalle_id IS NOT NULL THEN 'Diputados'
+            WHEN EXISTS (
+                SELECT 1 FROM actas_cabecera ac
+                WHERE ac.camara = 'Senado' AND ac.acta_id = v.acta_id
+            ) THEN 'Senado'
+            ELSE 'Diputados'
+        END
+    """))
+    borrados = session.execute(text("""
+        DELETE FROM votos a
+        USING votos b
+        WHERE a.id > b.id
+          AND a.camara = b.camara
+          AND a.acta_id = b.acta_id
+          AND a.legislador_id = b.legislador_id
+    """)).rowcount
+    session.execute(text("DROP INDEX IF EXISTS ix_actas_cabecera_acta_id"))
+    session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_actas_cabecera_camara_acta_id ON actas_cabecera (camara, acta_id)"
+    ))
+    session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_votos_camara_acta_legislador ON votos (camara, acta_id, legislador_id)"
+    ))
+    session.commit()
+    logger.info(f"  Votos duplicados borrados: {borrados}")
+
+
+def asegurar_esquema(session):
+    """
+    Migraciones idempotentes de columnas que el pipeline agregó sobre tablas ya
+    existentes (create_all no altera tablas) y que la app consulta: fecha_inferida
+    de actas_cabecera, anio de sesiones y las claves por cámara de votos/actas.
+    También marca como 'fuzzy_bajo' los alias fuzzy viejos de mandatos.
+    """
+    session.execute(text(
+        "ALTER TABLE actas_cabecera ADD COLUMN IF NOT EXISTS fecha_inferida BOOLEAN NOT NULL DEFAULT FALSE"
+    ))
+    session.execute(text("ALTER TABLE sesiones ADD COLUMN IF NOT EXISTS anio INTEGER"))
+    # Los alias fuzzy de mandatos (umbral 75/82) se guardaban como 'fuzzy' a secas
+    if session.execute(text("SELECT to_regclass('legislador_alias')")).scalar():
+        session.execute(text(
+            "UPDATE legislador_alias SET metodo = 'fuzzy_bajo' WHERE fuente = 'mandatos' AND metodo = 'fuzzy'"
+        ))
+    session.commit()
+    asegurar_claves_camara(session)
@@ -0,0 +1,207 @@
+"""
+Cache local de descargas (CSV grandes de datos.hcdn.gob.ar / datos.jus.gob.ar).
+
+Los cuerpos se guardan comprimidos (gzip) en disco, direccionados por hash de
+contenido, y se indexan por URL. Cada descarga manda If-None-Match /
+If-Modified-Since y se streamea a disco sin pasar por memoria.
+
+`fetch(url, consumer=...)` devuelve un Download con `changed`: si el contenido
+es distinto al último que ese consumidor marcó como procesado. Así una etapa
+puede saltear parseo y escritura en DB cuando no hay nada nuevo, y si falla a
+mitad de camino vuelve a procesar en la próxima corrida.
+
+Uso CLI:
+    python -m src.cache list
+    python -m src.cache purge                 # todo
+    python -m src.cache purge --url URL       # una entrada
+    python -m src.cache purge --max-mb 500    # evicción LRU hasta ese tamaño
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+from src.utils import logger
+
+CACHE_DIR = Path(os.getenv('LOBBY_CACHE_DIR', '.cache/descargas'))
+MAX_MB = int(os.getenv('LOBBY_CACHE_MAX_MB', '2048'))
+CHUNK_BYTES = 1 << 20
+
+
+@dataclass
+class Download:
+    url: str
+    path: Path          # archivo .gz en el cache (pandas lo lee directo)
+    sha256: str
+    size: int           # bytes descomprimidos
+    changed: bool
+    consumer: str = None
+
+    def open(self, encoding='utf-8-sig'):
+        return gzip.open(self.path, 'rt', encoding=encoding)
+
+    def mark_processed(self):
+        """Registra que `consumer` terminó de procesar esta versión del contenido."""
+        if not self.consumer:
+            return
+        with _index() as index:
+            entry = index.get(self.url)
+            if entry:
+                entry.setdefault('procesado', {})[self.consumer] = self.sha256
+
+
+@contextmanager
+def _index():
+    """Lee/escribe el índice bajo un flock (seguro entre threads y procesos)."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    with open(CACHE_DIR / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        path = CACHE_DIR / 'index.json'
+        index = json.loads(path.read_text()) if path.exists() else {}
+        yield index
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(index, indent=1))
+        os.replace(tmp, path)
+
+
+def _object_path(sha256):
+    return CACHE_DIR / 'objects' / sha256[:2] / f"{sha256}.gz"
+
+
+def _stream_to_cache(response):
+    """Streamea el body a un .gz temporal hasheando los bytes crudos. Devuelve (sha, size, tmp)."""
+    (CACHE_DIR / 'objects').mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR / 'objects', suffix='.part')
+    sha = hashlib.sha256()
+    size = 0
+    with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as gz:
+        for chunk in response.iter_content(CHUNK_BYTES):
+            sha.update(chunk)
+            gz.write(chunk)
+            size += len(chunk)
+    return sha.hexdigest(), size, Path(tmp)
+
+
+def fetch(url, consumer=None, timeout=180, verify=False, session=None):
+    """
+    Devuelve un Download con el contenido de `url` en el cache, revalidando con
+    GET condicional. Si la red falla y hay copia local, usa la copia.
+    """
+    http = session or requests
+    with _index() as index:
+        previo = dict(index.get(url) or {})
+    if previo and not Path(previo['path']).exists():
+        previo = {}
+
+    headers = {}
+    if previo.get('etag'):
+        headers['If-None-Match'] = previo['etag']
+    if previo.get('last_modified'):
+        headers['If-Modified-Since'] = previo['last_modified']
+
+    try:
+        with http.get(url, headers=headers, stream=True, timeout=timeout, verify=verify) as r:
+            if r.status_code == 304:
+                logger.info(f"  [cache] sin cambios (304): {url.split('/')[-1]}")
+                sha, size, tmp = previo['sha256'], previo['size'], None
+            else:
+                r.raise_for_status()
+                sha, size, tmp = _stream_to_cache(r)
+                etag, last_modified = r.headers.get('ETag'), r.headers.get('Last-Modified')
+    except Exception as e:
+        if not previo:
+            raise
+        logger.warning(f"  [cache] descarga fallida ({e}), usando copia local de {url.split('/')[-1]}")
+        sha, size, tmp = previo['sha256'], previo['size'], None
+
+    destino = _object_path(sha)
+    if tmp is not None:
+        if destino.exists():
+            tmp.unlink()
+        else:
+            destino.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(tmp, destino)
+        logger.info(f"  [cache] descargado {size / 1e6:.1f} MB: {url.split('/')[-1]}")
+
+    ahora = datetime.now().isoformat(timespec='seconds')
+    with _index() as index:
+        entry = index.setdefault(url, {})
+        if tmp is not None:
+            entry.update({'etag': etag, 'last_modified': last_modified, 'fetched_at': ahora})
+        entry.update({
+            'sha256': sha, 'size': size, 'path': str(destino),
+            'stored': destino.stat().st_size, 'last_access': ahora,
+        })
+        procesado = entry.get('procesado', {}).get(consumer) if consumer else previo.get('sha256')
+        # La versión anterior de esta URL queda huérfana si ninguna otra entrada la usa
+        if previo and previo['path'] != str(destino) \
+                and not any(e['path'] == previo['path'] for e in index.values()):
+            Path(previo['path']).unlink(missing_ok=True)
+        _evict(index, MAX_MB * 1024 * 1024, keep=url)
+
+    return Download(url=url, path=destino, sha256=sha, size=size,
+                    changed=procesado != sha, consumer=consumer)
+
+
+def _evict(index, max_bytes, keep=None):
+    """Borra entradas por LRU (last_access) hasta que los objetos quepan en max_bytes."""
+    objetos = {e['path']: e.get('stored', 0) for e in index.values()}
+    total = sum(objetos.values())
+    for url, entry in sorted(index.items(), key=lambda kv: kv[1].get('last_access', '')):
+        if total <= max_bytes:
+            break
+        if url == keep:
+            continue
+        del index[url]
+        if not any(e['path'] == entry['path'] for e in index.values()):
+            Path(entry['path']).unlink(missing_ok=True)
+            total -= objetos.get(entry['path'], 0)
+        logger.info(f"  [cache] evict: {url.split('/')[-1]}")
+
+
+def purge(url=None, max_mb=None):
+    with _index() as index:
+        if url:
+            entry = index.pop(url, None)
+            if entry and not any(e['path'] == entry['path'] for e in index.values()):
+                Path(entry['path']).unlink(missing_ok=True)
+        elif max_mb is not None:
+            _evict(index, max_mb * 1024 * 1024)
+        else:
+            index.clear()
+            shutil.rmtree(CACHE_DIR / 'objects', ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache local de descargas")
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('list', help="Listar entradas")
+    p_purge = sub.add_parser('purge', help="Borrar entradas (todas por defecto)")
+    p_purge.add_argument('--url')
+    p_purge.add_argument('--max-mb', type=int)
+    args = parser.parse_args()
+
+    if args.cmd == 'list':
+        with _index() as index:
+            total = 0
+            for url, e in sorted(index.items(), key=lambda kv: kv[1].get('last_access', ''), reverse=True):
+                total += e.get('stored', 0)
+                print(f"{e.get('stored', 0) / 1e6:8.1f} MB  {e.get('last_access', '')}  "
+                      f"{e['sha256'][:12]}  {url}")
+            print(f"{len(index)} entradas, {total / 1e6:.1f} MB en {CACHE_DIR}")
+    else:
+        purge(url=args.url, max_mb=args.max_mb)
+
+
+if __name__ == "__main__":
+    main()
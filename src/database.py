@@ -1,6 +1,7 @@
 import os
 import urllib.parse
-from sqlalchemy import create_engine
+from functools import lru_cache
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 load_dotenv()
@@ -41,6 +42,52 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def migrar():
+    """
+    Crea las tablas que falten y aplica las migraciones de columnas e índices
+    (ver src.bulk.asegurar_esquema). Lo corre la ingesta (actualizar.py,
+    main.py), nunca la app.
+    """
+    import src.models  # noqa: F401 — registra los modelos para create_all
+    from src.bulk import asegurar_esquema
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        asegurar_esquema(db)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+# Columnas e índices que la app consulta y que agregan las migraciones
+ESQUEMA_APP = {
+    'columnas': [('actas_cabecera', 'fecha_inferida'), ('actas_cabecera', 'camara'),
+                 ('votos', 'camara'), ('sesiones', 'anio')],
+    'indices': ['ix_votos_camara_acta_legislador', 'ix_actas_cabecera_camara_acta_id'],
+}
+
+@lru_cache(maxsize=1)
+def esquema_faltante():
+    """
+    Chequeo liviano (solo lectura, una vez por proceso) de lo que la app
+    necesita del esquema. Devuelve la lista de columnas/índices que faltan.
+    """
+    faltantes = []
+    with engine.connect() as conn:
+        for tabla, columna in ESQUEMA_APP['columnas']:
+            existe = conn.execute(text("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_name = :tabla AND column_name = :columna
+            """), {'tabla': tabla, 'columna': columna}).scalar()
+            if not existe:
+                faltantes.append(f"{tabla}.{columna}")
+        for indice in ESQUEMA_APP['indices']:
+            if not conn.execute(text("SELECT to_regclass(:i)"), {'i': indice}).scalar():
+                faltantes.append(indice)
+    return faltantes
+
 def get_db():
     db = SessionLocal()
     try:
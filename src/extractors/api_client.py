@@ -1,6 +1,13 @@
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import requests
 import pandas as pd
 import numpy as np
+from src import cache
+from src.http import build_session
 from src.utils import logger
 
 
@@ -15,25 +22,69 @@ class ArgentinaDatosClient:
 
     URL_DETALLES = "https://datos.hcdn.gob.ar:443/dataset/2e08ab84-09f4-4aac-86b3-9573ca9810db/resource/262cc543-3186-401b-b35e-dcdb2635976d/download/detalle-actas-datos-generales-2.4.csv"
 
+    # Solo las columnas que usa el pipeline, con tipos compactos.
+    # Int32 (nullable) porque hay filas sin acta_detalle_id.
+    DTYPES_DETALLE = {
+        'acta_detalle_id': 'Int32',
+        'acta_id': 'Int32',
+        'diputado_nombre': 'category',
+        'voto': 'category',
+        'bloque': 'category',
+    }
+    CHUNK_SIZE = 200_000
+
+    def download_votes_history(self, consumer=None):
+        """Baja (o revalida) el CSV de detalle en el cache local. Ver src.cache."""
+        return cache.fetch(self.URL_DETALLES, consumer=consumer)
+
+    def iter_votes_history(self, chamber: str, chunksize: int = CHUNK_SIZE, path=None):
+        """
+        Genera DataFrames tipados de `chunksize` filas sin materializar el CSV completo.
+        `path`: archivo ya descargado (ej. Download.path); si no, se baja vía cache.
+        Los errores de lectura o parseo se propagan: un archivo leído a medias no
+        tiene que parecer un fin de archivo normal (el llamador lo marcaría procesado).
+        """
+        logger.info(f"Leyendo votaciones nominales en bloques de {chunksize} filas...")
+        total = 0
+        reader = pd.read_csv(
+            path or self.download_votes_history().path,
+            encoding='utf-8',
+            usecols=lambda c: c in self.DTYPES_DETALLE,
+            dtype=self.DTYPES_DETALLE,
+            chunksize=chunksize,
+        )
+        with reader:
+            for chunk in reader:
+                total += len(chunk)
+                yield chunk
+        logger.info(f"Leídos {total} registros de votación.")
+
     def get_votes_history(self, chamber: str):
+        """Versión materializada (lista de dicts). Preferir iter_votes_history."""
+        registros = []
         try:
-            logger.info("Descargando votaciones nominales (CSV directo)...")
-            df = pd.read_csv(self.URL_DETALLES, encoding='utf-8')
-            logger.info(f"Descargados {len(df)} registros de votación.")
-            return df.to_dict(orient='records')
+            for chunk in self.iter_votes_history(chamber):
+                registros.extend(chunk.astype(object).to_dict(orient='records'))
         except Exception as e:
             logger.warning(f"No se pudo obtener votaciones: {e}")
             return []
+        return registros
 
 
 class OpenDataPortalClient:
     """
     Cliente para la API CKAN de Datos HCDN.
     Con paginación completa para cubrir todos los períodos históricos.
+    Las páginas se piden en paralelo (MAX_WORKERS) sobre una sesión keep-alive.
     """
     RESOURCE_ID = "22b2d52c-7a0e-426b-ac0a-a3326c388ba6"
     BASE_URL = "https://datos.hcdn.gob.ar/api/3/action/datastore_search"
+    SQL_URL = "https://datos.hcdn.gob.ar/api/3/action/datastore_search_sql"
+    # Únicas columnas que usa _clean_page (en minúscula; la API puede variar el case)
+    FIELDS = ('exp_diputados', 'exp_senado', 'proyecto_id', 'titulo', 'publicacion_fecha', 'tipo', 'autor')
     PAGE_SIZE = 1000  # Máximo recomendado por la API
+    MAX_WORKERS = 4   # Concurrencia por defecto: bajo para no castigar datos.hcdn.gob.ar
+    MAX_RETRIES = 3
 
     def _get_valid_string(self, value):
         if value is None:
@@ -43,87 +94,174 @@ class OpenDataPortalClient:
             return None
         return s
 
-    def extract_hcdn_bills(self):
-        try:
-            logger.info("Conectando a la API de Datos HCDN (con paginación)...")
-
-            all_records = []
-            offset = 0
-
-            while True:
-                params = {
-                    "resource_id": self.RESOURCE_ID,
-                    "limit": self.PAGE_SIZE,
-                    "offset": offset
-                }
-
-                response = requests.get(
-                    self.BASE_URL, params=params,
-                    verify=False, timeout=60
-                )
+    def _get(self, http, url, params):
+        """GET a la API CKAN; reintenta con backoff exponencial y devuelve `result`."""
+        for intento in range(self.MAX_RETRIES):
+            try:
+                response = http.get(url, params=params, verify=False, timeout=60)
                 response.raise_for_status()
                 data = response.json()
-
                 if not data.get("success"):
-                    logger.error("La API respondió success=False")
-                    break
-
-                records = data["result"]["records"]
-                total = data["result"].get("total", 0)
-
-                if not records:
-                    break
-
-                all_records.extend(records)
-                offset += len(records)
-
-                logger.info(f"  Descargados {offset}/{total} registros...")
-
-                # Si ya tenemos todos, salir
-                if offset >= total:
-                    break
-
-            logger.info(f"Total descargado: {len(all_records)} registros crudos.")
-
-            if not all_records:
-                return pd.DataFrame()
-
-            clean_rows = []
-            registros_sin_id = 0
-
-            for row in all_records:
-                r = {k.lower().strip(): v for k, v in row.items()}
-
-                expediente = self._get_valid_string(r.get('exp_diputados'))
-                if not expediente:
-                    expediente = self._get_valid_string(r.get('exp_senado'))
-                if not expediente:
-                    p_id = self._get_valid_string(r.get('proyecto_id'))
-                    if p_id:
-                        expediente = f"INTERNAL-{p_id}"
-
-                if not expediente:
-                    registros_sin_id += 1
-                    continue
-
-                clean_rows.append({
-                    'nro_expediente': expediente,
-                    'titulo': self._get_valid_string(r.get('titulo')) or "Sin Título",
-                    'fecha_ingreso': self._get_valid_string(r.get('publicacion_fecha')),
-                    'estado': self._get_valid_string(r.get('tipo')) or "Desconocido",
-                    'autores': self._get_valid_string(r.get('autor')) or "Sin Autor"
-                })
-
-            df = pd.DataFrame(clean_rows)
-
-            if registros_sin_id > 0:
-                logger.warning(f"Descartados {registros_sin_id} registros sin ID.")
-
-            if not df.empty:
-                df['nro_expediente'] = df['nro_expediente'].astype(str)
-                df = df[~df['nro_expediente'].isin(['None', '', 'nan'])]
+                    raise RuntimeError("La API respondió success=False")
+                return data["result"]
+            except Exception as e:
+                if intento == self.MAX_RETRIES - 1:
+                    raise
+                logger.warning(f"  Request {params} falló ({e}), reintentando...")
+                time.sleep(2 ** intento)
+
+    def _fetch_page(self, http, offset, fields=None):
+        """Pide una página; si falla se reintenta solo esa página."""
+        params = {
+            "resource_id": self.RESOURCE_ID,
+            "limit": self.PAGE_SIZE,
+            "offset": offset
+        }
+        if fields:
+            params["fields"] = ','.join(fields)
+        return self._get(http, self.BASE_URL, params)
+
+    def fetch_schema(self, http):
+        """
+        Devuelve (columnas, firma) del recurso: las columnas reales que usa el
+        pipeline (+ _id) y un hash de todos los campos/tipos para detectar cambios.
+        """
+        result = self._get(http, self.BASE_URL, {"resource_id": self.RESOURCE_ID, "limit": 0})
+        fields = result.get("fields", [])
+        firma = hashlib.sha1(
+            json.dumps(sorted((f["id"], f.get("type")) for f in fields)).encode()
+        ).hexdigest()
+        columnas = [
+            f["id"] for f in fields
+            if f["id"] == "_id" or f["id"].lower().strip() in self.FIELDS
+        ]
+        return columnas, firma
+
+    def _clean_page(self, records):
+        """Normaliza una página cruda. Devuelve (DataFrame, registros_sin_id, max _id)."""
+        clean_rows = []
+        registros_sin_id = 0
+        max_id = max((int(r.get("_id") or 0) for r in records), default=0)
+
+        for row in records:
+            r = {k.lower().strip(): v for k, v in row.items()}
+
+            expediente = self._get_valid_string(r.get('exp_diputados'))
+            if not expediente:
+                expediente = self._get_valid_string(r.get('exp_senado'))
+            if not expediente:
+                p_id = self._get_valid_string(r.get('proyecto_id'))
+                if p_id:
+                    expediente = f"INTERNAL-{p_id}"
+
+            if not expediente:
+                registros_sin_id += 1
+                continue
+
+            clean_rows.append({
+                'nro_expediente': expediente,
+                'titulo': self._get_valid_string(r.get('titulo')) or "Sin Título",
+                'fecha_ingreso': self._get_valid_string(r.get('publicacion_fecha')),
+                'estado': self._get_valid_string(r.get('tipo')) or "Desconocido",
+                'autores': self._get_valid_string(r.get('autor')) or "Sin Autor"
+            })
+
+        return pd.DataFrame(clean_rows), registros_sin_id, max_id
+
+    def _fetch_clean_page(self, http, offset, fields=None):
+        return self._clean_page(self._fetch_page(http, offset, fields)["records"])
+
+    def _assemble(self, paginas):
+        """Une las páginas limpias (en orden) en un DataFrame final. Devuelve (df, max _id)."""
+        frames = [paginas[k][0] for k in sorted(paginas)]
+        registros_sin_id = sum(p[1] for p in paginas.values())
+        max_id = max((p[2] for p in paginas.values()), default=0)
+        frames = [f for f in frames if not f.empty]
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        if registros_sin_id > 0:
+            logger.warning(f"Descartados {registros_sin_id} registros sin ID.")
+
+        if not df.empty:
+            df['nro_expediente'] = df['nro_expediente'].astype(str)
+            df = df[~df['nro_expediente'].isin(['None', '', 'nan'])]
+
+        logger.info(f"DATOS PROCESADOS: {len(df)} proyectos válidos listos para insertar.")
+        return df, max_id
+
+    def _extract_full(self, http, max_workers, fields=None):
+        # La primera página trae `total`: con eso ya se conocen todos los offsets
+        primera = self._fetch_page(http, 0, fields)
+        total = primera.get("total", 0)
+        paginas = {0: self._clean_page(primera["records"])}
+        offsets = range(len(primera["records"]), total, self.PAGE_SIZE) if primera["records"] else []
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futuros = {pool.submit(self._fetch_clean_page, http, off, fields): off for off in offsets}
+            for n, futuro in enumerate(as_completed(futuros), 1):
+                paginas[futuros[futuro]] = futuro.result()
+                if n % 20 == 0 or n == len(futuros):
+                    logger.info(f"  Descargadas {n + 1}/{len(futuros) + 1} páginas ({total} registros)...")
+
+        return self._assemble(paginas)
+
+    def _extract_since(self, http, fields, since_id):
+        """Paginación keyset sobre _id vía datastore_search_sql: solo filas nuevas."""
+        columnas = ', '.join(f'"{c}"' for c in fields)
+        paginas = {}
+        desde = since_id
+        while True:
+            sql = (
+                f'SELECT {columnas} FROM "{self.RESOURCE_ID}" '
+                f'WHERE "_id" > {int(desde)} ORDER BY "_id" LIMIT {self.PAGE_SIZE}'
+            )
+            records = self._get(http, self.SQL_URL, {"sql": sql})["records"]
+            if not records:
+                break
+            paginas[desde] = self._clean_page(records)
+            desde = paginas[desde][2]
+            logger.info(f"  {len(records)} registros nuevos (hasta _id {desde})...")
+            if len(records) < self.PAGE_SIZE:
+                break
+        return self._assemble(paginas)
+
+    def sync_hcdn_bills(self, watermark=None, schema_hash=None, max_workers=None):
+        """
+        Sincronización incremental contra el datastore CKAN.
+
+        Con `watermark` (max _id ya visto) y el mismo schema solo pide filas con
+        _id mayor; sin watermark, si cambió el schema o si falla la query delta
+        (datastore_search_sql) hace la descarga completa paginada.
+        En todos los casos solo se piden las columnas de FIELDS.
+        Devuelve (df, nuevo_watermark, schema_hash); ante error el watermark no avanza.
+        """
+        max_workers = max_workers or self.MAX_WORKERS
+        http = build_session(pool_size=max_workers)
+        try:
+            columnas, firma = self.fetch_schema(http)
+            motivo = "sin watermark" if watermark is None else "cambió el schema del recurso"
+            if watermark is not None and firma == schema_hash:
+                logger.info(f"Sync incremental de proyectos desde _id > {watermark}...")
+                try:
+                    df, max_id = self._extract_since(http, columnas, watermark)
+                    return df, max(max_id, watermark), firma
+                except Exception as e:
+                    # Sin fallback, un endpoint SQL roto dejaría el sync sin hacer nada para siempre
+                    logger.warning(f"Falló la query delta ({e}); se pasa al sync completo")
+                    motivo = "falló el sync incremental"
+            logger.info(f"Sync completo de proyectos ({motivo}, {max_workers} workers)...")
+            df, max_id = self._extract_full(http, max_workers, columnas)
+            return df, max(max_id, watermark or 0), firma
+        except Exception as e:
+            logger.error(f"Error procesando datos API: {e}")
+            return pd.DataFrame(), watermark, schema_hash
 
-            logger.info(f"DATOS PROCESADOS: {len(df)} proyectos válidos listos para insertar.")
+    def extract_hcdn_bills(self, max_workers=None):
+        """Descarga completa (todas las columnas). Ver sync_hcdn_bills para el modo incremental."""
+        max_workers = max_workers or self.MAX_WORKERS
+        try:
+            logger.info(f"Conectando a la API de Datos HCDN (paginación paralela, {max_workers} workers)...")
+            df, _ = self._extract_full(build_session(pool_size=max_workers), max_workers)
             return df
 
         except Exception as e:
@@ -1,35 +1,172 @@
 # src/extractors/pdf_parser.py
+"""
+Texto de PDFs de sesiones (diarios / versiones taquigráficas) por rango de páginas.
+
+Backends (`BACKENDS`), todos con la misma firma fn(path, desde, hasta) → [texto por página]:
+  - pdfminer: análisis de layout completo, Python puro (default)
+  - pdfium:   texto plano vía pypdfium2, sin análisis de layout (mucho más rápido)
+
+Las páginas son independientes, así que `extraer_texto` puede repartir bloques
+de páginas en un pool de procesos (`workers`).
+
+Benchmark sobre una carpeta local de diarios (páginas/s y totales de votos por backend):
+    python -m src.extractors.pdf_parser CARPETA [--workers N] [--backends pdfminer pdfium]
+"""
+import argparse
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
 from pdfminer.high_level import extract_text
+from pdfminer.pdfpage import PDFPage
 from src.utils import logger
 
+BLOQUE_PAGINAS = 16  # páginas por tarea del pool
+
+
+def _paginas_pdfminer(path, desde, hasta):
+    # TextConverter cierra cada página con un form feed
+    texto = extract_text(str(path), page_numbers=range(desde, hasta))
+    return texto.split('\f')[:-1]
+
+
+def _paginas_pdfium(path, desde, hasta):
+    import pypdfium2 as pdfium
+    pdf = pdfium.PdfDocument(str(path))
+    try:
+        paginas = []
+        for i in range(desde, min(hasta, len(pdf))):
+            pagina = pdf[i]
+            texto = pagina.get_textpage()
+            paginas.append(texto.get_text_range())
+            texto.close()
+            pagina.close()
+        return paginas
+    finally:
+        pdf.close()
+
+
+BACKENDS = {
+    'pdfminer': _paginas_pdfminer,
+    'pdfium': _paginas_pdfium,
+}
+
+
+def contar_paginas(path):
+    with open(path, 'rb') as f:
+        return sum(1 for _ in PDFPage.get_pages(f))
+
+
+def _extraer_bloque(backend, path, desde, hasta):
+    return BACKENDS[backend](path, desde, hasta)
+
+
+def iter_bloques(path, backend='pdfminer', paginas=None, workers=1, bloque=BLOQUE_PAGINAS):
+    """
+    Genera, en orden, listas con el texto de cada bloque de páginas.
+    `paginas`: range de páginas (0-based); por defecto todo el documento.
+    Con workers > 1 los bloques se extraen en paralelo; cortar la iteración
+    cancela los que todavía no empezaron.
+    """
+    if paginas is None:
+        paginas = range(contar_paginas(path))
+    rangos = [(i, min(i + bloque, paginas.stop)) for i in range(paginas.start, paginas.stop, bloque)]
+    if workers <= 1:
+        for desde, hasta in rangos:
+            yield _extraer_bloque(backend, path, desde, hasta)
+        return
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        futuros = [pool.submit(_extraer_bloque, backend, path, desde, hasta) for desde, hasta in rangos]
+        for futuro in futuros:
+            yield futuro.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extraer_texto(path, backend='pdfminer', paginas=None, workers=1, bloque=BLOQUE_PAGINAS):
+    """Lista con el texto de cada página."""
+    return [t for textos in iter_bloques(path, backend, paginas, workers, bloque) for t in textos]
+
+
 class SessionDiaryProcessor:
     # Regex pre-compilados para mejor rendimiento
     RE_AFIRMATIVOS = re.compile(r"AFIRMATIVOS\s*\.+\s*(\d+)", re.IGNORECASE)
     RE_NEGATIVOS = re.compile(r"NEGATIVOS\s*\.+\s*(\d+)", re.IGNORECASE)
-    
-    def process_pdf(self, pdf_path):
+
+    def __init__(self, backend='pdfminer', workers=1):
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend de PDF desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+        self.backend = backend
+        self.workers = workers
+
+    def totales(self, text):
+        """Primer total de afirmativos / negativos del texto (0 si no aparece)."""
+        match_af = self.RE_AFIRMATIVOS.search(text)
+        match_neg = self.RE_NEGATIVOS.search(text)
+        return {
+            'votos_afirmativos': int(match_af.group(1)) if match_af else 0,
+            'votos_negativos': int(match_neg.group(1)) if match_neg else 0,
+        }
+
+    def process_pdf(self, pdf_path, paginas=None):
         logger.info(f"Procesando PDF: {pdf_path}")
         try:
-            text = extract_text(pdf_path)
-            
-            resultados = {
-                'votos_afirmativos': 0,
-                'votos_negativos': 0,
-                'texto_raw': text[:500] + "..." # Guardamos un snippet para debug
-            }
-            
-            # Buscar patrones
-            match_af = self.RE_AFIRMATIVOS.search(text)
-            if match_af:
-                resultados['votos_afirmativos'] = int(match_af.group(1))
-                
-            match_neg = self.RE_NEGATIVOS.search(text)
-            if match_neg:
-                resultados['votos_negativos'] = int(match_neg.group(1))
-            
+            # Se lee por bloques y se corta apenas aparecen los dos totales: un
+            # match dentro del texto ya leído es el mismo que en el documento entero
+            text = ''
+            for textos in iter_bloques(pdf_path, self.backend, paginas, self.workers):
+                text += '\f'.join(textos) + '\f'
+                if self.RE_AFIRMATIVOS.search(text) and self.RE_NEGATIVOS.search(text):
+                    break
+
+            resultados = self.totales(text)
+            resultados['texto_raw'] = text[:500] + "..."  # Guardamos un snippet para debug
             return resultados
-            
+
         except Exception as e:
             logger.error(f"Error procesando PDF {pdf_path}: {e}")
-            return None
\ No newline at end of file
+            return None
+
+
+def benchmark(carpeta, backends=tuple(BACKENDS), workers=1):
+    """
+    Extrae todos los PDFs de `carpeta` con cada backend y reporta páginas/s.
+    Devuelve la lista de PDFs cuyos totales de votos difieren entre backends.
+    """
+    pdfs = sorted(Path(carpeta).glob('*.pdf'))
+    if not pdfs:
+        logger.warning(f"No hay PDFs en {carpeta}")
+        return []
+    paginas = {pdf: contar_paginas(pdf) for pdf in pdfs}
+    processor = SessionDiaryProcessor()
+    totales = {}
+    for backend in backends:
+        inicio = time.perf_counter()
+        for pdf in pdfs:
+            texto = '\f'.join(extraer_texto(pdf, backend, workers=workers))
+            totales[backend, pdf] = processor.totales(texto)
+        segundos = time.perf_counter() - inicio
+        total_paginas = sum(paginas.values())
+        logger.info(f"  {backend:<9} {total_paginas} páginas en {segundos:.1f} s "
+                    f"→ {total_paginas / segundos:.1f} páginas/s ({workers} workers)")
+
+    distintos = [
+        pdf for pdf in pdfs
+        if len({tuple(totales[b, pdf].values()) for b in backends}) > 1
+    ]
+    for pdf in distintos:
+        logger.warning(f"  Totales distintos en {pdf.name}: "
+                       + ', '.join(f"{b}={totales[b, pdf]}" for b in backends))
+    logger.info(f"Totales de votos coincidentes: {len(pdfs) - len(distintos)}/{len(pdfs)} PDFs")
+    return distintos
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de backends de texto PDF")
+    parser.add_argument('carpeta', help="carpeta con diarios de sesiones en PDF")
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--workers', type=int, default=1, help="procesos por documento")
+    args = parser.parse_args()
+    benchmark(args.carpeta, args.backends, args.workers)
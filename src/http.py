@@ -0,0 +1,42 @@
+"""
+Sesiones HTTP compartidas para los extractores.
+
+Una sola requests.Session por proceso/etapa reutiliza conexiones TCP/TLS
+(keep-alive) en lugar de abrir una nueva por cada requests.get.
+"""
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "lobby-monitor-legislativo/1.0"
+
+
+def build_session(pool_size=10):
+    """Session con pool de conexiones dimensionado para `pool_size` workers concurrentes."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+class HostRateLimiter:
+    """Espaciado mínimo entre requests al mismo host, compartido entre threads."""
+
+    def __init__(self, rate_per_sec):
+        self.intervalo = 1.0 / rate_per_sec
+        self._proximo = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            ahora = time.monotonic()
+            turno = max(ahora, self._proximo.get(host, ahora))
+            self._proximo[host] = turno + self.intervalo
+        if turno > ahora:
+            time.sleep(turno - ahora)
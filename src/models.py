@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, Text, Index, text
+from sqlalchemy import Column, Integer, BigInteger, Boolean, String, Date, DateTime, ForeignKey, Text, Index, text, func
 from sqlalchemy.orm import relationship
 from src.database import Base
 
@@ -23,6 +23,23 @@ Index(
     postgresql_where=text("dni_cuit IS NOT NULL")
 )
 
+class LegisladorAlias(Base):
+    """Nombre normalizado (sin acentos, mayúsculas, tokens ordenados) por fuente → legislador."""
+    __tablename__ = 'legislador_alias'
+
+    id = Column(Integer, primary_key=True, index=True)
+    alias = Column(String, nullable=False)
+    fuente = Column(String, nullable=False)      # hcdn, senado, ddjj, comisiones, mandatos
+    legislador_id = Column(Integer, ForeignKey('legisladores.id'), nullable=False)
+    metodo = Column(String)                      # alias / dni / exacto / fuzzy / fuzzy_bajo / alta
+
+Index(
+    'ix_legislador_alias_alias_fuente',
+    LegisladorAlias.alias,
+    LegisladorAlias.fuente,
+    unique=True
+)
+
 class Proyecto(Base):
     __tablename__ = 'proyectos'
     
@@ -40,6 +57,7 @@ class Sesion(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     fecha = Column(Date)
+    anio = Column(Integer)
     tipo_periodo = Column(String)       # Ordinaria / Extraordinaria / Prórroga
     tipo_reunion = Column(String)       # Especial, Minoría, Informativa, etc.
     duracion_horas = Column(String)
@@ -56,6 +74,7 @@ class Voto(Base):
     # ✅ ID único del CSV para deduplicación
     acta_detalle_id = Column(Integer, nullable=True)
     acta_id = Column(Integer, nullable=True)
+    camara = Column(String, server_default='Diputados')   # Diputados / Senado: los acta_id se pisan entre cámaras
     sesion_id = Column(Integer, ForeignKey('sesiones.id'), nullable=True)
     proyecto_id = Column(Integer, ForeignKey('proyectos.id'), nullable=True)
     legislador_id = Column(Integer, ForeignKey('legisladores.id'))
@@ -74,6 +93,15 @@ Index(
     postgresql_where=text("acta_detalle_id IS NOT NULL")
 )
 
+# ✅ Un voto por legislador y acta dentro de cada cámara (reruns del Senado = no-op)
+Index(
+    'ix_votos_camara_acta_legislador',
+    Voto.camara,
+    Voto.acta_id,
+    Voto.legislador_id,
+    unique=True
+)
+
 class Audiencia(Base):
     __tablename__ = 'audiencias'
     
@@ -90,6 +118,7 @@ class ActaCabecera(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     acta_id = Column(Integer, nullable=False)
+    camara = Column(String, server_default='Diputados')
     sesion_id = Column(String)
     nroperiodo = Column(Integer)
     tipo_periodo = Column(String)
@@ -102,9 +131,36 @@ class ActaCabecera(Base):
     votos_negativos = Column(Integer)
     abstenciones = Column(Integer)
     ausentes = Column(Integer)
+    fecha_inferida = Column(Boolean, nullable=False, server_default=text('false'))  # fecha tomada del acta vecina
 
 Index(
-    'ix_actas_cabecera_acta_id',
+    'ix_actas_cabecera_camara_acta_id',
+    ActaCabecera.camara,
     ActaCabecera.acta_id,
     unique=True
-)
\ No newline at end of file
+)
+
+class TemarioItem(Base):
+    """Ítems del sumario del diario de sesiones."""
+    __tablename__ = 'temario_items'
+
+    id = Column(Integer, primary_key=True, index=True)
+    sesion_id = Column(Integer, ForeignKey('sesiones.id'))
+    item_nro = Column(Integer)
+    descripcion = Column(Text)
+
+Index(
+    'ux_temario_items_sesion_item',
+    TemarioItem.sesion_id,
+    TemarioItem.item_nro,
+    unique=True
+)
+
+class SyncWatermark(Base):
+    """High-water mark por recurso externo para sincronizaciones incrementales."""
+    __tablename__ = 'sync_watermarks'
+
+    recurso = Column(String, primary_key=True)   # ej. resource_id de CKAN
+    valor = Column(BigInteger)                   # max _id ya ingerido
+    schema_hash = Column(String)                 # firma de campos/tipos del recurso
+    actualizado = Column(DateTime, server_default=func.now(), onupdate=func.now())
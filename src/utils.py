@@ -1,7 +1,13 @@
 import logging
+import resource
 import sys
 import re
-from thefuzz import fuzz, process
+import unicodedata
+from collections import Counter
+import numpy as np
+from rapidfuzz import fuzz, process
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 # Configuración del Logger
 def setup_logger():
@@ -23,7 +29,16 @@ def setup_logger():
 
 logger = setup_logger()
 
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso en MB (ru_maxrss viene en KB en Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
 class IdentityResolver:
+    # Fuzzy por debajo de este umbral (ej. mandatos a 75/82) se guarda como
+    # 'fuzzy_bajo': el alias solo lo reusa la fuente que lo aprendió.
+    UMBRAL_ALIAS = 90
+    METODOS_SOLO_FUENTE = ('fuzzy_bajo',)
+
     @staticmethod
     def clean_cuit_dni(value: str) -> str:
         """Limpia strings para dejar solo números."""
@@ -31,61 +46,394 @@ class IdentityResolver:
             return None
         return re.sub(r'\D', '', str(value))
 
+    @staticmethod
+    def normalize_name(nombre: str) -> str:
+        """Forma canónica de un nombre: sin acentos, mayúsculas, tokens ordenados."""
+        if not nombre or not isinstance(nombre, str):
+            return ''
+        sin_acentos = ''.join(
+            c for c in unicodedata.normalize('NFKD', nombre) if not unicodedata.combining(c)
+        )
+        tokens = re.sub(r'[^A-Z0-9]+', ' ', sin_acentos.upper()).split()
+        return ' '.join(sorted(tokens))
+
+    @staticmethod
+    def resolve_many(session, names, camara=None, bloque=None, distrito=None,
+                     threshold=90, create=True, workers=-1, source='hcdn',
+                     restrict_to_chamber=False, return_created=False):
+        """
+        Resuelve un lote de nombres a legislador_id en una sola pasada.
+
+        `names` puede traer strings o dicts con 'nombre' y opcionalmente
+        'dni_cuit', 'camara', 'bloque', 'distrito'. Orden de resolución:
+        alias (legislador_alias) → DNI/CUIT exacto → nombre normalizado exacto
+        → fuzzy (una sola matriz cdist) → alta en bloque. Todo lo que no salió
+        de un alias de esta fuente se guarda como alias para la próxima corrida;
+        los alias de otras fuentes aprendidos con fuzzy bajo UMBRAL_ALIAS no se usan.
+        Con restrict_to_chamber solo valen candidatos (y alias) de `camara`.
+        Devuelve {nombre: legislador_id} (None si no hubo match y create=False);
+        con return_created, ({nombre: legislador_id}, set de ids dados de alta).
+        No commitea.
+        """
+        from src.models import Legislador, LegisladorAlias
+
+        registros = {}
+        for item in names:
+            registro = item if isinstance(item, dict) else {'nombre': item}
+            nombre = registro.get('nombre')
+            if IdentityResolver.normalize_name(nombre):
+                registros.setdefault(nombre, registro)
+        if not registros:
+            return ({}, set()) if return_created else {}
+
+        claves = {nombre: IdentityResolver.normalize_name(nombre) for nombre in registros}
+        resueltos = {}
+        creados = set()
+        metodos = Counter()
+        aliases_nuevos = {}
+
+        # 0. Alias: lookup O(1), primero de esta fuente y después de cualquier otra.
+        # Una misma fuente puede cubrir las dos cámaras (ej. mandatos): al restringir,
+        # los alias que apuntan a un legislador de la otra cámara no cuentan.
+        alias_fuente = {}
+        alias_global = {}
+        query = session.query(
+            LegisladorAlias.alias, LegisladorAlias.fuente, LegisladorAlias.legislador_id,
+            LegisladorAlias.metodo,
+        ).filter(LegisladorAlias.alias.in_(set(claves.values())))
+        if restrict_to_chamber and camara:
+            query = query.join(Legislador, Legislador.id == LegisladorAlias.legislador_id) \
+                         .filter(Legislador.camara == camara)
+        for alias, fuente, legislador_id, metodo in query:
+            if fuente == source:
+                alias_fuente[alias] = legislador_id
+            elif metodo not in IdentityResolver.METODOS_SOLO_FUENTE:
+                alias_global.setdefault(alias, legislador_id)
+
+        pendientes = []
+        for nombre, clave in claves.items():
+            if clave in alias_fuente:
+                resueltos[nombre] = alias_fuente[clave]
+                metodos['alias'] += 1
+            elif clave in alias_global:
+                resueltos[nombre] = alias_global[clave]
+                aliases_nuevos[clave] = (resueltos[nombre], 'alias')
+                metodos['alias'] += 1
+            else:
+                pendientes.append(nombre)
+
+        if pendientes:
+            # Candidatos: una sola query para todo el lote
+            query = session.query(Legislador.id, Legislador.nombre_completo, Legislador.dni_cuit)
+            if restrict_to_chamber and camara:
+                query = query.filter(Legislador.camara == camara)
+            existentes = query.all()
+            por_dni = {leg.dni_cuit: leg.id for leg in existentes if leg.dni_cuit}
+            candidatos = [
+                (leg.id, IdentityResolver.normalize_name(leg.nombre_completo))
+                for leg in existentes if leg.nombre_completo
+            ]
+            por_clave = {}
+            for legislador_id, clave in candidatos:
+                por_clave.setdefault(clave, legislador_id)
+
+            # 1. Identificación fuerte por DNI/CUIT  2. Nombre normalizado idéntico
+            restantes = []
+            for nombre in pendientes:
+                clean_id = IdentityResolver.clean_cuit_dni(registros[nombre].get('dni_cuit')) or None
+                if clean_id and clean_id in por_dni:
+                    legislador_id, metodo = por_dni[clean_id], 'dni'
+                elif claves[nombre] in por_clave:
+                    legislador_id, metodo = por_clave[claves[nombre]], 'exacto'
+                else:
+                    restantes.append(nombre)
+                    continue
+                resueltos[nombre] = legislador_id
+                aliases_nuevos[claves[nombre]] = (legislador_id, metodo)
+                metodos[metodo] += 1
+
+            # 3. Fuzzy: todos los restantes contra todos los candidatos de una vez
+            if restantes and candidatos:
+                scores = process.cdist(
+                    [claves[n] for n in restantes], [c[1] for c in candidatos],
+                    scorer=fuzz.token_sort_ratio, score_cutoff=threshold, workers=workers,
+                )
+                mejores = scores.argmax(axis=1)
+                metodo = 'fuzzy' if threshold >= IdentityResolver.UMBRAL_ALIAS else 'fuzzy_bajo'
+                for i, nombre in enumerate(restantes):
+                    j = mejores[i]
+                    if scores[i, j] >= threshold:
+                        resueltos[nombre] = candidatos[j][0]
+                        aliases_nuevos[claves[nombre]] = (candidatos[j][0], metodo)
+                        metodos[metodo] += 1
+                        logger.debug(f"[MATCH] '{nombre}' identificado como '{candidatos[j][1]}' (Confianza: {scores[i, j]:.0f}%)")
+
+            # 4. Alta en bloque de los que no matchearon: una fila por persona, no por grafía
+            faltantes = [n for n in restantes if n not in resueltos]
+            if faltantes and create:
+                grupos = IdentityResolver._agrupar_faltantes(
+                    faltantes, registros, claves, threshold, workers
+                )
+                filas = []
+                for grupo in grupos:
+                    registro = registros[grupo[0]]
+                    dnis = [IdentityResolver.clean_cuit_dni(registros[n].get('dni_cuit')) for n in grupo]
+                    filas.append({
+                        'nombre_completo': grupo[0],
+                        'dni_cuit': next((d for d in dnis if d), None),
+                        'camara': registro.get('camara', camara),
+                        'bloque': registro.get('bloque', bloque),
+                        'distrito': registro.get('distrito', distrito),
+                    })
+                result = session.execute(
+                    insert(Legislador).returning(Legislador.id, sort_by_parameter_order=True),
+                    filas,
+                )
+                for grupo, (legislador_id,) in zip(grupos, result.all()):
+                    creados.add(legislador_id)
+                    for nombre in grupo:
+                        resueltos[nombre] = legislador_id
+                        aliases_nuevos.setdefault(claves[nombre], (legislador_id, 'alta'))
+                metodos['alta'] += len(grupos)
+                metodos['alta_variante'] += len(faltantes) - len(grupos)
+            else:
+                metodos['sin_match'] += len(faltantes)
+
+        IdentityResolver.save_aliases(session, aliases_nuevos, source)
+
+        logger.info(
+            f"Identidades [{source}]: {len(registros)} nombres | "
+            + ' '.join(f"{k}={v}" for k, v in sorted(metodos.items()))
+        )
+        resultado = {nombre: resueltos.get(nombre) for nombre in registros}
+        if return_created:
+            return resultado, creados
+        return resultado
+
+    @staticmethod
+    def save_aliases(session, aliases, source):
+        """`aliases`: {alias normalizado: (legislador_id, metodo)}. Los que ya existen para la fuente no se tocan."""
+        from src.models import LegisladorAlias
+
+        if not aliases:
+            return
+        session.execute(
+            pg_insert(LegisladorAlias).on_conflict_do_nothing(
+                index_elements=['alias', 'fuente']
+            ),
+            [
+                {'alias': alias, 'fuente': source, 'legislador_id': legislador_id, 'metodo': metodo}
+                for alias, (legislador_id, metodo) in aliases.items()
+            ],
+        )
+
+    @staticmethod
+    def _agrupar_faltantes(faltantes, registros, claves, threshold, workers):
+        """
+        Agrupa los nombres sin match que son la misma persona: misma clave
+        normalizada, mismo DNI/CUIT o fuzzy ≥ threshold entre ellos (una cdist
+        del lote contra sí mismo). Devuelve listas de nombres en orden de aparición.
+        """
+        padre = list(range(len(faltantes)))
+
+        def raiz(i):
+            while padre[i] != i:
+                padre[i] = padre[padre[i]]
+                i = padre[i]
+            return i
+
+        def unir(i, j):
+            ri, rj = raiz(i), raiz(j)
+            if ri != rj:
+                padre[max(ri, rj)] = min(ri, rj)
+
+        vistos = {}
+        for i, nombre in enumerate(faltantes):
+            dni = IdentityResolver.clean_cuit_dni(registros[nombre].get('dni_cuit'))
+            for llave in (('clave', claves[nombre]), ('dni', dni or None)):
+                if llave[1] is None:
+                    continue
+                if llave in vistos:
+                    unir(vistos[llave], i)
+                else:
+                    vistos[llave] = i
+
+        # Fuzzy solo entre claves distintas (las iguales ya quedaron unidas arriba)
+        primeros = [i for llave, i in vistos.items() if llave[0] == 'clave']
+        if len(primeros) > 1:
+            textos = [claves[faltantes[i]] for i in primeros]
+            scores = process.cdist(
+                textos, textos, scorer=fuzz.token_sort_ratio, score_cutoff=threshold,
+                dtype=np.uint8, workers=workers,
+            )
+            for a, b in zip(*(scores >= threshold).nonzero()):
+                if a < b:
+                    unir(primeros[a], primeros[b])
+
+        grupos = {}
+        for i, nombre in enumerate(faltantes):
+            grupos.setdefault(raiz(i), []).append(nombre)
+        return list(grupos.values())
+
     @staticmethod
     def resolve_legislator(session, nombre, dni_cuit, camara, bloque, distrito):
+        """
+        Wrapper de un solo nombre sobre resolve_many (devuelve el objeto Legislador
+        o None). Si lo dio de alta, commitea para que tenga ID inmediato.
+        """
         from src.models import Legislador
-        
+
         # ✅ FIX: si el nombre no es string válido, no podemos procesar
         if not nombre or not isinstance(nombre, str):
             return None
-        
-        clean_id = IdentityResolver.clean_cuit_dni(dni_cuit) or None
-        legislador = None
-
-        # 2. Intento A: Buscar por DNI/CUIT (Identificación Fuerte)
-        if clean_id:
-            legislador = session.query(Legislador).filter_by(dni_cuit=clean_id).first()
-            if legislador:
-                # Opcional: Actualizar datos si faltan
-                return legislador
-
-        # 3. Intento B: Buscar por Nombre Parecido (Fuzzy Matching)
-        # Solo si no tenemos DNI o no encontramos nada por DNI
-        if not legislador:
-            legislador = IdentityResolver.fuzzy_match_legislator(session, Legislador, nombre)
-
-        # 4. Intento C: Crear nuevo (Si todo lo anterior falló)
-        if not legislador:
-            logger.debug(f"Nuevo legislador detectado: {nombre} (DNI: {clean_id})")
-            legislador = Legislador(
-                nombre_completo=nombre,
-                dni_cuit=clean_id, # Puede ser None
-                camara=camara,
-                bloque=bloque,
-                distrito=distrito
-            )
-            session.add(legislador)
-            session.commit() # Guardamos para que tenga ID inmediato
-            
-        return legislador
+
+        resueltos, creados = IdentityResolver.resolve_many(
+            session,
+            [{'nombre': nombre, 'dni_cuit': dni_cuit, 'camara': camara,
+              'bloque': bloque, 'distrito': distrito}],
+            return_created=True,
+        )
+        legislador_id = resueltos.get(nombre)
+        if legislador_id is None:
+            return None
+        if creados:
+            session.commit()
+        return session.get(Legislador, legislador_id)
 
     @staticmethod
     def fuzzy_match_legislator(session, model_legislador, name_dirty, threshold=90):
         # ✅ FIX: validar que el nombre sea un string válido
         if not name_dirty or not isinstance(name_dirty, str):
             return None
-            
-        existing = session.query(model_legislador.id, model_legislador.nombre_completo).all()
-        candidates = {leg.nombre_completo: leg.id for leg in existing if leg.nombre_completo}
-        
-        if not candidates:
-            return None
-        
-        best_match, score = process.extractOne(name_dirty, candidates.keys(), scorer=fuzz.token_sort_ratio)
-        
-        if score >= threshold:
-            legislador_id = candidates[best_match]
-            logger.debug(f"[MATCH] '{name_dirty}' identificado como '{best_match}' (Confianza: {score}%)")
-            return session.get(model_legislador, legislador_id)
-        
-        return None
\ No newline at end of file
+
+        resueltos = IdentityResolver.resolve_many(
+            session, [name_dirty], threshold=threshold, create=False
+        )
+        legislador_id = resueltos.get(name_dirty)
+        return session.get(model_legislador, legislador_id) if legislador_id else None
+
+
+class SurnameIndex:
+    """
+    Índice en memoria de los legisladores de una cámara por tokens de nombre
+    normalizados, para cruzar nombres "APELLIDO, Nombres" (integrantes de
+    comisiones) sin una query por nombre. Primero se busca el nombre en
+    legislador_alias; si no está, por apellido. Todo match por apellido tiene
+    que coincidir también en nombres de pila (o su inicial); los apellidos
+    compartidos se desambiguan además por bloque y distrito. Si aun así queda
+    más de un candidato el nombre se reporta como ambiguo en vez de elegir uno.
+    """
+    PARTICULAS = frozenset({'DE', 'DEL', 'LA', 'LAS', 'LOS', 'Y', 'E'})
+
+    def __init__(self, legisladores, aliases=None):
+        """
+        `legisladores`: iterable de (id, nombre_completo, bloque, distrito).
+        `aliases`: {alias normalizado: legislador_id} (ver IdentityResolver.normalize_name).
+        """
+        self.legisladores = {}
+        self.por_token = {}
+        self.aliases = {}
+        for legislador_id, nombre, bloque, distrito in legisladores:
+            tokens = frozenset(self.tokens(nombre))
+            if not tokens:
+                continue
+            self.legisladores[legislador_id] = (tokens, self.clave(bloque), self.clave(distrito))
+            for token in tokens:
+                self.por_token.setdefault(token, set()).add(legislador_id)
+        for alias, legislador_id in (aliases or {}).items():
+            if legislador_id in self.legisladores:
+                self.aliases[alias] = legislador_id
+
+    @classmethod
+    def from_session(cls, session, camara, source='comisiones'):
+        """Legisladores y alias de `camara` (los de `source` pisan a los de otras fuentes)."""
+        from src.models import Legislador, LegisladorAlias
+        legisladores = session.query(
+            Legislador.id, Legislador.nombre_completo, Legislador.bloque, Legislador.distrito
+        ).filter(Legislador.camara == camara).all()
+        aliases = {}
+        for alias, fuente, legislador_id, metodo in session.query(
+            LegisladorAlias.alias, LegisladorAlias.fuente, LegisladorAlias.legislador_id,
+            LegisladorAlias.metodo,
+        ).join(Legislador, Legislador.id == LegisladorAlias.legislador_id).filter(Legislador.camara == camara):
+            if fuente == source:
+                aliases[alias] = legislador_id
+            elif alias not in aliases and metodo not in IdentityResolver.METODOS_SOLO_FUENTE:
+                aliases[alias] = legislador_id
+        return cls(legisladores, aliases)
+
+    @staticmethod
+    def tokens(texto):
+        return IdentityResolver.normalize_name(texto).split()
+
+    @classmethod
+    def clave(cls, texto):
+        return ' '.join(cls.tokens(texto))
+
+    def _candidatos(self, tokens):
+        """Legisladores cuyo nombre contiene todos los tokens (sin partículas si hay otros)."""
+        significativos = [t for t in tokens if t not in self.PARTICULAS] or tokens
+        conjuntos = [self.por_token.get(t, set()) for t in significativos]
+        return set.intersection(*conjuntos) if conjuntos else set()
+
+    def resolve(self, nombre, bloque=None, distrito=None):
+        """Devuelve (legislador_id o None, método): alias / nombre / bloque / distrito / ambiguo / sin_match."""
+        alias = IdentityResolver.normalize_name(nombre)
+        if alias in self.aliases:
+            return self.aliases[alias], 'alias'
+
+        apellido, _, nombres = (nombre or '').partition(',')
+        candidatos = self._candidatos(self.tokens(apellido))
+        if not candidatos:
+            return None, 'sin_match'
+
+        # Nombres de pila (o su inicial): obligatorios aunque el apellido sea único,
+        # para no vincular a otra persona con el mismo apellido
+        pila = [t for t in self.tokens(nombres) if t not in self.PARTICULAS]
+        if not pila:
+            return None, 'sin_match'
+
+        def coincidencias(legislador_id):
+            tokens = self.legisladores[legislador_id][0]
+            return sum(
+                t in tokens or (len(t) == 1 and any(o.startswith(t) for o in tokens))
+                for t in pila
+            )
+        mejor = max(coincidencias(i) for i in candidatos)
+        if not mejor:
+            return None, 'sin_match'
+        candidatos = {i for i in candidatos if coincidencias(i) == mejor}
+        if len(candidatos) == 1:
+            return next(iter(candidatos)), 'nombre'
+
+        # Apellido y nombres compartidos: bloque, después distrito
+        for posicion, valor, metodo in ((1, bloque, 'bloque'), (2, distrito, 'distrito')):
+            valor = self.clave(valor)
+            if not valor:
+                continue
+            filtrados = {i for i in candidatos if self.legisladores[i][posicion] == valor}
+            if len(filtrados) == 1:
+                return next(iter(filtrados)), metodo
+            if filtrados:
+                candidatos = filtrados
+        return None, 'ambiguo'
+
+    def resolve_many(self, registros):
+        """
+        `registros`: dicts con 'nombre' y opcionalmente 'bloque', 'distrito'.
+        Devuelve ({nombre: legislador_id o None}, Counter de métodos,
+        {alias: (legislador_id, método)} de los matches que no salieron de un alias).
+        Sin queries.
+        """
+        resueltos = {}
+        metodos = Counter()
+        aliases_nuevos = {}
+        for registro in registros:
+            legislador_id, metodo = self.resolve(
+                registro['nombre'], registro.get('bloque'), registro.get('distrito')
+            )
+            resueltos[registro['nombre']] = legislador_id
+            metodos[metodo] += 1
+            if legislador_id is not None and metodo != 'alias':
+                aliases_nuevos[IdentityResolver.normalize_name(registro['nombre'])] = (legislador_id, metodo)
+        return resueltos, metodos, aliases_nuevos